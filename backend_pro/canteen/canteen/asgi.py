@@ -2,6 +2,8 @@
 ASGI config for canteen project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve the project through it (see Procfile) so the live order stream at
+/api/events/orders/ is handled asynchronously instead of holding a worker.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
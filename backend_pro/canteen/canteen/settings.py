@@ -32,12 +32,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings and query counts cover the other middleware too
+    'myapp.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'myapp.db_router.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -75,6 +78,68 @@ DATABASES = {
     }
 }
 
+# Optional read replica (myapp.db_router); canteen/settings_replica.py runs it on two SQLite files
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['myapp.db_router.ReplicaRouter']
+DATABASE_REPLICA_ALIAS = 'replica'
+# Reads of these routes go to the replica, unless the user wrote in the last REPLICA_PIN_SECONDS
+REPLICA_READ_ROUTES = [
+    'system-analytics', 'admin-analytics', 'admin-orders', 'student-order-list',
+    'wallet-transactions', 'all-food-courts', 'all-users', 'export-data',
+]
+REPLICA_PIN_SECONDS = 10
+
+# Cache
+# Local memory by default, which every worker process keeps for itself. CACHE_BACKEND=redis
+# (needs the redis package) shares it between processes and hosts; file shares it on one host.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', os.environ.get('REDIS_URL', 'redis://localhost:6379/1')),
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Food court list/detail cache (myapp.cache)
+FOOD_COURT_CACHE_TTL = 60 * 60
+WAITING_TIME_CACHE_TTL = 15
+# Longest Retry-After (seconds) sent when a full food court turns an order away
+ORDER_ADMISSION_MAX_RETRY_AFTER = 300
+# Users resolved from access tokens (myapp.authentication). Only cached in a shared cache:
+# with a per-process one, blocking a user would not reach the other workers until the TTL ran out
+AUTH_USER_CACHE = os.environ.get('AUTH_USER_CACHE', str(CACHE_BACKEND in ('redis', 'file'))) == 'True'
+AUTH_USER_CACHE_TTL = 5 * 60
+# Replica reads rely on the write pins (myapp.db_router) kept in this cache: with a per-process one a
+# user's next request can land on a worker that never saw the pin and read their write from a lagging replica
+REPLICA_READS = os.environ.get('REPLICA_READS', str(CACHE_BACKEND in ('redis', 'file'))) == 'True'
+
+# Live order events (myapp.events); use myapp.events.RedisBroker with more than one worker
+ORDER_EVENTS_BROKER = os.environ.get('ORDER_EVENTS_BROKER', 'myapp.events.InProcessBroker')
+ORDER_EVENTS_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+ORDER_EVENTS_HEARTBEAT = 15  # seconds between keep-alive comments
+ORDER_EVENTS_RETRY_MS = 3000
+ORDER_EVENTS_TOKEN_SECONDS = 60  # lifetime of the ?token= that opens a stream
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -97,9 +162,26 @@ TIME_ZONE = 'UTC'
 USE_I18N = True
 USE_TZ = True
 
+# Campus time zone: "today", weeks and months in analytics are calendar periods here (myapp.dates)
+BUSINESS_TIME_ZONE = os.environ.get('BUSINESS_TIME_ZONE', 'Asia/Kolkata')
+
 # Static files
 STATIC_URL = 'static/'
 
+# Uploaded media (menu images, see myapp.images)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', BASE_DIR / 'media'))
+MENU_IMAGE_SIZES = {
+    'thumb': 96,
+    'small': 320,
+    'medium': 640,
+    'large': 1600,
+}
+# Rendition returned as a menu item's image_url
+MENU_IMAGE_DEFAULT_VARIANT = 'large'
+MENU_IMAGE_QUALITY = 82
+MENU_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -114,13 +196,35 @@ AUTHENTICATION_BACKENDS = [
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'myapp.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
 }
 
+# Bulk menu import/export (myapp.menu_bulk)
+MENU_IMPORT_MAX_ROWS = 5000
+MENU_BULK_BATCH_SIZE = 500
+
+# Request metrics (myapp.metrics), served at /api/metrics/
+# With several worker processes, point METRICS_MULTIPROC_DIR at a directory they share
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+METRICS_FLUSH_SECONDS = 5
+
+# Finance exports (myapp.exports): rows fetched per round trip and per Parquet row group
+EXPORT_CHUNK_SIZE = 2000
+
+# Keyset pagination for list endpoints (myapp.pagination)
+KEYSET_PAGE_SIZE = 50
+KEYSET_MAX_PAGE_SIZE = 200
+# Keep bare JSON list responses for the current frontend; the cursor goes in the Link header
+KEYSET_PAGINATION_COMPAT = os.environ.get('KEYSET_PAGINATION_COMPAT', 'True') == 'True'
+# Orders one bulk status request may move
+ORDER_BULK_STATUS_MAX = 200
+# Admin order change feed (myapp.changes): seconds of recent changes re-sent to cover late commits
+ORDER_CHANGES_OVERLAP = 5
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
@@ -143,6 +247,9 @@ else:
     CORS_ALLOW_ALL_ORIGINS = True
     CORS_ALLOW_CREDENTIALS = True
 
+# Let the frontend read the pagination headers
+CORS_EXPOSE_HEADERS = ['Link', 'X-Next-Cursor']
+
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -151,3 +258,10 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = 'srisabari.n555@gmail.com'  # Your Gmail address
 EMAIL_HOST_PASSWORD = 'your-app-password-here'  # You need to generate an App Password
 DEFAULT_FROM_EMAIL = 'Canteen Management <srisabari.n555@gmail.com>'
+
+# Email outbox worker (python manage.py send_outbox_emails)
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 6
+EMAIL_OUTBOX_RETRY_DELAY = 60  # seconds, doubled after every failed attempt
+EMAIL_OUTBOX_MAX_RETRY_DELAY = 3600
+EMAIL_OUTBOX_LEASE_SECONDS = 300
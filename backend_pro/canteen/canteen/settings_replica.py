@@ -0,0 +1,32 @@
+"""
+Local profile with a read replica: two SQLite files stand in for the MySQL
+primary and its replica.
+
+    python manage.py migrate --settings=canteen.settings_replica
+    python manage.py migrate --database=replica --settings=canteen.settings_replica
+    python manage.py runserver --settings=canteen.settings_replica
+    python manage.py test myapp --settings=canteen.settings_replica
+
+Nothing copies rows between the files, so whatever a replica route returns
+shows which database answered it. Copy primary.sqlite3 over replica.sqlite3
+to let the "replica" catch up. Under the test runner the replica mirrors
+the test database and replica routes read it through the primary's
+connection (myapp.db_router.replica_alias).
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+# runserver is a single process, so its local memory cache holds every pin
+REPLICA_READS = True
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'primary.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
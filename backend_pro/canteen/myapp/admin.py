@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, FoodCourt, MenuItem, Order, OrderItem, WalletTransaction
+from .models import User, FoodCourt, MenuItem, Order, OrderItem, WalletTransaction, EmailOutbox, DailySales, DailyItemSales
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -15,8 +15,10 @@ class UserAdmin(BaseUserAdmin):
 
 @admin.register(FoodCourt)
 class FoodCourtAdmin(admin.ModelAdmin):
-    list_display = ['name', 'admin', 'is_open', 'avg_preparation_time', 'active_staff_count']
+    list_display = ['name', 'admin', 'is_open', 'avg_preparation_time', 'active_staff_count', 'active_order_count',
+                    'max_active_orders', 'max_waiting_time']
     list_filter = ['is_open']
+    readonly_fields = ['active_order_count']
     search_fields = ['name', 'admin__username']
 
 @admin.register(MenuItem)
@@ -41,3 +43,19 @@ class WalletTransactionAdmin(admin.ModelAdmin):
     list_display = ['user', 'transaction_type', 'amount', 'balance_after', 'created_at']
     list_filter = ['transaction_type', 'created_at']
     search_fields = ['user__username', 'description']
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'recipient', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['recipient', 'subject']
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    list_display = ['food_court', 'day', 'order_count', 'cancelled_count', 'revenue']
+    list_filter = ['food_court', 'day']
+
+@admin.register(DailyItemSales)
+class DailyItemSalesAdmin(admin.ModelAdmin):
+    list_display = ['food_court', 'day', 'menu_item', 'quantity', 'revenue']
+    list_filter = ['food_court', 'day']
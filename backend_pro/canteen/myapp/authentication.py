@@ -0,0 +1,61 @@
+"""
+JWT authentication without a User query on every request.
+
+simplejwt's JWTAuthentication loads the whole User row for each request.
+CachedJWTAuthentication keeps the fields the views and permissions read in
+myapp.cache and builds the user from them; any other field is loaded from
+the database only if something reads it. Blocked users are refused here,
+so blocking (which invalidates the cache entry) applies to the very next
+request.
+
+An invalidation only reaches the workers that share the cache, so users are
+cached only when AUTH_USER_CACHE is on, which it is by default only with a
+shared backend (CACHE_BACKEND=redis or file). With the per-process local
+memory cache every request loads the user, as simplejwt does.
+"""
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from . import cache, db_router
+from .models import User
+
+# Everything permissions.py, UserSerializer and the request handlers read from request.user
+CACHED_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'role', 'wallet_balance', 'phone',
+    'is_blocked', 'is_active', 'is_staff', 'is_superuser', 'date_joined',
+)
+
+
+def _build_user(values):
+    # from_db wants the loaded values in model field order; the rest stay deferred
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+    return User.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        loaded = []
+
+        def load():
+            # Raises AuthenticationFailed for missing or inactive users. Always read
+            # from the primary so a block is seen at once, even on replica routes.
+            with db_router.primary():
+                user = super(CachedJWTAuthentication, self).get_user(validated_token)
+            loaded.append(user)
+            return {field: getattr(user, field) for field in CACHED_FIELDS}
+
+        values = cache.get_user_fields(user_id, load)
+        user = loaded[0] if loaded else _build_user(values)
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if user.is_blocked:
+            raise AuthenticationFailed('Your account has been blocked.', code='user_blocked')
+        return user
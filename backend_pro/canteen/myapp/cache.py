@@ -0,0 +1,119 @@
+"""
+Cache for the student facing food court endpoints and for request users.
+
+Serialized list and detail payloads are stored under versioned keys. A
+write never deletes payloads; it bumps the version so the next read misses
+and rebuilds. The list has one version, each food court detail (menu) has
+its own. Waiting times move with every order, so they are kept out of the
+long lived payloads and overlaid, with the queue-full flag, from a small
+map with a short TTL.
+
+The user an access token belongs to is cached the same way, under a per
+user version (see myapp.authentication). Anything that changes a user's
+role, blocked flag, profile or balance must call invalidate_user().
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import FoodCourt
+
+LIST_VERSION_KEY = 'foodcourts:list:version'
+DETAIL_VERSION_KEY = 'foodcourts:detail:{id}:version'
+LIVE_KEY = 'foodcourts:live'
+USER_VERSION_KEY = 'auth:user:{id}:version'
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def _bump(*keys):
+    # A fresh timestamp can't collide with a version that was evicted earlier
+    version = time.time_ns()
+    cache.set_many({key: version for key in keys}, None)
+
+
+def _live_values():
+    live = cache.get(LIVE_KEY)
+    if live is None:
+        food_courts = FoodCourt.objects.only(
+            'id', 'active_order_count', 'avg_preparation_time', 'active_staff_count',
+            'max_active_orders', 'max_waiting_time'
+        )
+        live = {
+            food_court.id: {
+                'estimated_waiting_time': food_court.get_estimated_waiting_time(),
+                'is_queue_full': food_court.is_queue_full(),
+            }
+            for food_court in food_courts
+        }
+        cache.set(LIVE_KEY, live, settings.WAITING_TIME_CACHE_TTL)
+    return live
+
+
+def _overlay(payload):
+    live = _live_values().get(payload['id'])
+    if live:
+        payload.update(live)
+    return payload
+
+
+def get_food_court_list(build):
+    """Return the food court list, calling ``build()`` to serialize it on a miss."""
+    key = f'foodcourts:list:{_version(LIST_VERSION_KEY)}'
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, settings.FOOD_COURT_CACHE_TTL)
+    return [_overlay(food_court) for food_court in payload]
+
+
+def get_food_court_detail(food_court_id, build):
+    """Return one food court with its menu, calling ``build()`` to serialize it on a miss."""
+    key = f'foodcourts:detail:{food_court_id}:{_version(DETAIL_VERSION_KEY.format(id=food_court_id))}'
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, settings.FOOD_COURT_CACHE_TTL)
+    return _overlay(payload)
+
+
+def invalidate_food_court(food_court_id):
+    """Food court settings changed: both the list and its detail are stale."""
+    def bump():
+        _bump(LIST_VERSION_KEY, DETAIL_VERSION_KEY.format(id=food_court_id))
+        cache.delete(LIVE_KEY)
+    transaction.on_commit(bump)
+
+
+def invalidate_menu(food_court_id):
+    """A menu item changed: only the food court detail is stale."""
+    transaction.on_commit(lambda: _bump(DETAIL_VERSION_KEY.format(id=food_court_id)))
+
+
+def get_user_fields(user_id, load):
+    """
+    Return the cached field values of a user, calling ``load()`` for them on a
+    miss, or every time unless AUTH_USER_CACHE is on.
+    """
+    if not settings.AUTH_USER_CACHE:
+        return load()
+    key = f'auth:user:{user_id}:{_version(USER_VERSION_KEY.format(id=user_id))}'
+    values = cache.get(key)
+    if values is None:
+        values = load()
+        cache.set(key, values, settings.AUTH_USER_CACHE_TTL)
+    return values
+
+
+def invalidate_user(user_id):
+    """The user's row changed or was deleted: the next request reloads it."""
+    transaction.on_commit(lambda: _bump(USER_VERSION_KEY.format(id=user_id)))
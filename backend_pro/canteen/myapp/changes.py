@@ -0,0 +1,44 @@
+"""
+Change feed for the admin order queue.
+
+Clients keep a cursor, the ``(updated_at, id)`` position of the last change
+they have seen, and ask for the orders changed after it, in change order.
+Every status change saves the order, so ``updated_at`` moves forward and
+the row shows up again after the cursor.
+
+``updated_at`` is stamped when a transaction writes the row, not when it
+commits, so a slow transaction can commit a change older than one a client
+has already read. The cursor handed back after the last page therefore
+never goes past ORDER_CHANGES_OVERLAP seconds ago: recent changes are sent
+again on the next poll, and clients replace orders by id.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .pagination import encode_cursor
+
+
+def changes_since(queryset, cursor, limit):
+    """
+    Return (rows, next_cursor, has_more) for the rows of ``queryset``
+    changed after ``cursor`` (an (updated_at, id) pair or None).
+    """
+    queryset = queryset.order_by('updated_at', 'id')
+    if cursor is not None:
+        value, pk = cursor
+        # (updated_at, id) > (value, pk), written so the index sees a range on updated_at
+        queryset = queryset.filter(updated_at__gte=value).exclude(updated_at=value, id__lte=pk)
+
+    rows = list(queryset[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if has_more:
+        return rows, encode_cursor(rows[-1].updated_at, rows[-1].pk), has_more
+
+    settled = timezone.now() - timedelta(seconds=settings.ORDER_CHANGES_OVERLAP)
+    position = (rows[-1].updated_at, rows[-1].pk) if rows else cursor
+    if position is None or position[0] > settled:
+        position = (settled, 0)
+    return rows, encode_cursor(*position), has_more
@@ -0,0 +1,48 @@
+"""
+Conditional GET for the polled list endpoints.
+
+A list's validator is the newest change timestamp plus the row count in its
+scope, taken with one aggregate query that the (scope, timestamp) indexes
+answer without reading rows. When the client's If-None-Match (or
+If-Modified-Since) still matches, the view returns 304 before querying the
+page or running a serializer. The count catches deleted rows, which leave
+no newer timestamp behind. If-Modified-Since only has one second
+resolution, so clients should revalidate with the ETag (browsers do).
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def list_validators(request, queryset, field='updated_at'):
+    """Return (etag, last_modified) for ``queryset`` as listed for ``request``."""
+    state = queryset.order_by().aggregate(last=Max(field), count=Count('pk'))
+    last_modified = state['last']
+    # The page served depends on the query string (cursor, page size, envelope)
+    raw = '|'.join([
+        str(request.user.pk),
+        request.get_full_path(),
+        str(state['count']),
+        last_modified.isoformat() if last_modified else '',
+    ])
+    return f'W/"{hashlib.sha256(raw.encode()).hexdigest()[:32]}"', last_modified
+
+
+def conditional_list(request, queryset, build_response, field='updated_at'):
+    """
+    Answer with 304 when the client's copy of the list is current, else with
+    ``build_response()``. Either way the response carries the validators.
+    """
+    etag, last_modified = list_validators(request, queryset, field)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = build_response()
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    # Browsers may keep the list but must revalidate it on every request
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,75 @@
+"""
+Calendar windows in the campus time zone.
+
+Analytics must never filter with ``created_at__date``: that wraps the column
+in a date conversion, which stops MySQL using an index on it, and it uses
+the database time zone rather than the campus one. These helpers turn a
+calendar day, week or month in BUSINESS_TIME_ZONE into a half-open
+``[start, end)`` pair of aware datetimes to filter ``created_at`` with.
+"""
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils import timezone
+
+PERIODS = ('day', 'week', 'month')
+
+
+def business_timezone():
+    return ZoneInfo(settings.BUSINESS_TIME_ZONE)
+
+
+def local_today():
+    return timezone.localdate(timezone=business_timezone())
+
+
+def local_date(value):
+    """The campus calendar date of an aware datetime."""
+    return timezone.localtime(value, business_timezone()).date()
+
+
+def start_of_day(day):
+    return datetime.combine(day, time.min, tzinfo=business_timezone())
+
+
+def day_range(day=None):
+    day = day or local_today()
+    return start_of_day(day), start_of_day(day + timedelta(days=1))
+
+
+def week_range(day=None):
+    """Monday to Monday around ``day``."""
+    day = day or local_today()
+    monday = day - timedelta(days=day.weekday())
+    return start_of_day(monday), start_of_day(monday + timedelta(days=7))
+
+
+def month_range(day=None):
+    day = day or local_today()
+    first = day.replace(day=1)
+    next_first = (first + timedelta(days=32)).replace(day=1)
+    return start_of_day(first), start_of_day(next_first)
+
+
+def period_range(period, day=None):
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+    return {'day': day_range, 'week': week_range, 'month': month_range}[period](day)
+
+
+def window_from_params(params):
+    """
+    Read ``period`` (day/week/month, default day) and ``date`` (YYYY-MM-DD,
+    default today) from query params. Returns (period, start, end); raises
+    ValueError for bad input.
+    """
+    period = params.get('period', 'day')
+    day = params.get('date')
+    if day:
+        try:
+            day = date.fromisoformat(day)
+        except ValueError:
+            raise ValueError("date must be formatted YYYY-MM-DD")
+    start, end = period_range(period, day or None)
+    return period, start, end
@@ -0,0 +1,125 @@
+"""
+Read replica routing.
+
+When a replica alias is configured (DATABASE_REPLICA_ALIAS in DATABASES),
+GET requests to the routes in REPLICA_READ_ROUTES read from it: analytics,
+the order/wallet/user lists and exports. Everything else, and every write,
+uses the primary.
+
+Replicas lag. After a user sends a successful write, their requests are
+pinned to the primary for REPLICA_PIN_SECONDS so they always read what
+they just wrote. The pin is kept in the cache, keyed by the user id in the
+request's access token, so it only reaches every worker through a shared
+cache: REPLICA_READS is on by default only with CACHE_BACKEND=redis or
+file, and with it off every read uses the primary.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+PIN_KEY = 'db:pin:user:{id}'
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+
+def replica_alias():
+    alias = settings.DATABASE_REPLICA_ALIAS
+    if not settings.REPLICA_READS or alias not in settings.DATABASES:
+        return None
+    mirror = settings.DATABASES[alias].get('TEST', {}).get('MIRROR')
+    if mirror and _same_database(connections[alias].settings_dict, connections[mirror].settings_dict):
+        # Under the test runner a TEST MIRROR is the primary's test database; reading it through
+        # the primary's connection sees the test's uncommitted rows and takes no extra SQLite locks
+        return mirror
+    return alias
+
+
+def _same_database(a, b):
+    return all(a.get(key) == b.get(key) for key in ('ENGINE', 'NAME', 'HOST', 'PORT'))
+
+
+def read_alias():
+    """The alias reads are routed to right now; lets a lazy stream keep it after the view returns."""
+    return (_use_replica.get() and replica_alias()) or 'default'
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside the block, even on a replica route."""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the primary's rows
+        return True
+
+
+def _request_user_id(request):
+    # Only the token's signature is checked; no database or cache lookup
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    try:
+        return auth.get_validated_token(raw_token)[api_settings.USER_ID_CLAIM]
+    except (InvalidToken, KeyError):
+        return None
+
+
+def pin_to_primary(user_id):
+    cache.set(PIN_KEY.format(id=user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return user_id is not None and bool(cache.get(PIN_KEY.format(id=user_id)))
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._replica_previous = None
+        try:
+            response = self.get_response(request)
+        finally:
+            # Not a token reset: under ASGI process_view runs in a copy of this context
+            if request._replica_previous is not None:
+                _use_replica.set(request._replica_previous)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            user_id = _request_user_id(request)
+            if user_id is not None:
+                pin_to_primary(user_id)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in SAFE_METHODS
+            and replica_alias()
+            and request.resolver_match.url_name in settings.REPLICA_READ_ROUTES
+            and not is_pinned(_request_user_id(request))
+        ):
+            request._replica_previous = _use_replica.get()
+            _use_replica.set(True)
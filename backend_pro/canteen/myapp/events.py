@@ -0,0 +1,185 @@
+"""
+Live order events, pushed to browsers as Server-Sent Events.
+
+Every order change is published on two channels: ``food_court:<id>`` (read
+by that court's admin) and ``student:<id>`` (read by the student who placed
+it). Messages are JSON strings carrying the serialized order.
+
+The broker is pluggable (ORDER_EVENTS_BROKER). InProcessBroker, the
+default, only reaches clients connected to the same process, so it suits a
+single worker. RedisBroker fans events out through Redis pub/sub and works
+with any number of workers; it needs the ``redis`` package.
+
+EventSource cannot send headers, so browsers open the stream with a
+StreamToken in the query string: it expires after ORDER_EVENTS_TOKEN_SECONDS
+and is refused everywhere else, so access tokens stay out of URLs and logs.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from rest_framework_simplejwt.tokens import Token
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class StreamToken(Token):
+    token_type = 'order_stream'
+    lifetime = timedelta(seconds=settings.ORDER_EVENTS_TOKEN_SECONDS)
+
+
+def food_court_channel(food_court_id):
+    return f'food_court:{food_court_id}'
+
+
+def student_channel(student_id):
+    return f'student:{student_id}'
+
+
+class InProcessSubscription:
+    def __init__(self, broker, channel, queue):
+        self.broker = broker
+        self.channel = channel
+        self.queue = queue
+
+    async def get(self, timeout):
+        """Wait up to ``timeout`` seconds for the next message; None if there was none."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker._remove(self.channel, self)
+
+
+class InProcessBroker:
+    # Messages a slow client may fall behind by before newer ones are dropped
+    queue_size = 100
+
+    def __init__(self):
+        self._subscribers = defaultdict(dict)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        # Called from sync views running in worker threads, so hand over to each listener's loop
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, {}).items())
+        for subscription, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, subscription.queue, message)
+            except RuntimeError:
+                # The listener's event loop has shut down
+                self._remove(channel, subscription)
+
+    @staticmethod
+    def _deliver(queue, message):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            pass
+
+    async def subscribe(self, channel):
+        subscription = InProcessSubscription(self, channel, asyncio.Queue(self.queue_size))
+        with self._lock:
+            self._subscribers[channel][subscription] = asyncio.get_running_loop()
+        return subscription
+
+    def _remove(self, channel, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(channel, {})
+            subscribers.pop(subscription, None)
+            if not subscribers:
+                self._subscribers.pop(channel, None)
+
+
+class RedisSubscription:
+    def __init__(self, client, pubsub):
+        self.client = client
+        self.pubsub = pubsub
+
+    async def get(self, timeout):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        data = message['data']
+        return data.decode() if isinstance(data, bytes) else data
+
+    async def close(self):
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+class RedisBroker:
+    prefix = 'canteen:orders:'
+
+    def __init__(self, url=None):
+        import redis
+
+        self.url = url or settings.ORDER_EVENTS_REDIS_URL
+        self.client = redis.Redis.from_url(self.url)
+
+    def publish(self, channel, message):
+        self.client.publish(self.prefix + channel, message)
+
+    async def subscribe(self, channel):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self.prefix + channel)
+        return RedisSubscription(client, pubsub)
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.ORDER_EVENTS_BROKER)()
+    return _broker
+
+
+def publish_order(order, data, event='order.updated'):
+    """
+    Publish ``data`` (the serialized order) to its food court and student
+    once the current transaction commits.
+    """
+    message = json.dumps({'event': event, 'order': data}, default=str)
+
+    def send():
+        broker = get_broker()
+        broker.publish(food_court_channel(order.food_court_id), message)
+        broker.publish(student_channel(order.student_id), message)
+
+    transaction.on_commit(send)
+
+
+def format_sse(data, event=None):
+    lines = [f'event: {event}'] if event else []
+    lines += [f'data: {line}' for line in data.splitlines()]
+    return '\n'.join(lines) + '\n\n'
+
+
+async def stream(channel, heartbeat=None):
+    """Yield Server-Sent Events for ``channel`` until the client disconnects."""
+    heartbeat = heartbeat or settings.ORDER_EVENTS_HEARTBEAT
+    subscription = await get_broker().subscribe(channel)
+    try:
+        # Tell EventSource how long to wait before reconnecting
+        yield f'retry: {settings.ORDER_EVENTS_RETRY_MS}\n\n'
+        while True:
+            message = await subscription.get(heartbeat)
+            if message is None:
+                # Comment line keeps proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+            else:
+                yield format_sse(message, 'order')
+    finally:
+        await subscription.close()
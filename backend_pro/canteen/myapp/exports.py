@@ -0,0 +1,188 @@
+"""
+Streaming exports of the order and wallet ledgers for finance.
+
+Rows are read in primary key order, one bounded keyset query per chunk
+(see streaming), and written out as they arrive, so memory stays flat
+however many rows a dump holds. CSV and NDJSON need nothing extra; Parquet
+needs the optional ``pyarrow`` package and writes one row group per chunk.
+"""
+import importlib.util
+import json
+from collections import namedtuple
+from datetime import date, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import dates, streaming
+from .models import Order, OrderItem, WalletTransaction
+
+# columns are (header, lookup, kind); kind picks the Parquet type
+Dataset = namedtuple('Dataset', 'model columns date_field court_field')
+
+DATASETS = {
+    'orders': Dataset(Order, (
+        ('id', 'id', 'int'),
+        ('student_id', 'student_id', 'int'),
+        ('food_court_id', 'food_court_id', 'int'),
+        ('status', 'status', 'text'),
+        ('total_amount', 'total_amount', 'decimal'),
+        ('created_at', 'created_at', 'datetime'),
+        ('updated_at', 'updated_at', 'datetime'),
+    ), 'created_at', 'food_court'),
+    'order-items': Dataset(OrderItem, (
+        ('id', 'id', 'int'),
+        ('order_id', 'order_id', 'int'),
+        ('food_court_id', 'order__food_court_id', 'int'),
+        ('order_created_at', 'order__created_at', 'datetime'),
+        ('order_status', 'order__status', 'text'),
+        ('menu_item_id', 'menu_item_id', 'int'),
+        ('menu_item_name', 'menu_item__name', 'text'),
+        ('quantity', 'quantity', 'int'),
+        ('price', 'price', 'decimal'),
+    ), 'order__created_at', 'order__food_court'),
+    # Top-ups have no order, so a food court filter keeps only order payments and refunds
+    'wallet-transactions': Dataset(WalletTransaction, (
+        ('id', 'id', 'int'),
+        ('user_id', 'user_id', 'int'),
+        ('transaction_type', 'transaction_type', 'text'),
+        ('amount', 'amount', 'decimal'),
+        ('balance_after', 'balance_after', 'decimal'),
+        ('description', 'description', 'text'),
+        ('order_id', 'order_id', 'int'),
+        ('created_at', 'created_at', 'datetime'),
+    ), 'created_at', 'order__food_court'),
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def parquet_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def check_format(fmt):
+    if fmt not in FORMATS:
+        raise ExportError(f"Format must be one of {', '.join(FORMATS)}")
+    if fmt == 'parquet' and not parquet_available():
+        raise ExportError('Parquet exports need the pyarrow package')
+
+
+def parse_days(start_day=None, end_day=None):
+    """
+    Campus days ``start_day`` to ``end_day`` (YYYY-MM-DD, both inclusive and
+    optional) as a half-open (start, end) pair of datetimes, either None.
+    """
+    try:
+        start_day = date.fromisoformat(start_day) if start_day else None
+        end_day = date.fromisoformat(end_day) if end_day else None
+    except ValueError:
+        raise ExportError('Dates must be formatted YYYY-MM-DD')
+    if start_day and end_day and end_day < start_day:
+        raise ExportError('The end date is before the start date')
+    return (
+        dates.start_of_day(start_day) if start_day else None,
+        dates.start_of_day(end_day + timedelta(days=1)) if end_day else None,
+    )
+
+
+def rows(name, start=None, end=None, food_court_ids=None, using=None):
+    """Tuples of ``name``'s columns in primary key order, filtered to a window and food courts."""
+    dataset = DATASETS[name]
+    queryset = dataset.model.objects.using(using) if using else dataset.model.objects.all()
+    if start:
+        queryset = queryset.filter(**{f'{dataset.date_field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{dataset.date_field}__lt': end})
+    if food_court_ids:
+        queryset = queryset.filter(**{f'{dataset.court_field}__in': food_court_ids})
+    return queryset.order_by('pk').values_list(*[lookup for _, lookup, _ in dataset.columns])
+
+
+def encoder(name, fmt):
+    """A streaming.Encoder writing ``name`` as ``fmt``: str pieces for csv and ndjson, bytes for parquet."""
+    headers = [header for header, _, _ in DATASETS[name].columns]
+    if fmt == 'csv':
+        return streaming.CsvEncoder(headers)
+    if fmt == 'ndjson':
+        return _NdjsonEncoder(headers)
+    return _ParquetEncoder(DATASETS[name].columns)
+
+
+def stream(name, fmt, queryset, chunk_size):
+    """The export as a plain iterator of pieces, for the management command."""
+    return streaming.body(encoder(name, fmt), queryset, chunk_size)
+
+
+class _NdjsonEncoder(streaming.Encoder):
+    def __init__(self, headers):
+        self.headers = headers
+
+    def encode(self, chunk):
+        return ''.join(json.dumps(dict(zip(self.headers, row)), cls=DjangoJSONEncoder) + '\n' for row in chunk)
+
+
+class _Sink:
+    # Write-only file for pyarrow; take() hands back what was written since the last call
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+class _ParquetEncoder(streaming.Encoder):
+    def __init__(self, columns):
+        self.columns = columns
+
+    def start(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {
+            'int': pa.int64(),
+            'text': pa.string(),
+            'decimal': pa.decimal128(12, 2),
+            'datetime': pa.timestamp('us', tz='UTC'),
+        }
+        self.pa = pa
+        self.schema = pa.schema([(header, types[kind]) for header, _, kind in self.columns])
+        self.sink = _Sink()
+        self.writer = pq.ParquetWriter(self.sink, self.schema)
+        return self.sink.take()
+
+    def encode(self, chunk):
+        pa = self.pa
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), self.schema)]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        return self.sink.take()
+
+    def finish(self):
+        self.writer.close()
+        return self.sink.take()
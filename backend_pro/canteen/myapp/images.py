@@ -0,0 +1,109 @@
+"""
+Content-addressed storage for menu item images.
+
+Uploaded images are keyed by the SHA-256 of their bytes and stored once, as
+a set of WebP renditions (see MENU_IMAGE_SIZES), under
+``menu-images/<aa>/<digest>/<variant>.webp`` in the default storage. The
+API only ever returns URLs to these files; since a digest never changes
+content they are served with a strong ETag and a one year cache lifetime.
+"""
+import base64
+import binascii
+import hashlib
+import re
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import Resolver404, resolve, reverse
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+DATA_URI_RE = re.compile(r'^data:image/[\w.+-]+;base64,(?P<data>.*)$', re.DOTALL)
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def is_data_uri(value):
+    return bool(value) and value.startswith('data:')
+
+
+def decode_data_uri(value):
+    match = DATA_URI_RE.match(value)
+    if not match:
+        raise InvalidImage("Only base64 encoded image data URIs are supported.")
+    try:
+        return base64.b64decode(match.group('data'), validate=False)
+    except (binascii.Error, ValueError):
+        raise InvalidImage("Image data is not valid base64.")
+
+
+def digest_from_url(value, request=None):
+    """
+    Return the digest if ``value`` is one of our own image URLs (as returned
+    by the API and sent back by the admin UI on edit), else None. Absolute
+    URLs must be on this site's host; the image must already be stored.
+    """
+    parts = urlsplit(value or '')
+    if parts.netloc and (request is None or parts.netloc != request.get_host()):
+        return None
+    try:
+        match = resolve(parts.path)
+    except Resolver404:
+        return None
+    digest = match.kwargs.get('digest', '')
+    if (
+        match.url_name != 'menu-image'
+        or not DIGEST_RE.match(digest)
+        or match.kwargs['variant'] not in settings.MENU_IMAGE_SIZES
+        or not default_storage.exists(image_name(digest, settings.MENU_IMAGE_DEFAULT_VARIANT))
+    ):
+        return None
+    return digest
+
+
+def image_name(digest, variant):
+    return f'menu-images/{digest[:2]}/{digest}/{variant}.webp'
+
+
+def store_image(data):
+    """Store the renditions for ``data`` if they aren't stored yet and return its digest."""
+    if len(data) > settings.MENU_IMAGE_MAX_BYTES:
+        raise InvalidImage(f"Image is larger than {settings.MENU_IMAGE_MAX_BYTES // (1024 * 1024)} MB.")
+
+    digest = hashlib.sha256(data).hexdigest()
+    missing = [
+        (variant, size) for variant, size in settings.MENU_IMAGE_SIZES.items()
+        if not default_storage.exists(image_name(digest, variant))
+    ]
+    if not missing:
+        return digest
+
+    try:
+        with Image.open(BytesIO(data)) as source:
+            source = ImageOps.exif_transpose(source)
+            if source.mode not in ('RGB', 'RGBA'):
+                source = source.convert('RGBA' if 'transparency' in source.info else 'RGB')
+            for variant, size in missing:
+                rendition = source.copy()
+                rendition.thumbnail((size, size))
+                buffer = BytesIO()
+                rendition.save(buffer, 'WEBP', quality=settings.MENU_IMAGE_QUALITY)
+                default_storage.save(image_name(digest, variant), ContentFile(buffer.getvalue()))
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise InvalidImage("Uploaded file is not a valid image.")
+    return digest
+
+
+def image_url(digest, variant, request=None):
+    url = reverse('menu-image', args=[digest, variant])
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def image_urls(digest, request=None):
+    """URLs for every rendition of an image, keyed by variant name."""
+    return {variant: image_url(digest, variant, request) for variant in settings.MENU_IMAGE_SIZES}
@@ -0,0 +1,32 @@
+"""
+Verify with EXPLAIN that every hot query uses its composite index.
+
+Run: python manage.py check_query_plans [--verbose-plans]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from myapp.query_plans import check_query_plans
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot queries and fail if any of them does not use its index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print the full plan for every query')
+
+    def handle(self, *args, **options):
+        failures = []
+        self.stdout.write(f'Checking query plans on {connection.vendor}')
+        for label, index_name, uses_index, plan in check_query_plans():
+            if uses_index is None:
+                self.stdout.write(f'  SKIP  {label}: not checkable on {connection.vendor}')
+            elif uses_index:
+                self.stdout.write(self.style.SUCCESS(f'  OK    {label} -> {index_name}'))
+            else:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f'  FAIL  {label}: expected {index_name}'))
+            if options['verbose_plans'] or uses_index is False:
+                self.stdout.write('        ' + plan.replace('\n', '\n        '))
+        if failures:
+            raise CommandError(f'{len(failures)} hot quer{"y does" if len(failures) == 1 else "ies do"} not use their index')
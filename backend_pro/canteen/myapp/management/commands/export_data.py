@@ -0,0 +1,51 @@
+"""
+Dump orders, order items or the wallet ledger to a file, streamed in chunks.
+
+python manage.py export_data orders --format parquet --from 2026-09-01 --to 2026-09-30 --output orders.parquet
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import exports
+
+
+class Command(BaseCommand):
+    help = 'Export orders, order items or wallet transactions as CSV, NDJSON or Parquet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(exports.DATASETS))
+        parser.add_argument('--format', default='csv', choices=list(exports.FORMATS), dest='fmt')
+        parser.add_argument('--from', dest='start_day', help='First campus day to include (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='end_day', help='Last campus day to include (YYYY-MM-DD)')
+        parser.add_argument('--food-court', type=int, action='append', dest='food_courts',
+                            help='Only export this food court (repeatable)')
+        parser.add_argument('--output', help='File to write; defaults to stdout for csv and ndjson')
+        parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE,
+                            help='Rows fetched from the database at a time')
+        parser.add_argument('--database', default='default', help='Database alias to read from, e.g. replica')
+
+    def handle(self, *args, **options):
+        fmt = options['fmt']
+        try:
+            exports.check_format(fmt)
+            start, end = exports.parse_days(options['start_day'], options['end_day'])
+        except exports.ExportError as e:
+            raise CommandError(str(e))
+        if fmt == 'parquet' and not options['output']:
+            raise CommandError('Parquet exports need --output')
+
+        rows = exports.rows(options['dataset'], start, end, options['food_courts'], using=options['database'])
+        chunks = exports.stream(options['dataset'], fmt, rows, options['chunk_size'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        if fmt == 'parquet':
+            output = open(options['output'], 'wb')
+        else:
+            output = open(options['output'], 'w', newline='', encoding='utf-8')
+        with output as f:
+            for chunk in chunks:
+                f.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f"Wrote {options['dataset']} to {options['output']}"))
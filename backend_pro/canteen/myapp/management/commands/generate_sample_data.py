@@ -0,0 +1,304 @@
+"""
+Generate realistic order history at scale.
+
+Creates sample food courts (with admins and menus) and students, then for
+every campus day in the window writes that day's orders, order lines and
+wallet ledger with bulk_create in large batches. Orders follow a meal-time
+curve (breakfast, a lunch rush, evening snacks and dinner), weekends are
+quieter, and some courts, dishes and students are much more popular than
+others.
+
+Re-running is safe: existing sample courts, menus and students are reused
+and days that already have sample orders are skipped, so a later run only
+adds the days since. Wallet balances chain forward from the students'
+current balances, so days before the newest sample ledger entry are never
+backfilled. Each day is written in its own transaction. The
+queue counters and sales rollups of the sample courts are rebuilt at the
+end.
+
+To stay fast, ids are allocated up front (so lines and ledger entries can
+point at orders without reading them back), timestamps are written as
+generated rather than by auto_now, and the student password is hashed once.
+Nothing else should write orders or wallet transactions while it runs.
+
+Run: python manage.py generate_sample_data --courts 5 --students 2000 --days 30 --orders-per-day 1500
+"""
+import random
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max, OuterRef, Subquery
+
+from myapp import cache, dates, queue, rollups
+from myapp.models import FoodCourt, MenuItem, Order, OrderItem, User, WalletTransaction
+
+COURT_PREFIX = 'Sample Court '
+ADMIN_PREFIX = 'sample_admin_'
+STUDENT_PREFIX = 'sample_student_'
+
+DISHES = (
+    ('Breakfast', ('Masala Dosa', 'Idli Sambar', 'Poha', 'Aloo Paratha', 'Upma')),
+    ('Meals', ('Veg Thali', 'Chicken Biryani', 'Rajma Chawal', 'Chole Bhature', 'Paneer Butter Masala')),
+    ('Snacks', ('Samosa', 'Vada Pav', 'Veg Sandwich', 'French Fries', 'Pav Bhaji')),
+    ('Chinese', ('Veg Noodles', 'Fried Rice', 'Manchurian', 'Spring Roll', 'Chilli Paneer')),
+    ('Beverages', ('Masala Chai', 'Filter Coffee', 'Cold Coffee', 'Lassi', 'Fresh Lime Soda')),
+)
+
+# Relative order volume by hour of the campus day
+HOURLY_WEIGHTS = {
+    8: 4, 9: 6, 10: 4, 11: 6, 12: 18, 13: 22, 14: 12, 15: 5,
+    16: 7, 17: 8, 18: 5, 19: 7, 20: 8, 21: 4,
+}
+ITEM_COUNT_WEIGHTS = {1: 50, 2: 30, 3: 15, 4: 5}
+QUANTITY_WEIGHTS = {1: 80, 2: 15, 3: 5}
+TOP_UPS = (Decimal('200.00'), Decimal('500.00'), Decimal('1000.00'))
+CANCELLED_SHARE = 0.04
+
+
+class WeightedChoice:
+    """rng.choices(values, cum_weights) with the cumulative weights built once."""
+
+    def __init__(self, values, weights):
+        self.values = list(values)
+        self.cumulative = list(accumulate(weights))
+
+    def pick(self, rng):
+        return self.values[bisect(self.cumulative, rng.random() * self.cumulative[-1])]
+
+
+@contextmanager
+def timestamps_as_given(*models):
+    """Let bulk_create keep created_at/updated_at values instead of auto_now(_add) stamping now()."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def menu_names(size):
+    """(category, name) of the first ``size`` dishes, numbering repeats once DISHES runs out."""
+    dishes = [(category, dish) for category, names in DISHES for dish in names]
+    for i in range(size):
+        category, dish = dishes[i % len(dishes)]
+        repeat = i // len(dishes)
+        yield category, f'{dish} {repeat + 1}' if repeat else dish
+
+
+HOURS = WeightedChoice(HOURLY_WEIGHTS, HOURLY_WEIGHTS.values())
+ITEM_COUNTS = WeightedChoice(ITEM_COUNT_WEIGHTS, ITEM_COUNT_WEIGHTS.values())
+QUANTITIES = WeightedChoice(QUANTITY_WEIGHTS, QUANTITY_WEIGHTS.values())
+
+
+class Command(BaseCommand):
+    help = 'Bulk generate sample food courts, students and order history (idempotent)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courts', type=int, default=5)
+        parser.add_argument('--menu-size', type=int, default=25, help='Menu items per food court')
+        parser.add_argument('--students', type=int, default=2000)
+        parser.add_argument('--days', type=int, default=30, help='Days of history, ending yesterday')
+        parser.add_argument('--orders-per-day', type=int, default=1500,
+                            help='Orders on an average weekday across all courts')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT')
+        parser.add_argument('--seed', type=int, default=1, help='Same seed, same data')
+        parser.add_argument('--password', default='student123', help='Password of every sample user')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.seed = options['seed']
+        password = make_password(options['password'])
+
+        courts = self.ensure_courts(options['courts'], password)
+        # A few courts and dishes take most orders
+        court_choice = WeightedChoice(courts, [1 / (rank + 1) for rank in range(len(courts))])
+        menus = {
+            court_id: WeightedChoice(items, [1 / (rank + 1) for rank in range(len(items))])
+            for court_id, items in self.ensure_menus(courts, options['menu_size']).items()
+        }
+        students = self.ensure_users(
+            STUDENT_PREFIX, [f'{STUDENT_PREFIX}{i + 1:06d}' for i in range(options['students'])], 'student', password
+        )
+        weights_rng = random.Random(self.seed)
+        student_choice = WeightedChoice(students, [weights_rng.paretovariate(1.5) for _ in students])
+        self.balances = dict(
+            User.objects.filter(username__startswith=STUDENT_PREFIX).values_list('id', 'wallet_balance')
+        )
+        self.touched = set()
+        # balance_after is chained from the current balances, so only days after the newest entry can follow it
+        newest = WalletTransaction.objects.filter(user__username__startswith=STUDENT_PREFIX).aggregate(
+            newest=Max('created_at')
+        )['newest']
+        first_day = dates.local_date(newest) + timedelta(days=1) if newest else None
+
+        today = dates.local_today()
+        generated_days = []
+        refused_days = []
+        order_total = 0
+        with timestamps_as_given(Order, WalletTransaction):
+            for offset in range(options['days'], 0, -1):
+                day = today - timedelta(days=offset)
+                if first_day and day < first_day:
+                    if not self.has_orders(day, courts):
+                        refused_days.append(day)
+                    continue
+                created = self.generate_day(day, courts, menus, court_choice, student_choice, options['orders_per_day'])
+                if created is None:
+                    continue
+                generated_days.append(day)
+                order_total += created
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f'{day}: {created} orders')
+
+        if generated_days:
+            self.reset_sequences()
+            self.save_balances()
+            court_ids = [court.id for court in courts]
+            queue.rebuild_active_order_counts(court_ids)
+            rollups.rebuild(since=generated_days[0], food_court_ids=court_ids)
+            for court_id in court_ids:
+                cache.invalidate_food_court(court_id)
+        if refused_days:
+            self.stderr.write(self.style.WARNING(
+                f'Skipped {len(refused_days)} day(s) before {first_day}: the wallet ledger already runs to '
+                f'{first_day - timedelta(days=1)} and can only be extended forwards'
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(courts)} food courts, {len(students)} students; '
+            f'{order_total} orders on {len(generated_days)} new day(s), '
+            f"{options['days'] - len(generated_days) - len(refused_days)} day(s) already present"
+        ))
+
+    def ensure_courts(self, count, password):
+        names = [f'{COURT_PREFIX}{i + 1}' for i in range(count)]
+        admins = self.ensure_users(
+            ADMIN_PREFIX, [f'{ADMIN_PREFIX}{i + 1}' for i in range(count)], 'food_court_admin', password
+        )
+        existing = set(FoodCourt.objects.filter(name__in=names).values_list('name', flat=True))
+        FoodCourt.objects.bulk_create([
+            FoodCourt(name=name, description='Generated sample data', admin_id=admin_id, active_staff_count=3)
+            for name, admin_id in zip(names, admins) if name not in existing
+        ])
+        return list(FoodCourt.objects.filter(name__in=names).order_by('id'))
+
+    def ensure_menus(self, courts, size):
+        """Create the missing dishes; returns {court id: [(menu item id, price), ...]}."""
+        wanted = list(menu_names(size))
+        names = [name for _, name in wanted]
+        have = set(MenuItem.objects.filter(food_court__in=courts, name__in=names).values_list('food_court_id', 'name'))
+        rng = random.Random(self.seed)
+        MenuItem.objects.bulk_create([
+            MenuItem(food_court=court, name=name, category=category, price=Decimal(rng.randrange(20, 160, 5)))
+            for court in courts for category, name in wanted if (court.id, name) not in have
+        ], batch_size=self.batch_size)
+
+        menus = {court.id: [] for court in courts}
+        for court_id, item_id, price in MenuItem.objects.filter(
+            food_court__in=courts, name__in=names
+        ).order_by('id').values_list('food_court_id', 'id', 'price'):
+            menus[court_id].append((item_id, price))
+        return menus
+
+    def ensure_users(self, prefix, usernames, role, password):
+        """Create the missing users; returns their ids in ``usernames`` order."""
+        # Looked up by prefix: an IN list of every username would break SQLite's parameter limit
+        existing = dict(User.objects.filter(username__startswith=prefix).values_list('username', 'id'))
+        User.objects.bulk_create([
+            User(username=username, email=f'{username}@campus.example', password=password, role=role)
+            for username in usernames if username not in existing
+        ], batch_size=self.batch_size)
+        ids = dict(User.objects.filter(username__startswith=prefix).values_list('username', 'id'))
+        return [ids[username] for username in usernames]
+
+    def has_orders(self, day, courts):
+        start, end = dates.day_range(day)
+        return Order.objects.filter(food_court__in=courts, created_at__gte=start, created_at__lt=end).exists()
+
+    @transaction.atomic
+    def generate_day(self, day, courts, menus, court_choice, student_choice, orders_per_day):
+        """Write one campus day; returns the number of orders, or None if the day already exists."""
+        if self.has_orders(day, courts):
+            return None
+        start, _ = dates.day_range(day)
+
+        rng = random.Random(f'{self.seed}:{day.isoformat()}')
+        volume = orders_per_day * (0.45 if day.weekday() >= 5 else 1) * rng.uniform(0.85, 1.15)
+        times = sorted(
+            start + timedelta(hours=HOURS.pick(rng), seconds=rng.randrange(3600), microseconds=rng.randrange(10 ** 6))
+            for _ in range(int(volume))
+        )
+
+        # Ids allocated up front so lines and ledger entries can reference orders without reading them back
+        order_id = (Order.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        line_id = (OrderItem.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        entry_id = (WalletTransaction.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        orders, lines, entries = [], [], []
+        for created_at in times:
+            court = court_choice.pick(rng)
+            student_id = student_choice.pick(rng)
+            picked = {menus[court.id].pick(rng) for _ in range(ITEM_COUNTS.pick(rng))}
+            total = Decimal('0.00')
+            for menu_item_id, price in picked:
+                quantity = QUANTITIES.pick(rng)
+                lines.append(OrderItem(id=line_id, order_id=order_id, menu_item_id=menu_item_id,
+                                       quantity=quantity, price=price))
+                line_id += 1
+                total += price * quantity
+
+            cancelled = rng.random() < CANCELLED_SHARE
+            finished_at = created_at + timedelta(minutes=rng.randint(2, 10) if cancelled else rng.randint(10, 35))
+            orders.append(Order(id=order_id, student_id=student_id, food_court_id=court.id,
+                                status='cancelled' if cancelled else 'completed', total_amount=total,
+                                created_at=created_at, updated_at=finished_at))
+
+            balance = self.balances[student_id]
+            if balance < total:
+                top_up = next((amount for amount in TOP_UPS if balance + amount >= total), total)
+                balance += top_up
+                entries.append(WalletTransaction(id=entry_id, user_id=student_id, transaction_type='credit',
+                                                 amount=top_up, description='Wallet recharge', balance_after=balance,
+                                                 created_at=created_at - timedelta(minutes=rng.randint(1, 30))))
+                entry_id += 1
+            balance -= total
+            entries.append(WalletTransaction(id=entry_id, user_id=student_id, transaction_type='debit', amount=total,
+                                             description=f'Order #{order_id} at {court.name}', order_id=order_id,
+                                             balance_after=balance, created_at=created_at))
+            entry_id += 1
+            self.balances[student_id] = balance
+            self.touched.add(student_id)
+            order_id += 1
+
+        Order.objects.bulk_create(orders, batch_size=self.batch_size)
+        OrderItem.objects.bulk_create(lines, batch_size=self.batch_size)
+        WalletTransaction.objects.bulk_create(entries, batch_size=self.batch_size)
+        return len(orders)
+
+    def reset_sequences(self):
+        # Explicit ids don't move PostgreSQL sequences (MySQL and SQLite follow the largest id)
+        statements = connection.ops.sequence_reset_sql(no_style(), [Order, OrderItem, WalletTransaction])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def save_balances(self):
+        # One UPDATE: each sample student's balance is the balance after their newest ledger entry
+        newest = WalletTransaction.objects.filter(user=OuterRef('pk')).order_by('-id').values('balance_after')[:1]
+        User.objects.filter(username__startswith=STUDENT_PREFIX, wallet_transactions__isnull=False).distinct().update(
+            wallet_balance=Subquery(newest)
+        )
+        for student_id in self.touched:
+            cache.invalidate_user(student_id)
@@ -0,0 +1,269 @@
+"""
+Lunch-rush load test for the REST API.
+
+Creates throwaway food courts, admins, menus and funded students, then runs
+one thread per simulated user against the real URL routes:
+
+- students browse the food court list and a menu, place an order and poll
+  their order list (revalidating with If-None-Match) a few times;
+- kitchen tablets poll the admin order list and move the open orders they
+  see one step along (bulk status updates).
+
+Requests go through Django's test client in this process (the default; SQL
+queries per request are counted) or, with --base-url, over HTTP to a
+running server that uses the same database. Reports requests, errors,
+throughput, p50/p95/p99 latency and status codes for each route, then
+deletes the data. SQLite locks the whole database for each write, so expect
+lock errors under concurrency there; measure against MySQL for real numbers.
+
+Run: python manage.py load_test --students 50 --tablets 2 --duration 30
+"""
+import math
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from myapp.models import FoodCourt, MenuItem, User
+
+PREFIX = 'load_test_'
+NEXT_STATUS = {'pending': 'preparing', 'preparing': 'ready', 'ready': 'completed'}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a sorted list."""
+    return values[max(math.ceil(pct / 100 * len(values)) - 1, 0)]
+
+
+class ClientTransport:
+    """In-process requests through the test client, counting SQL queries."""
+    counts_queries = True
+
+    def __init__(self, token):
+        self.client = APIClient(raise_request_exception=False, SERVER_NAME='localhost')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def request(self, method, path, data=None, headers=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(path, data, format='json', headers=headers)
+        body = response.json() if response.get('Content-Type', '').startswith('application/json') else None
+        return response.status_code, response.headers, body, len(ctx.captured_queries)
+
+    def close(self):
+        connection.close()
+
+
+class HttpTransport:
+    """Requests over HTTP to a running server; queries are not visible from here."""
+    counts_queries = False
+
+    def __init__(self, token, base_url):
+        import requests
+
+        # reverse() paths already start with /api/, so a base ending in /api means the same server root
+        self.base_url = base_url.rstrip('/').removesuffix('/api')
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'Bearer {token}'
+
+    def request(self, method, path, data=None, headers=None):
+        response = self.session.request(method, self.base_url + path, json=data, headers=headers, timeout=30)
+        body = response.json() if response.headers.get('Content-Type', '').startswith('application/json') else None
+        return response.status_code, response.headers, body, None
+
+    def close(self):
+        self.session.close()
+        connection.close()
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def add(self, route, status_code, seconds, queries):
+        with self.lock:
+            self.samples[route].append((status_code, seconds, queries))
+
+
+class VirtualUser:
+    def __init__(self, transport, recorder, options):
+        self.transport = transport
+        self.recorder = recorder
+        self.think_time = options['think_time'] / 1000
+        self.rng = random.Random()
+
+    def call(self, route, method='get', args=None, data=None, headers=None):
+        started = time.perf_counter()
+        status_code, response_headers, body, queries = self.transport.request(
+            method, reverse(route, args=args), data, headers
+        )
+        self.recorder.add(route, status_code, time.perf_counter() - started, queries)
+        return status_code, response_headers, body
+
+    def think(self):
+        if self.think_time:
+            time.sleep(self.rng.uniform(0, 2 * self.think_time))
+
+
+class Student(VirtualUser):
+    def __init__(self, transport, recorder, options, menus):
+        super().__init__(transport, recorder, options)
+        self.menus = menus
+        self.polls = options['polls']
+
+    def iteration(self):
+        self.call('foodcourt-list')
+        food_court_id = self.rng.choice(list(self.menus))
+        self.call('foodcourt-detail', args=[food_court_id])
+        self.think()
+        items = [
+            {'menu_item_id': item_id, 'quantity': self.rng.randint(1, 2)}
+            for item_id in self.rng.sample(self.menus[food_court_id], self.rng.randint(1, 3))
+        ]
+        self.call('place-order', 'post', data={'food_court': food_court_id, 'items': items})
+        etag = None
+        for _ in range(self.polls):
+            self.think()
+            status_code, headers, _ = self.call(
+                'student-order-list', headers={'If-None-Match': etag} if etag else None
+            )
+            etag = headers.get('ETag', etag)
+
+
+class Tablet(VirtualUser):
+    def __init__(self, transport, recorder, options):
+        super().__init__(transport, recorder, options)
+        self.etag = None
+        self.orders = []
+
+    def iteration(self):
+        status_code, headers, body = self.call(
+            'admin-orders', headers={'If-None-Match': self.etag} if self.etag else None
+        )
+        if status_code == 200:
+            self.etag = headers.get('ETag')
+            # A bare list in compatibility mode, else the keyset pagination envelope
+            self.orders = body['results'] if isinstance(body, dict) else body
+        by_status = defaultdict(list)
+        for order in self.orders[:30]:
+            if order['status'] in NEXT_STATUS:
+                by_status[order['status']].append(order['id'])
+        for old_status, ids in by_status.items():
+            self.call('bulk-update-order-status', 'post', data={'ids': ids, 'status': NEXT_STATUS[old_status]})
+        self.think()
+
+
+class Command(BaseCommand):
+    help = 'Simulate a lunch rush against the API and report latency percentiles per route'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courts', type=int, default=2)
+        parser.add_argument('--menu-size', type=int, default=20, help='Menu items per food court')
+        parser.add_argument('--students', type=int, default=50, help='Concurrent student threads')
+        parser.add_argument('--tablets', type=int, default=2, help='Kitchen tablet threads per food court')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+        parser.add_argument('--iterations', type=int,
+                            help='Iterations per simulated user, instead of running for --duration')
+        parser.add_argument('--polls', type=int, default=3, help='Order list polls after each order')
+        parser.add_argument('--think-time', type=float, default=0, help='Mean pause between steps in ms')
+        parser.add_argument('--base-url', help='Send requests to a running server, e.g. http://127.0.0.1:8000')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated users, courts and orders')
+
+    def handle(self, *args, **options):
+        self.cleanup()
+        try:
+            admins, menus, students = self.create_fixtures(options)
+            recorder = Recorder()
+            users = [Student(self.transport(student, options), recorder, options, menus) for student in students]
+            users += [
+                Tablet(self.transport(admin, options), recorder, options)
+                for admin in admins for _ in range(options['tablets'])
+            ]
+            elapsed = self.run(users, options)
+            self.report(recorder, elapsed, users[0].transport.counts_queries)
+        finally:
+            if not options['keep']:
+                self.cleanup()
+
+    def transport(self, user, options):
+        token = str(AccessToken.for_user(user))
+        if options['base_url']:
+            return HttpTransport(token, options['base_url'])
+        return ClientTransport(token)
+
+    def create_fixtures(self, options):
+        admins = User.objects.bulk_create([
+            User(username=f'{PREFIX}admin_{i}', role='food_court_admin', password='!')
+            for i in range(options['courts'])
+        ])
+        food_courts = FoodCourt.objects.bulk_create([
+            FoodCourt(name=f'{PREFIX}court_{i}', admin=admin, active_staff_count=3)
+            for i, admin in enumerate(admins)
+        ])
+        MenuItem.objects.bulk_create([
+            MenuItem(food_court=food_court, name=f'Dish {i}', price=Decimal(20 + 5 * (i % 8)), category='Load test')
+            for food_court in food_courts for i in range(options['menu_size'])
+        ])
+        menus = defaultdict(list)
+        for item_id, food_court_id in MenuItem.objects.filter(food_court__in=food_courts).values_list('id', 'food_court'):
+            menus[food_court_id].append(item_id)
+        students = User.objects.bulk_create([
+            User(username=f'{PREFIX}student_{i}', role='student', password='!', wallet_balance=Decimal('100000.00'))
+            for i in range(options['students'])
+        ])
+        return admins, dict(menus), students
+
+    def cleanup(self):
+        FoodCourt.objects.filter(name__startswith=PREFIX).delete()
+        User.objects.filter(username__startswith=PREFIX).delete()
+
+    def run(self, users, options):
+        deadline = time.monotonic() + options['duration']
+        iterations = options['iterations']
+
+        def worker(user):
+            try:
+                done = 0
+                while (done < iterations) if iterations else (time.monotonic() < deadline):
+                    user.iteration()
+                    done += 1
+            except Exception as e:
+                self.stderr.write(f'{type(user).__name__} stopped: {e!r}')
+            finally:
+                user.transport.close()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    def report(self, recorder, elapsed, counts_queries):
+        self.stdout.write(
+            f"{'route':<26} {'requests':>8} {'errors':>6} {'req/s':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'queries':>7}  statuses"
+        )
+        total = 0
+        for route, samples in sorted(recorder.samples.items()):
+            latencies = sorted(seconds * 1000 for _, seconds, _ in samples)
+            errors = sum(status_code >= 400 for status_code, _, _ in samples)
+            queries = f'{sum(q for _, _, q in samples) / len(samples):.1f}' if counts_queries else '-'
+            statuses = Counter(status_code for status_code, _, _ in samples)
+            total += len(samples)
+            self.stdout.write(
+                f'{route:<26} {len(samples):>8} {errors:>6} {len(samples) / elapsed:>8.1f} '
+                f'{percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} '
+                f'{percentile(latencies, 99):>8.1f} {latencies[-1]:>8.1f} {queries:>7}  '
+                + ' '.join(f'{code}x{count}' for code, count in sorted(statuses.items()))
+            )
+        self.stdout.write(self.style.SUCCESS(f'{total} requests in {elapsed:.2f}s ({total / elapsed:.0f} req/s)'))
@@ -0,0 +1,65 @@
+"""
+Move Base64 images stored in MenuItem.image_url into the media store.
+
+Rows are read in primary key order, a batch at a time, so only one batch of
+blobs is ever held in memory.
+
+Run: python manage.py migrate_menu_images [--batch-size 50] [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from myapp import cache, images
+from myapp.models import MenuItem
+
+
+class Command(BaseCommand):
+    help = 'Convert Base64 menu images into content-addressed files with thumbnails'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be converted without writing')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        converted = skipped = 0
+        food_court_ids = set()
+        last_id = 0
+
+        while True:
+            batch = list(
+                MenuItem.objects.filter(id__gt=last_id, image_url__startswith='data:')
+                .order_by('id')
+                .only('id', 'food_court_id', 'image_url')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            changed = []
+            for item in batch:
+                try:
+                    data = images.decode_data_uri(item.image_url)
+                    digest = None if dry_run else images.store_image(data)
+                except images.InvalidImage as e:
+                    skipped += 1
+                    self.stderr.write(f'Menu item {item.id}: {e}')
+                    continue
+                item.image_hash = digest
+                item.image_url = None
+                changed.append(item)
+                food_court_ids.add(item.food_court_id)
+
+            if changed and not dry_run:
+                with transaction.atomic():
+                    MenuItem.objects.bulk_update(changed, ['image_hash', 'image_url'])
+            converted += len(changed)
+            self.stdout.write(f'Processed up to menu item {last_id}: {converted} converted, {skipped} skipped')
+
+        if not dry_run:
+            for food_court_id in food_court_ids:
+                cache.invalidate_menu(food_court_id)
+
+        prefix = 'Would convert' if dry_run else 'Converted'
+        self.stdout.write(self.style.SUCCESS(f'{prefix} {converted} image(s); {skipped} could not be decoded'))
@@ -0,0 +1,20 @@
+"""
+Rebuild FoodCourt.active_order_count from the Order table.
+
+Run: python manage.py rebuild_queue_counters [--food-court ID ...]
+"""
+from django.core.management.base import BaseCommand
+
+from myapp.queue import rebuild_active_order_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per food court active order counters used for waiting times'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--food-court', type=int, action='append', dest='food_courts',
+                            help='Only rebuild this food court (repeatable)')
+
+    def handle(self, *args, **options):
+        updated = rebuild_active_order_counts(options['food_courts'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt queue counters for {updated} food court(s)'))
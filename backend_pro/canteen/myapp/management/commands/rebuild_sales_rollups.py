@@ -0,0 +1,32 @@
+"""
+Rebuild the DailySales and DailyItemSales rollups from the Order table.
+
+Migration 0008 fills them once; run this whenever they need repairing:
+python manage.py rebuild_sales_rollups [--since YYYY-MM-DD] [--food-court ID ...]
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales rollups used by the analytics endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild campus days from this date (YYYY-MM-DD) on')
+        parser.add_argument('--food-court', type=int, action='append', dest='food_courts',
+                            help='Only rebuild this food court (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rows fetched from the database at a time')
+
+    def handle(self, *args, **options):
+        since = options['since']
+        if since:
+            try:
+                since = date.fromisoformat(since)
+            except ValueError:
+                raise CommandError('--since must be formatted YYYY-MM-DD')
+        counted = rebuild(since, options['food_courts'], options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales rollups from {counted} order(s)'))
@@ -0,0 +1,45 @@
+"""
+Deliver queued notification emails from the EmailOutbox table.
+
+Run once:        python manage.py send_outbox_emails
+Run as a worker: python manage.py send_outbox_emails --loop --interval 5
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp.notifications import send_pending_emails
+
+
+class Command(BaseCommand):
+    help = 'Send pending outbox emails in batches over a single SMTP connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--loop', action='store_true', help='Keep draining the outbox until interrupted')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when the outbox is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent, failed = self.drain(options['batch_size'])
+            except Exception as e:
+                # e.g. the database is unreachable; a worker keeps going and tries again later
+                if not options['loop']:
+                    raise
+                self.stderr.write(f'Outbox drain failed: {e!r}')
+            else:
+                if sent or failed:
+                    self.stdout.write(f'Sent {sent} email(s), {failed} failed')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def drain(self, batch_size):
+        sent_total = failed_total = 0
+        while True:
+            sent, failed = send_pending_emails(batch_size)
+            sent_total += sent
+            failed_total += failed
+            if not sent and not failed:
+                return sent_total, failed_total
@@ -0,0 +1,125 @@
+"""
+Concurrency stress test for the wallet service.
+
+Spawns worker threads that debit (as an order would) and credit wallets at
+the same time, then checks that the final balances and the ledger agree
+exactly, i.e. that no update was lost and no wallet went negative. Any
+operation that raises (a deadlock, SQLite's "database is locked", ...) is
+counted as an error and fails the command.
+
+Run: python manage.py wallet_stress --threads 16 --ops 200
+"""
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+
+from myapp import wallet
+from myapp.models import User, WalletTransaction
+
+USERNAME_PREFIX = 'wallet_stress_'
+
+
+class Command(BaseCommand):
+    help = 'Hammer the wallet service from many threads and verify there are no lost updates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--ops', type=int, default=100, help='Operations per thread')
+        parser.add_argument('--students', type=int, default=8,
+                            help='Number of students for the "different students" scenario')
+        parser.add_argument('--amount', type=Decimal, default=Decimal('7.00'), help='Debit amount per order')
+        parser.add_argument('--balance', type=Decimal, default=Decimal('1000.00'), help='Starting balance')
+
+    def handle(self, *args, **options):
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        try:
+            self.run_scenario('same student', 1, options)
+            self.run_scenario('different students', options['students'], options)
+        finally:
+            User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+    def run_scenario(self, label, student_count, options):
+        students = [
+            User.objects.create(
+                username=f'{USERNAME_PREFIX}{label.replace(" ", "_")}_{i}',
+                role='student',
+                wallet_balance=options['balance']
+            )
+            for i in range(student_count)
+        ]
+        threads_count = options['threads']
+        ops = options['ops']
+        amount = options['amount']
+        stats = {'debits': 0, 'credits': 0, 'rejected': 0, 'errors': 0}
+        failures = []
+        lock = threading.Lock()
+
+        def worker(index):
+            local = dict.fromkeys(stats, 0)
+            try:
+                for op in range(ops):
+                    student = students[(index + op) % len(students)]
+                    try:
+                        # One recharge for every four orders keeps wallets hovering near empty
+                        if op % 5 == 4:
+                            wallet.credit(student, amount * 2, 'Stress recharge')
+                            local['credits'] += 1
+                        else:
+                            wallet.debit(student, amount, 'Stress order')
+                            local['debits'] += 1
+                    except wallet.InsufficientBalance:
+                        local['rejected'] += 1
+                    except Exception as e:
+                        # The transaction rolled back; not a success, and the run fails below
+                        local['errors'] += 1
+                        with lock:
+                            failures.append(e)
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in local.items():
+                        stats[key] += value
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(threads_count)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.verify(students, options['balance'])
+
+        # Rejected debits completed (they read the balance); operations that raised did not
+        completed = stats['debits'] + stats['credits'] + stats['rejected']
+        self.stdout.write(
+            f'{label}: {completed} of {threads_count * ops} ops completed on {student_count} wallet(s) '
+            f'by {threads_count} threads in {elapsed:.2f}s ({completed / elapsed:.0f} ops/s); '
+            f'debits={stats["debits"]} credits={stats["credits"]} '
+            f'rejected={stats["rejected"]} errors={stats["errors"]}'
+        )
+        if failures:
+            raise CommandError(f'{label}: {len(failures)} operations raised, e.g. {failures[0]!r}')
+        self.stdout.write(self.style.SUCCESS(f'{label}: no lost updates'))
+
+    def verify(self, students, starting_balance):
+        for student in students:
+            student.refresh_from_db(fields=['wallet_balance'])
+            ledger = WalletTransaction.objects.filter(user=student)
+            credited = ledger.filter(transaction_type='credit').aggregate(total=Sum('amount'))['total'] or 0
+            debited = ledger.filter(transaction_type='debit').aggregate(total=Sum('amount'))['total'] or 0
+            expected = starting_balance + credited - debited
+            if student.wallet_balance != expected:
+                raise CommandError(
+                    f'Lost update for {student.username}: balance {student.wallet_balance}, ledger says {expected}'
+                )
+            if student.wallet_balance < 0:
+                raise CommandError(f'{student.username} was overdrawn: {student.wallet_balance}')
+            # Updates to one wallet are serialised by the row lock, so the newest entry holds the final balance
+            last = ledger.order_by('-id').values_list('balance_after', flat=True).first()
+            if last is not None and last != student.wallet_balance:
+                raise CommandError(f'Ledger for {student.username} ends at {last}, wallet is {student.wallet_balance}')
@@ -0,0 +1,150 @@
+"""
+Bulk menu operations behind MenuItemViewSet.
+
+Imports upsert a whole file with one lookup, one bulk_create and one
+bulk_update; exports stream the menu in keyset chunks (see streaming); availability and price
+changes are a single UPDATE over the selected items. Callers check that
+the food court belongs to the admin and invalidate the menu cache.
+"""
+import csv
+import io
+import json
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DecimalField, F, Max, Q, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .models import MenuItem
+from .streaming import CsvEncoder, Encoder
+
+EXPORT_FIELDS = ('id', 'name', 'description', 'price', 'category', 'is_available')
+
+_price = MenuItem._meta.get_field('price')
+MAX_PRICE = Decimal(10) ** (_price.max_digits - _price.decimal_places) - Decimal(10) ** -_price.decimal_places
+
+
+class MenuImportError(ValueError):
+    pass
+
+
+def read_rows(request):
+    """Rows of an import from a CSV body, a CSV upload (``file``) or a JSON list."""
+    # Check the raw CSV body first: touching request.data would try to parse it
+    if request.content_type.startswith('text/csv'):
+        text = request.body.decode('utf-8-sig')
+    elif 'file' in request.FILES:
+        text = request.FILES['file'].read().decode('utf-8-sig')
+    else:
+        rows = request.data.get('items') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list):
+            raise MenuImportError('Send a CSV file or a JSON list of menu items.')
+        return rows
+    # Empty CSV cells mean "not given", so updates leave those columns alone
+    return [
+        {key: value for key, value in row.items() if key and value not in ('', None)}
+        for row in csv.DictReader(io.StringIO(text))
+    ]
+
+
+def belongs_to_other_food_court(food_court, ids):
+    """True if any of ``ids`` is a menu item of another food court."""
+    return MenuItem.objects.filter(id__in=ids).exclude(food_court=food_court).exists()
+
+
+def import_items(food_court, rows):
+    """
+    Upsert validated ``rows`` into the food court's menu. Rows with an id
+    update that item; the rest update the item with the same name or create
+    one. Returns (created, updated).
+    """
+    ids = {row['id'] for row in rows if 'id' in row}
+    names = {row['name'] for row in rows if 'id' not in row}
+    existing = list(MenuItem.objects.filter(food_court=food_court).filter(Q(id__in=ids) | Q(name__in=names)))
+    by_id = {item.id: item for item in existing}
+    by_name = {item.name: item for item in existing}
+
+    missing = ids - set(by_id)
+    if missing:
+        raise MenuImportError(f"Unknown menu item id(s): {', '.join(map(str, sorted(missing)))}")
+
+    now = timezone.now()
+    to_create = {}
+    to_update = {}
+    update_fields = {'updated_at'}
+    for row in rows:
+        values = {key: value for key, value in row.items() if key != 'id'}
+        item = by_id.get(row['id']) if 'id' in row else by_name.get(row['name'])
+        if item is None:
+            # A repeated new name in the same file overwrites the earlier row
+            to_create[row['name']] = MenuItem(food_court=food_court, **values)
+            continue
+        for field, value in values.items():
+            setattr(item, field, value)
+        item.updated_at = now
+        update_fields.update(values)
+        to_update[item.id] = item
+
+    batch_size = settings.MENU_BULK_BATCH_SIZE
+    with transaction.atomic():
+        MenuItem.objects.bulk_create(to_create.values(), batch_size=batch_size)
+        if to_update:
+            MenuItem.objects.bulk_update(to_update.values(), sorted(update_fields), batch_size=batch_size)
+    return len(to_create), len(to_update)
+
+
+def select_items(food_court, data):
+    queryset = MenuItem.objects.filter(food_court=food_court)
+    if 'ids' in data:
+        return queryset.filter(id__in=data['ids'])
+    return queryset.filter(category=data['category'])
+
+
+def set_availability(queryset, is_available):
+    """One UPDATE; returns the number of items changed."""
+    return queryset.update(is_available=is_available, updated_at=timezone.now())
+
+
+def _factor(percent):
+    return 1 + Decimal(percent) / 100
+
+
+def price_change_fits(queryset, percent):
+    """False if scaling by ``percent`` would push a price past what the column holds."""
+    highest = queryset.aggregate(highest=Max('price'))['highest']
+    return highest is None or round(highest * _factor(percent), 2) <= MAX_PRICE
+
+
+def change_prices(queryset, percent):
+    """Scale prices by ``percent`` (e.g. 10 or -15) in one UPDATE, rounded to paise."""
+    factor = Value(_factor(percent), output_field=DecimalField(max_digits=12, decimal_places=6))
+    return queryset.update(
+        price=Round(F('price') * factor, 2, output_field=DecimalField(max_digits=10, decimal_places=2)),
+        updated_at=timezone.now()
+    )
+
+
+class JsonEncoder(Encoder):
+    separator = ''
+
+    def start(self):
+        return '['
+
+    def encode(self, chunk):
+        text = self.separator + ','.join(json.dumps(dict(zip(EXPORT_FIELDS, row)), default=str) for row in chunk)
+        self.separator = ','
+        return text
+
+    def finish(self):
+        return ']'
+
+
+ENCODERS = {'csv': (partial(CsvEncoder, EXPORT_FIELDS), 'text/csv'), 'json': (JsonEncoder, 'application/json')}
+
+
+def export_rows(queryset):
+    """The export columns, id first, as the streaming chunks expect."""
+    return queryset.values_list(*EXPORT_FIELDS)
@@ -0,0 +1,199 @@
+"""
+Per route request metrics in the Prometheus text format.
+
+MetricsMiddleware records, for every request and labelled by URL route name
+and method: latency, SQL query count, SQL time, response size and status
+code. The aggregates are a few integers per route kept in this process
+behind one lock, so recording costs a handful of list increments.
+
+Pre-forked servers run several processes that each see a share of the
+traffic. Set METRICS_MULTIPROC_DIR to a directory shared by the workers:
+each process then writes its totals to its own file there at most every
+METRICS_FLUSH_SECONDS, and /api/metrics/ adds the files up, so a scrape may
+lag the other workers by that interval.
+"""
+import copy
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+HISTOGRAMS = (
+    # (key, metric name, help, buckets)
+    ('duration', 'canteen_http_request_duration_seconds', 'Request latency', DURATION_BUCKETS),
+    ('queries', 'canteen_http_db_queries', 'SQL queries per request', QUERY_BUCKETS),
+    ('size', 'canteen_http_response_size_bytes', 'Response body size (streamed responses are left out)', SIZE_BUCKETS),
+)
+
+
+def _new_stats():
+    stats = {'statuses': {}, 'db_seconds': 0.0}
+    for key, _, _, buckets in HISTOGRAMS:
+        # One count per bucket plus +Inf, not cumulative
+        stats[key] = [0] * (len(buckets) + 1)
+        stats[f'{key}_sum'] = 0
+    return stats
+
+
+def _observe(stats, key, buckets, value):
+    stats[key][bisect_left(buckets, value)] += 1
+    stats[f'{key}_sum'] += value
+
+
+def _merge(target, stats):
+    for status, count in stats['statuses'].items():
+        target['statuses'][status] = target['statuses'].get(status, 0) + count
+    target['db_seconds'] += stats['db_seconds']
+    for key, _, _, _ in HISTOGRAMS:
+        target[key] = [a + b for a, b in zip(target[key], stats[key])]
+        target[f'{key}_sum'] += stats[f'{key}_sum']
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.stats = {}
+        self.pid = os.getpid()
+        self.flushed_at = 0
+
+    def record(self, route, method, status, seconds, queries, db_seconds, size):
+        with self.lock:
+            if os.getpid() != self.pid:
+                # Forked after recording; the parent reports its own requests
+                self.reset()
+            stats = self.stats.get((route, method))
+            if stats is None:
+                stats = self.stats[(route, method)] = _new_stats()
+            status = str(status)
+            stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+            stats['db_seconds'] += db_seconds
+            _observe(stats, 'duration', DURATION_BUCKETS, seconds)
+            _observe(stats, 'queries', QUERY_BUCKETS, queries)
+            if size is not None:
+                _observe(stats, 'size', SIZE_BUCKETS, size)
+            flush = (
+                settings.METRICS_MULTIPROC_DIR
+                and time.monotonic() - self.flushed_at >= settings.METRICS_FLUSH_SECONDS
+            )
+        if flush:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return [[route, method, copy.deepcopy(stats)] for (route, method), stats in self.stats.items()]
+
+    def flush(self):
+        """Write this process's totals to METRICS_MULTIPROC_DIR."""
+        directory = settings.METRICS_MULTIPROC_DIR
+        path = os.path.join(directory, f'metrics_{os.getpid()}.json')
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temporary, path)
+        self.flushed_at = time.monotonic()
+
+    def collect(self):
+        """Totals per (route, method): this process's, or every worker's in multi-process mode."""
+        if not settings.METRICS_MULTIPROC_DIR:
+            return {(route, method): stats for route, method, stats in self.snapshot()}
+        self.flush()
+        totals = {}
+        directory = settings.METRICS_MULTIPROC_DIR
+        for name in os.listdir(directory):
+            if not (name.startswith('metrics_') and name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    rows = json.load(f)
+            except (OSError, ValueError):
+                # Removed or replaced while reading; its totals show up next scrape
+                continue
+            for route, method, stats in rows:
+                _merge(totals.setdefault((route, method), _new_stats()), stats)
+        return totals
+
+
+registry = Registry()
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+
+def render(totals=None):
+    """The metrics in the Prometheus text exposition format (version 0.0.4)."""
+    totals = registry.collect() if totals is None else totals
+    rows = sorted(totals.items())
+    lines = [
+        '# HELP canteen_http_requests_total Requests by route, method and status code',
+        '# TYPE canteen_http_requests_total counter',
+    ]
+    for (route, method), stats in rows:
+        for status, count in sorted(stats['statuses'].items()):
+            lines.append(f'canteen_http_requests_total{_labels(route=route, method=method, status=status)} {count}')
+
+    for key, name, help_text, buckets in HISTOGRAMS:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (route, method), stats in rows:
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], stats[key]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(route=route, method=method, le=bound)} {cumulative}')
+            lines.append(f"{name}_sum{_labels(route=route, method=method)} {stats[f'{key}_sum']}")
+            lines.append(f'{name}_count{_labels(route=route, method=method)} {cumulative}')
+
+    lines += [
+        '# HELP canteen_http_db_query_seconds_total Time spent in SQL queries',
+        '# TYPE canteen_http_db_query_seconds_total counter',
+    ]
+    for (route, method), stats in rows:
+        lines.append(f"canteen_http_db_query_seconds_total{_labels(route=route, method=method)} {stats['db_seconds']}")
+    return '\n'.join(lines) + '\n'
+
+
+class _QueryTimer:
+    # connection.execute_wrapper callable that counts queries and their time
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        seconds = time.perf_counter() - started
+
+        match = request.resolver_match
+        # Unmatched paths share one label so scanners can't grow the registry
+        route = (match.url_name or match.route) if match else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        registry.record(route, request.method, response.status_code, seconds, timer.count, timer.seconds, size)
+        return response
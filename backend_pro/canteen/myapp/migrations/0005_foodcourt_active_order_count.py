@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:30
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_active_order_count(apps, schema_editor):
+    FoodCourt = apps.get_model('myapp', 'FoodCourt')
+    Order = apps.get_model('myapp', 'Order')
+    active_orders = Order.objects.filter(
+        food_court=OuterRef('pk'),
+        status__in=['pending', 'preparing']
+    ).order_by().values('food_court').annotate(total=Count('id')).values('total')
+    FoodCourt.objects.update(active_order_count=Coalesce(Subquery(active_orders), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0004_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodcourt',
+            name='active_order_count',
+            field=models.IntegerField(default=0, help_text='Pending/preparing orders, maintained by myapp.queue'),
+        ),
+        migrations.RunPython(populate_active_order_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0005_foodcourt_active_order_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='image_hash',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 of an uploaded image, see myapp.images', max_length=64),
+        ),
+    ]
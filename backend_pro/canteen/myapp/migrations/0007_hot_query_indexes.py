@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0006_menuitem_image_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['food_court', 'is_available'], name='menuitem_court_avail_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['food_court', 'status'], name='order_court_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['food_court', 'created_at'], name='order_court_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['student', 'created_at'], name='order_student_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['user', 'created_at'], name='wallet_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0.2 on 2026-10-18 11:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_daily_sales(apps, schema_editor):
+    from myapp.rollups import rebuild
+
+    rebuild(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0007_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyItemSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.IntegerField(default=0, help_text='Units sold in orders that are not cancelled')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('food_court', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_item_sales', to='myapp.foodcourt')),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='myapp.menuitem')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('food_court', 'day', 'menu_item'), name='dailyitemsales_court_day_item_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('order_count', models.IntegerField(default=0, help_text='Orders that are not cancelled')),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, help_text='Total of orders that are not cancelled', max_digits=12)),
+                ('food_court', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='myapp.foodcourt')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('food_court', 'day'), name='dailysales_court_day_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop),
+    ]
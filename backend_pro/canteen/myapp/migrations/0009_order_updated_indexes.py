@@ -0,0 +1,21 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0008_daily_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['food_court', 'updated_at'], name='order_court_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['student', 'updated_at'], name='order_student_updated_idx'),
+        ),
+    ]
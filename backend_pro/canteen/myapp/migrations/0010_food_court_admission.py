@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0009_order_updated_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodcourt',
+            name='max_active_orders',
+            field=models.PositiveIntegerField(blank=True, help_text='Stop taking orders at this many pending/preparing orders', null=True),
+        ),
+        migrations.AddField(
+            model_name='foodcourt',
+            name='max_waiting_time',
+            field=models.PositiveIntegerField(blank=True, help_text='Stop taking orders once the estimated wait reaches this many minutes', null=True),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
 
 class User(AbstractUser):
@@ -43,6 +44,10 @@ class FoodCourt(models.Model):
     is_open = models.BooleanField(default=True)
     avg_preparation_time = models.IntegerField(default=15, help_text="Average preparation time in minutes")
     active_staff_count = models.IntegerField(default=1, validators=[MinValueValidator(0)])
+    active_order_count = models.IntegerField(default=0, help_text="Pending/preparing orders, maintained by myapp.queue")
+    # Admission policy, checked by myapp.queue when an order is placed; empty means no limit
+    max_active_orders = models.PositiveIntegerField(null=True, blank=True, help_text="Stop taking orders at this many pending/preparing orders")
+    max_waiting_time = models.PositiveIntegerField(null=True, blank=True, help_text="Stop taking orders once the estimated wait reaches this many minutes")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -54,16 +59,27 @@ class FoodCourt(models.Model):
         if self.active_staff_count == 0:
             return 0
         
-        pending_orders = self.orders.filter(status__in=['pending', 'preparing']).count()
-        estimated_time = (pending_orders * self.avg_preparation_time) / self.active_staff_count
+        estimated_time = (self.active_order_count * self.avg_preparation_time) / self.active_staff_count
         return round(estimated_time, 2)
+    
+    def is_queue_full(self):
+        """Whether the admission policy turns new orders away; the same test as myapp.queue.ADMISSION"""
+        if self.max_active_orders is not None and self.active_order_count >= self.max_active_orders:
+            return True
+        # Compared without dividing, like the database does; no staff means no estimate
+        return (
+            self.max_waiting_time is not None
+            and self.active_staff_count > 0
+            and self.active_order_count * self.avg_preparation_time >= self.max_waiting_time * self.active_staff_count
+        )
 
 class MenuItem(models.Model):
     food_court = models.ForeignKey(FoodCourt, on_delete=models.CASCADE, related_name='menu_items')
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
-    image_url = models.TextField(blank=True, null=True)  # Changed to TextField to support Base64 images
+    image_url = models.TextField(blank=True, null=True)  # External image URL (legacy rows may still hold Base64 data)
+    image_hash = models.CharField(max_length=64, blank=True, default='', help_text="SHA-256 of an uploaded image, see myapp.images")
     is_available = models.BooleanField(default=True)
     category = models.CharField(max_length=100, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -71,6 +87,24 @@ class MenuItem(models.Model):
     
     def __str__(self):
         return f"{self.name} - {self.food_court.name}"
+    
+    class Meta:
+        indexes = [
+            # Menu listing and availability checks
+            models.Index(fields=['food_court', 'is_available'], name='menuitem_court_avail_idx'),
+        ]
+
+class OrderQuerySet(models.QuerySet):
+    @staticmethod
+    def items_prefetch():
+        """Order lines with just the menu item name OrderItemSerializer needs."""
+        return models.Prefetch('items', queryset=OrderItem.objects.select_related('menu_item').only(
+            'id', 'order', 'menu_item', 'quantity', 'price', 'menu_item__name'
+        ))
+    
+    def with_details(self):
+        """Everything OrderSerializer reads, in three queries however many orders are listed"""
+        return self.select_related('student', 'food_court').prefetch_related(self.items_prefetch())
 
 class Order(models.Model):
     STATUS_CHOICES = (
@@ -83,16 +117,34 @@ class Order(models.Model):
     
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     food_court = models.ForeignKey(FoodCourt, on_delete=models.CASCADE, related_name='orders')
+    # Orders that count towards a food court's queue
+    ACTIVE_STATUSES = ('pending', 'preparing')
+    # Orders still shown on the kitchen screen
+    OPEN_STATUSES = ('pending', 'preparing', 'ready')
+    
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = OrderQuerySet.as_manager()
+    
     def __str__(self):
         return f"Order #{self.id} - {self.student.username}"
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Queue counters and active order lookups
+            models.Index(fields=['food_court', 'status'], name='order_court_status_idx'),
+            # Admin order list (keyset on created_at, id) and per court day ranges
+            models.Index(fields=['food_court', 'created_at'], name='order_court_created_idx'),
+            # Student order history
+            models.Index(fields=['student', 'created_at'], name='order_student_created_idx'),
+            # List validators for conditional GET (newest change per court / student)
+            models.Index(fields=['food_court', 'updated_at'], name='order_court_updated_idx'),
+            models.Index(fields=['student', 'updated_at'], name='order_student_updated_idx'),
+        ]
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
@@ -122,3 +174,65 @@ class WalletTransaction(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Wallet history (keyset on created_at, id)
+            models.Index(fields=['user', 'created_at'], name='wallet_user_created_idx'),
+        ]
+
+class EmailOutbox(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+    
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.subject} -> {self.recipient} ({self.status})"
+    
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_due_idx'),
+        ]
+
+class DailySales(models.Model):
+    """Per food court and campus day totals, maintained by myapp.rollups."""
+    food_court = models.ForeignKey(FoodCourt, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    order_count = models.IntegerField(default=0, help_text="Orders that are not cancelled")
+    cancelled_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Total of orders that are not cancelled")
+    
+    def __str__(self):
+        return f"{self.food_court_id} on {self.day}: {self.order_count} orders, {self.revenue}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['food_court', 'day'], name='dailysales_court_day_uniq'),
+        ]
+
+class DailyItemSales(models.Model):
+    """Per food court, campus day and menu item totals, maintained by myapp.rollups."""
+    food_court = models.ForeignKey(FoodCourt, on_delete=models.CASCADE, related_name='daily_item_sales')
+    day = models.DateField()
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.IntegerField(default=0, help_text="Units sold in orders that are not cancelled")
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    def __str__(self):
+        return f"{self.menu_item_id} on {self.day}: {self.quantity}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['food_court', 'day', 'menu_item'], name='dailyitemsales_court_day_item_uniq'),
+        ]
@@ -0,0 +1,146 @@
+"""
+Order notification emails.
+
+Emails are never sent from the request. place_order writes a row to the
+EmailOutbox table in the same transaction as the order, and the
+send_outbox_emails management command delivers queued rows in batches over
+one SMTP connection, retrying failures with exponential backoff.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+
+def queue_new_order_email(order, order_lines, student):
+    """Queue the "new order" email for the food court admin. Must run inside the order transaction."""
+    food_court = order.food_court
+    admin = food_court.admin
+    if admin is None or not admin.email:
+        return None
+
+    # Prepare order items list for email
+    items_list = '\n'.join([
+        f"  - {item_data['menu_item'].name} x {item_data['quantity']} = ₹{float(item_data['price']) * item_data['quantity']:.2f}"
+        for item_data in order_lines
+    ])
+
+    subject = f'New Order #{order.id} - {food_court.name}'
+    message = f"""
+Hello {admin.first_name},
+
+You have received a new order at {food_court.name}!
+
+Order Details:
+--------------
+Order ID: #{order.id}
+Customer: {student.first_name} {student.last_name}
+Email: {student.email}
+Order Time: {order.created_at.strftime('%Y-%m-%d %H:%M:%S')}
+
+Items Ordered:
+{items_list}
+
+Total Amount: ₹{float(order.total_amount):.2f}
+Status: Pending
+
+Please log in to your admin dashboard to view and process this order.
+
+Dashboard: http://localhost:5173/admin/orders
+
+Thank you!
+Canteen Management System
+"""
+
+    return EmailOutbox.objects.create(recipient=admin.email, subject=subject, message=message)
+
+
+def retry_delay(attempts):
+    """Exponential backoff: base delay doubled for every failed attempt, capped."""
+    delay = settings.EMAIL_OUTBOX_RETRY_DELAY * (2 ** (attempts - 1))
+    return timedelta(seconds=min(delay, settings.EMAIL_OUTBOX_MAX_RETRY_DELAY))
+
+
+def _claim_batch(batch_size):
+    # Lease the batch by pushing next_attempt_at forward, so a second worker
+    # skips it and a crashed worker's rows become due again later.
+    now = timezone.now()
+    with transaction.atomic():
+        due = EmailOutbox.objects.filter(status='pending', next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+        if transaction.get_connection().features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        batch = list(due[:batch_size])
+        if batch:
+            EmailOutbox.objects.filter(id__in=[email.id for email in batch]).update(
+                next_attempt_at=now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+            )
+    return batch
+
+
+def _mark_failed(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = 'failed'
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+    email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def send_pending_emails(batch_size=None):
+    """
+    Deliver one batch of due emails. Returns (sent, failed) counts.
+
+    SMTP errors never escape: if the server can't be reached, every leased
+    email that wasn't sent counts as a failed attempt and backs off.
+    """
+    batch = _claim_batch(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        for email in batch:
+            _mark_failed(email, e)
+        return 0, len(batch)
+    try:
+        for index, email in enumerate(batch):
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.message,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[email.recipient],
+                connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as e:
+                failed += 1
+                _mark_failed(email, e)
+                # The server may have dropped us; reconnect for the rest of the batch
+                try:
+                    connection.close()
+                    connection.open()
+                except Exception as e:
+                    for email in batch[index + 1:]:
+                        _mark_failed(email, e)
+                    return sent, failed + len(batch) - index - 1
+            else:
+                sent += 1
+                email.status = 'sent'
+                email.sent_at = timezone.now()
+                email.attempts += 1
+                email.save(update_fields=['status', 'sent_at', 'attempts'])
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return sent, failed
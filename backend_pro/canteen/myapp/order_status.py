@@ -0,0 +1,67 @@
+"""
+Order status changes.
+
+Orders only move along TRANSITIONS. The single and bulk status endpoints
+both go through change_status(), which writes with compare-and-swap
+updates (UPDATE ... WHERE id IN (...) AND status = <old status>) so a
+change made meanwhile by another tablet is reported as a conflict rather
+than overwritten. The queue counters and sales rollups are adjusted once
+per batch, however many orders move.
+"""
+from itertools import groupby
+
+from django.utils import timezone
+
+from . import events, queue, rollups
+from .models import Order
+from .serializers import OrderSerializer
+
+TRANSITIONS = {
+    'pending': ('preparing', 'cancelled'),
+    'preparing': ('ready', 'cancelled'),
+    'ready': ('completed', 'cancelled'),
+    'completed': (),
+    'cancelled': (),
+}
+
+
+class StatusConflict(Exception):
+    """An order's status changed after it was read."""
+
+
+def can_change(old_status, new_status):
+    return new_status in TRANSITIONS.get(old_status, ())
+
+
+def change_status(food_court, orders, new_status):
+    """
+    Move ``orders`` of ``food_court`` (still holding the status they were
+    read with) to ``new_status``. The caller checks the transitions with
+    can_change() and runs this inside its transaction, so StatusConflict
+    rolls the whole batch back. Returns the orders that actually changed,
+    updated in place.
+    """
+    changing = sorted((order for order in orders if order.status != new_status), key=lambda order: order.status)
+    if not changing:
+        return []
+
+    now = timezone.now()
+    # One statement per old status, at most a handful whatever the batch size
+    for old_status, group in groupby(changing, key=lambda order: order.status):
+        ids = [order.id for order in group]
+        updated = Order.objects.filter(id__in=ids, status=old_status).update(status=new_status, updated_at=now)
+        if updated != len(ids):
+            raise StatusConflict(f'Order status changed from {old_status} while updating')
+    # Same lock order as place_order: the FoodCourt counter, then the rollups (see myapp.queue)
+    queue.orders_status_changed(food_court.id, [order.status for order in changing], new_status)
+    rollups.orders_status_changed(changing, new_status)
+    for order in changing:
+        order.status = new_status
+        order.updated_at = now
+    return changing
+
+
+def publish(order_ids):
+    """Push the changed orders to live clients, serialized with a fixed number of queries."""
+    for order in Order.objects.filter(id__in=order_ids).with_details():
+        events.publish_order(order, OrderSerializer(order).data)
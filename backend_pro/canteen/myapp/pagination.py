@@ -0,0 +1,119 @@
+"""
+Keyset (cursor) pagination for the unbounded list endpoints.
+
+Pages are ordered newest first on ``(<ordering_field>, id)`` and the cursor
+is the position of the last row served, so fetching a page is an index
+range scan whatever the table size, and rows inserted while a client is
+paging never shift or repeat what it sees.
+
+Compatibility mode (KEYSET_PAGINATION_COMPAT, on by default) keeps the old
+response shape for clients written before pagination: the body is a bare
+JSON list holding the first page, and the next cursor travels in the
+``Link`` and ``X-Next-Cursor`` headers. Such a client only sees the first
+page unless it follows the cursor. Clients that send ``?envelope=1`` (or every
+client when compatibility mode is off) get ``{"next": ..., "results": [...]}``;
+the bundled frontend does that and follows ``next`` until it is null.
+"""
+import base64
+import binascii
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(value, pk):
+    """Opaque cursor for the position (value, pk), value being a datetime."""
+    raw = f'{value.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(encoded, invalid_message='Invalid cursor'):
+    """Return the (value, pk) position in ``encoded``; raises NotFound if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)).decode()
+        value, pk = raw.rsplit('|', 1)
+        value = parse_datetime(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise NotFound(invalid_message)
+    if value is None:
+        raise NotFound(invalid_message)
+    return value, pk
+
+
+class KeysetPagination(BasePagination):
+    ordering_field = 'created_at'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        field = self.ordering_field
+
+        queryset = queryset.order_by(f'-{field}', '-id')
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            value, pk = cursor
+            # (field, id) < (value, pk), written so the index sees a range on field
+            queryset = queryset.filter(**{f'{field}__lte': value}).exclude(**{field: value, 'id__gte': pk})
+
+        page = list(queryset[:self.page_size + 1])
+        self.next_cursor = None
+        if len(page) > self.page_size:
+            page = page[:self.page_size]
+            self.next_cursor = self.encode_cursor(page[-1])
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, settings.KEYSET_PAGE_SIZE))
+        except (TypeError, ValueError):
+            page_size = settings.KEYSET_PAGE_SIZE
+        return max(1, min(page_size, settings.KEYSET_MAX_PAGE_SIZE))
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def use_envelope(self):
+        return not settings.KEYSET_PAGINATION_COMPAT or self.request.query_params.get('envelope') in ('1', 'true')
+
+    def get_paginated_response(self, data):
+        next_link = self.get_next_link()
+        if self.use_envelope():
+            response = Response({'next': next_link, 'results': data})
+        else:
+            response = Response(data)
+        if next_link:
+            response['Link'] = f'<{next_link}>; rel="next"'
+            response['X-Next-Cursor'] = self.next_cursor
+        return response
+
+    def encode_cursor(self, instance):
+        return encode_cursor(getattr(instance, self.ordering_field), instance.pk)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        return decode_cursor(encoded, self.invalid_cursor_message)
+
+
+class UserKeysetPagination(KeysetPagination):
+    ordering_field = 'date_joined'
+
+
+def paginated_response(request, queryset, serializer_class, pagination_class=KeysetPagination, context=None):
+    """Paginate ``queryset`` from a function based view and return the Response."""
+    paginator = pagination_class()
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = serializer_class(page, many=True, context=context or {'request': request})
+    return paginator.get_paginated_response(serializer.data)
@@ -0,0 +1,90 @@
+"""
+EXPLAIN checks for the hot queries.
+
+Each entry mirrors a query issued by views.py or models.py together with
+the index it is supposed to use. check_query_plans() runs EXPLAIN for each
+one on the current database (SQLite, MySQL or PostgreSQL) and reports any
+query whose plan doesn't use its index. Run it against a database with
+realistic data: on near-empty MySQL tables the optimizer may rightly prefer
+a full scan.
+"""
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import MenuItem, Order, WalletTransaction
+
+# Sample ids only need to be well formed; EXPLAIN doesn't care whether rows exist
+SAMPLE_ID = 1
+
+
+def _hot_queries():
+    # (label, queryset, index, vendors where the plan can't show the index)
+    now = timezone.now()
+    return [
+        (
+            'admin order list (keyset page)',
+            Order.objects.filter(food_court_id=SAMPLE_ID).order_by('-created_at', '-id')[:51],
+            'order_court_created_idx',
+            (),
+        ),
+        (
+            'active orders per food court',
+            Order.objects.filter(food_court_id=SAMPLE_ID, status__in=Order.ACTIVE_STATUSES).order_by().values('id'),
+            'order_court_status_idx',
+            (),
+        ),
+        (
+            'food court orders in a day range',
+            Order.objects.filter(food_court_id=SAMPLE_ID, created_at__gte=now - timedelta(days=1), created_at__lt=now),
+            'order_court_created_idx',
+            (),
+        ),
+        (
+            'admin order changes since a cursor',
+            Order.objects.filter(food_court_id=SAMPLE_ID, updated_at__gte=now).order_by('updated_at', 'id')[:51],
+            'order_court_updated_idx',
+            (),
+        ),
+        (
+            'student order history (keyset page)',
+            Order.objects.filter(student_id=SAMPLE_ID).order_by('-created_at', '-id')[:51],
+            'order_student_created_idx',
+            (),
+        ),
+        (
+            'wallet history (keyset page)',
+            WalletTransaction.objects.filter(user_id=SAMPLE_ID).order_by('-created_at', '-id')[:51],
+            'wallet_user_created_idx',
+            (),
+        ),
+        (
+            'available menu items',
+            MenuItem.objects.filter(food_court_id=SAMPLE_ID, is_available=True),
+            'menuitem_court_avail_idx',
+            # Django writes a bare "WHERE is_available" on SQLite, which no index can serve;
+            # on MySQL it compares against 1 precisely so the index is usable.
+            ('sqlite',),
+        ),
+    ]
+
+
+def _explain(queryset):
+    if connection.vendor == 'mysql':
+        return queryset.explain(format='json')
+    return queryset.explain()
+
+
+def check_query_plans():
+    """
+    Return a list of (label, expected_index, uses_index, plan) for every hot query.
+
+    ``uses_index`` is None when the check doesn't apply to this database.
+    """
+    results = []
+    for label, queryset, index_name, skip_vendors in _hot_queries():
+        plan = _explain(queryset)
+        uses_index = None if connection.vendor in skip_vendors else index_name in plan
+        results.append((label, index_name, uses_index, plan))
+    return results
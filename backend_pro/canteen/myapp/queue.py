@@ -0,0 +1,97 @@
+"""
+Per food court queue counters.
+
+FoodCourt.active_order_count mirrors the number of pending/preparing orders
+so that waiting times can be read without counting the Order table. Every
+change goes through this module and must run in the same transaction as the
+order write it accounts for.
+
+New orders are admitted by the counter increment itself: the UPDATE only
+matches while the court is under its max_active_orders / max_waiting_time,
+so enforcing the policy costs no extra query and concurrent orders can't
+overshoot it.
+
+Lock order: every order write updates the FoodCourt counter before the
+sales rollups (DailySales, DailyItemSales) and the student's wallet, as
+place_order does. A path that took them the other way round could
+deadlock with a concurrent order at the same court on InnoDB.
+"""
+import math
+
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import LessThan
+
+from .models import FoodCourt, Order
+
+
+# Mirrors FoodCourt.is_queue_full(); the wait is compared multiplied out, as in get_estimated_waiting_time()
+ADMISSION = (
+    (Q(max_active_orders__isnull=True) | Q(active_order_count__lt=F('max_active_orders')))
+    & (
+        Q(max_waiting_time__isnull=True)
+        | Q(active_staff_count=0)
+        | Q(LessThan(
+            F('active_order_count') * F('avg_preparation_time'),
+            F('max_waiting_time') * F('active_staff_count')
+        ))
+    )
+)
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f'Queue is full, retry in {retry_after}s')
+        self.retry_after = retry_after
+
+
+def status_delta(old_status, new_status):
+    """How a status change moves the active order count (-1, 0 or +1)."""
+    return (new_status in Order.ACTIVE_STATUSES) - (old_status in Order.ACTIVE_STATUSES)
+
+
+def adjust_active_orders(food_court_id, delta):
+    if delta:
+        FoodCourt.objects.filter(pk=food_court_id).update(active_order_count=F('active_order_count') + delta)
+
+
+def admit_order(food_court):
+    """
+    Count a new pending order against ``food_court``, or raise QueueFull if
+    its admission policy says no. Call before writing the order, inside the
+    same transaction.
+    """
+    admitted = FoodCourt.objects.filter(ADMISSION, pk=food_court.pk).update(
+        active_order_count=F('active_order_count') + 1
+    )
+    if not admitted:
+        raise QueueFull(retry_after(food_court))
+
+
+def retry_after(food_court):
+    """Seconds until the court has probably finished an order, capped by ORDER_ADMISSION_MAX_RETRY_AFTER."""
+    seconds = food_court.avg_preparation_time * 60 / max(food_court.active_staff_count, 1)
+    return max(1, min(math.ceil(seconds), settings.ORDER_ADMISSION_MAX_RETRY_AFTER))
+
+
+def order_status_changed(food_court_id, old_status, new_status):
+    adjust_active_orders(food_court_id, status_delta(old_status, new_status))
+
+
+def orders_status_changed(food_court_id, old_statuses, new_status):
+    """A batch of orders moved to ``new_status``; one UPDATE for the whole batch."""
+    adjust_active_orders(food_court_id, sum(status_delta(old, new_status) for old in old_statuses))
+
+
+def rebuild_active_order_counts(food_court_ids=None):
+    """Recompute the counters from the Order table in one UPDATE. Returns the number of courts updated."""
+    active_orders = Order.objects.filter(
+        food_court=OuterRef('pk'),
+        status__in=Order.ACTIVE_STATUSES
+    ).order_by().values('food_court').annotate(total=Count('id')).values('total')
+    
+    food_courts = FoodCourt.objects.all()
+    if food_court_ids is not None:
+        food_courts = food_courts.filter(pk__in=food_court_ids)
+    return food_courts.update(active_order_count=Coalesce(Subquery(active_orders), Value(0)))
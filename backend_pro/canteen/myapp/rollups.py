@@ -0,0 +1,203 @@
+"""
+Daily sales rollups.
+
+DailySales (food court, day) and DailyItemSales (food court, day, menu item)
+hold running totals so analytics never rescan Order and OrderItem. Days are
+campus calendar days (myapp.dates). Totals only count orders that are not
+cancelled, so they change when an order is placed and when it moves into or
+out of "cancelled". Each change must run in the same transaction as the
+order write it accounts for.
+
+Rows are incremented set-wise: one INSERT that skips existing keys, then one
+UPDATE adding every delta through CASE expressions, so the cost per order
+(or per batch of orders) is fixed however many lines it has.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+
+from . import dates
+from .models import DailyItemSales, DailySales, Order, OrderItem
+
+SALES_KEY = ('food_court_id', 'day')
+ITEM_SALES_KEY = ('food_court_id', 'day', 'menu_item_id')
+
+
+def _increment(model, key_fields, deltas):
+    """Add ``deltas`` ({key tuple: {field: delta}}) to the rows of ``model``, creating missing ones."""
+    deltas = {key: values for key, values in deltas.items() if any(values.values())}
+    if not deltas:
+        return
+    lookups = {key: dict(zip(key_fields, key)) for key in deltas}
+    model.objects.bulk_create([model(**lookup) for lookup in lookups.values()], ignore_conflicts=True)
+
+    fields = {field for values in deltas.values() for field in values}
+    updates = {}
+    for field in fields:
+        output_field = model._meta.get_field(field)
+        whens = [
+            When(Q(**lookups[key]), then=Value(values[field], output_field=output_field))
+            for key, values in deltas.items() if values.get(field)
+        ]
+        updates[field] = F(field) + Case(*whens, default=Value(0, output_field=output_field), output_field=output_field)
+    model.objects.filter(reduce(or_, (Q(**lookup) for lookup in lookups.values()))).update(**updates)
+
+
+def _apply(orders, lines, sign, cancelled_sign=0):
+    """
+    Add (sign=1) or remove (sign=-1) ``orders`` and their ``lines`` from the totals.
+    ``orders`` are (food_court_id, created_at, total_amount); ``lines`` are
+    (food_court_id, created_at, menu_item_id, quantity, price).
+    """
+    sales = defaultdict(lambda: {'order_count': 0, 'cancelled_count': 0, 'revenue': Decimal('0')})
+    for food_court_id, created_at, total_amount in orders:
+        values = sales[(food_court_id, dates.local_date(created_at))]
+        values['order_count'] += sign
+        values['cancelled_count'] += cancelled_sign
+        values['revenue'] += sign * total_amount
+
+    item_sales = defaultdict(lambda: {'quantity': 0, 'revenue': Decimal('0')})
+    for food_court_id, created_at, menu_item_id, quantity, price in lines:
+        values = item_sales[(food_court_id, dates.local_date(created_at), menu_item_id)]
+        values['quantity'] += sign * quantity
+        values['revenue'] += sign * quantity * price
+
+    _increment(DailySales, SALES_KEY, sales)
+    _increment(DailyItemSales, ITEM_SALES_KEY, item_sales)
+
+
+def order_created(order, order_lines):
+    """Count a newly placed order; ``order_lines`` are the dicts place_order built."""
+    _apply(
+        [(order.food_court_id, order.created_at, order.total_amount)],
+        [
+            (order.food_court_id, order.created_at, line['menu_item'].id, line['quantity'], line['price'])
+            for line in order_lines
+        ],
+        sign=1,
+    )
+
+
+def orders_status_changed(orders, new_status):
+    """
+    Account for ``orders`` (with their old status) moving to ``new_status``.
+    Only moves into or out of "cancelled" change the totals.
+    """
+    if new_status == 'cancelled':
+        affected, sign = [order for order in orders if order.status != 'cancelled'], -1
+    else:
+        affected, sign = [order for order in orders if order.status == 'cancelled'], 1
+    if not affected:
+        return
+
+    by_id = {order.id: order for order in affected}
+    lines = [
+        (by_id[order_id].food_court_id, by_id[order_id].created_at, menu_item_id, quantity, price)
+        for order_id, menu_item_id, quantity, price in OrderItem.objects.filter(order_id__in=by_id)
+        .values_list('order_id', 'menu_item_id', 'quantity', 'price')
+    ]
+    _apply(
+        [(order.food_court_id, order.created_at, order.total_amount) for order in affected],
+        lines,
+        sign=sign,
+        cancelled_sign=-sign,
+    )
+
+
+def orders_deleted(orders):
+    """
+    Take ``orders`` (with their current status) out of the totals before they
+    are deleted, e.g. by a cascade from their student.
+    """
+    cancelled = [order for order in orders if order.status == 'cancelled']
+    counted = [order for order in orders if order.status != 'cancelled']
+    by_id = {order.id: order for order in counted}
+    lines = [
+        (by_id[order_id].food_court_id, by_id[order_id].created_at, menu_item_id, quantity, price)
+        for order_id, menu_item_id, quantity, price in OrderItem.objects.filter(order_id__in=by_id)
+        .values_list('order_id', 'menu_item_id', 'quantity', 'price')
+    ]
+    _apply([(order.food_court_id, order.created_at, order.total_amount) for order in counted], lines, sign=-1)
+    _apply([(order.food_court_id, order.created_at, 0) for order in cancelled], [], sign=0, cancelled_sign=-1)
+
+
+def rebuild(since=None, food_court_ids=None, chunk_size=5000, apps=None):
+    """
+    Recompute the rollups from Order and OrderItem, streaming rows so memory
+    only grows with the number of (food court, day, item) keys. Optionally
+    limited to campus days from ``since`` on and to some food courts.
+    ``apps`` is the migration state's registry when run from a migration.
+    Returns the number of orders counted.
+
+    The rollup rows in scope are locked before the orders are read, and the
+    read and the replace share one transaction: an order written meanwhile
+    waits on those rows and adds itself once the new totals are in, instead
+    of being overwritten by them.
+    """
+    models = {
+        name: apps.get_model('myapp', name) if apps else model
+        for name, model in (('Order', Order), ('OrderItem', OrderItem),
+                            ('DailySales', DailySales), ('DailyItemSales', DailyItemSales))
+    }
+    orders = models['Order'].objects.order_by()
+    lines = models['OrderItem'].objects.order_by()
+    sales = models['DailySales'].objects.all()
+    item_sales = models['DailyItemSales'].objects.all()
+    if since is not None:
+        start = dates.start_of_day(since)
+        orders = orders.filter(created_at__gte=start)
+        lines = lines.filter(order__created_at__gte=start)
+        sales = sales.filter(day__gte=since)
+        item_sales = item_sales.filter(day__gte=since)
+    if food_court_ids is not None:
+        orders = orders.filter(food_court_id__in=food_court_ids)
+        lines = lines.filter(order__food_court_id__in=food_court_ids)
+        sales = sales.filter(food_court_id__in=food_court_ids)
+        item_sales = item_sales.filter(food_court_id__in=food_court_ids)
+
+    with transaction.atomic():
+        # Ids only: taking the locks is all this is for
+        list(sales.select_for_update().values_list('id', flat=True))
+        list(item_sales.select_for_update().values_list('id', flat=True))
+        sales_totals, item_totals, order_total = _totals(orders, lines, chunk_size)
+
+        sales.delete()
+        item_sales.delete()
+        models['DailySales'].objects.bulk_create([
+            models['DailySales'](**dict(zip(SALES_KEY, key)), **values) for key, values in sales_totals.items()
+        ], batch_size=1000)
+        models['DailyItemSales'].objects.bulk_create([
+            models['DailyItemSales'](**dict(zip(ITEM_SALES_KEY, key)), **values)
+            for key, values in item_totals.items()
+        ], batch_size=1000)
+    return order_total
+
+
+def _totals(orders, lines, chunk_size):
+    sales_totals = defaultdict(lambda: {'order_count': 0, 'cancelled_count': 0, 'revenue': Decimal('0')})
+    order_total = 0
+    for food_court_id, created_at, order_status, total_amount in orders.values_list(
+        'food_court_id', 'created_at', 'status', 'total_amount'
+    ).iterator(chunk_size=chunk_size):
+        values = sales_totals[(food_court_id, dates.local_date(created_at))]
+        if order_status == 'cancelled':
+            values['cancelled_count'] += 1
+        else:
+            values['order_count'] += 1
+            values['revenue'] += total_amount
+        order_total += 1
+
+    item_totals = defaultdict(lambda: {'quantity': 0, 'revenue': Decimal('0')})
+    for food_court_id, created_at, menu_item_id, quantity, price in lines.exclude(
+        order__status='cancelled'
+    ).values_list(
+        'order__food_court_id', 'order__created_at', 'menu_item_id', 'quantity', 'price'
+    ).iterator(chunk_size=chunk_size):
+        values = item_totals[(food_court_id, dates.local_date(created_at), menu_item_id)]
+        values['quantity'] += quantity
+        values['revenue'] += quantity * price
+    return sales_totals, item_totals, order_total
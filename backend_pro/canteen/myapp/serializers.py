@@ -1,6 +1,8 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import authenticate
 from .models import User, FoodCourt, MenuItem, Order, OrderItem, WalletTransaction
+from . import images, menu_bulk
 from decimal import Decimal
 
 class UserSerializer(serializers.ModelSerializer):
@@ -52,39 +54,113 @@ class LoginSerializer(serializers.Serializer):
         raise serializers.ValidationError("Invalid credentials.")
 
 class MenuItemSerializer(serializers.ModelSerializer):
+    image_thumbnails = serializers.SerializerMethodField()
+    
     class Meta:
         model = MenuItem
-        fields = ['id', 'name', 'description', 'price', 'image_url', 'is_available', 'category', 'food_court']
+        fields = ['id', 'name', 'description', 'price', 'image_url', 'image_thumbnails', 'is_available', 'category', 'food_court']
         read_only_fields = ['id']
         extra_kwargs = {
             'food_court': {'required': False}  # Not required on update
         }
+    
+    def validate(self, data):
+        # Uploaded (Base64) images go to the media store; only their hash is saved on the row
+        if 'image_url' in data:
+            value = data['image_url']
+            if images.is_data_uri(value):
+                try:
+                    data['image_hash'] = images.store_image(images.decode_data_uri(value))
+                except images.InvalidImage as e:
+                    raise serializers.ValidationError({'image_url': str(e)})
+                data['image_url'] = None
+            else:
+                # One of our own image URLs sent back unchanged on edit keeps the image
+                digest = images.digest_from_url(value, self.context.get('request'))
+                data['image_hash'] = digest or ''
+                if digest:
+                    data['image_url'] = None
+        return data
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.image_hash:
+            data['image_url'] = images.image_url(
+                instance.image_hash, settings.MENU_IMAGE_DEFAULT_VARIANT, self.context.get('request')
+            )
+        return data
+    
+    def get_image_thumbnails(self, obj):
+        if not obj.image_hash:
+            return None
+        return images.image_urls(obj.image_hash, self.context.get('request'))
+
+class MenuItemImportSerializer(serializers.Serializer):
+    """One row of a bulk menu import; rows with an id update that item, others match by name."""
+    id = serializers.IntegerField(required=False)
+    name = serializers.CharField(max_length=200)
+    description = serializers.CharField(required=False, allow_blank=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'))
+    category = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    is_available = serializers.BooleanField(required=False)
+
+class MenuBulkSelectionSerializer(serializers.Serializer):
+    """Items a set-based menu action applies to: an id list or a whole category."""
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    category = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    
+    def validate(self, data):
+        if ('ids' in data) == ('category' in data):
+            raise serializers.ValidationError('Give either "ids" or "category".')
+        return data
+
+class MenuAvailabilitySerializer(MenuBulkSelectionSerializer):
+    is_available = serializers.BooleanField()
+
+class MenuPriceChangeSerializer(MenuBulkSelectionSerializer):
+    percent = serializers.DecimalField(max_digits=6, decimal_places=2, min_value=Decimal('-99.99'), max_value=Decimal('1000'))
+    
+    def validate(self, data):
+        data = super().validate(data)
+        # The UPDATE would fail on the column's max_digits instead
+        food_court = self.context.get('food_court')
+        if food_court and not menu_bulk.price_change_fits(menu_bulk.select_items(food_court, data), data['percent']):
+            raise serializers.ValidationError({'percent': f'Prices cannot go above {menu_bulk.MAX_PRICE}.'})
+        return data
 
 class FoodCourtSerializer(serializers.ModelSerializer):
     estimated_waiting_time = serializers.SerializerMethodField()
+    is_queue_full = serializers.SerializerMethodField()
     admin_name = serializers.CharField(source='admin.username', read_only=True)
     
     class Meta:
         model = FoodCourt
         fields = ['id', 'name', 'description', 'is_open', 'avg_preparation_time', 
-                  'active_staff_count', 'estimated_waiting_time', 'admin', 'admin_name', 
-                  'created_at', 'updated_at']
+                  'active_staff_count', 'estimated_waiting_time', 'max_active_orders', 'max_waiting_time',
+                  'is_queue_full', 'admin', 'admin_name', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_estimated_waiting_time(self, obj):
         return obj.get_estimated_waiting_time()
+    
+    def get_is_queue_full(self, obj):
+        return obj.is_queue_full()
 
 class FoodCourtDetailSerializer(serializers.ModelSerializer):
     menu_items = MenuItemSerializer(many=True, read_only=True)
     estimated_waiting_time = serializers.SerializerMethodField()
+    is_queue_full = serializers.SerializerMethodField()
     
     class Meta:
         model = FoodCourt
         fields = ['id', 'name', 'description', 'is_open', 'avg_preparation_time', 
-                  'active_staff_count', 'estimated_waiting_time', 'menu_items']
+                  'active_staff_count', 'estimated_waiting_time', 'is_queue_full', 'menu_items']
     
     def get_estimated_waiting_time(self, obj):
         return obj.get_estimated_waiting_time()
+    
+    def get_is_queue_full(self, obj):
+        return obj.is_queue_full()
 
 class OrderItemSerializer(serializers.ModelSerializer):
     menu_item_name = serializers.CharField(source='menu_item.name', read_only=True)
@@ -114,7 +190,7 @@ class CreateOrderSerializer(serializers.Serializer):
     def validate(self, data):
         # Validate food court exists
         try:
-            food_court = FoodCourt.objects.get(id=data['food_court'])
+            food_court = FoodCourt.objects.select_related('admin').get(id=data['food_court'])
             if not food_court.is_open:
                 raise serializers.ValidationError("Food court is currently closed.")
         except FoodCourt.DoesNotExist:
@@ -130,14 +206,27 @@ class CreateOrderSerializer(serializers.Serializer):
             
             if item['quantity'] <= 0:
                 raise serializers.ValidationError("Quantity must be greater than 0.")
-            
-            try:
-                menu_item = MenuItem.objects.get(id=item['menu_item_id'], food_court=food_court)
-                if not menu_item.is_available:
-                    raise serializers.ValidationError(f"{menu_item.name} is not available.")
-            except MenuItem.DoesNotExist:
+        
+        # Resolve every menu item in a single query
+        menu_item_ids = {item['menu_item_id'] for item in data['items']}
+        menu_items = MenuItem.objects.filter(food_court=food_court).in_bulk(menu_item_ids)
+        
+        order_lines = []
+        for item in data['items']:
+            menu_item = menu_items.get(item['menu_item_id'])
+            if menu_item is None:
                 raise serializers.ValidationError(f"Menu item {item['menu_item_id']} not found.")
+            if not menu_item.is_available:
+                raise serializers.ValidationError(f"{menu_item.name} is not available.")
+            order_lines.append({
+                'menu_item': menu_item,
+                'quantity': item['quantity'],
+                'price': menu_item.price
+            })
         
+        # Hand the resolved objects to the view so it doesn't fetch them again
+        data['food_court_obj'] = food_court
+        data['order_lines'] = order_lines
         return data
 
 class WalletTransactionSerializer(serializers.ModelSerializer):
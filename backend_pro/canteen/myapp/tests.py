@@ -1,3 +1,1617 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import importlib
+import json
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.core import mail
+from django.core.cache import cache as django_cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.models import F, Q, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import cache as cache_module, dates, events, exports, metrics, order_status, queue as queue_module, rollups, wallet
+from .models import (
+    User, FoodCourt, MenuItem, Order, OrderItem, WalletTransaction, EmailOutbox, DailySales, DailyItemSales
+)
+from .db_router import ReplicaRouter
+from .notifications import send_pending_emails
+from .query_plans import check_query_plans
+
+
+class CanteenTestMixin:
+    """Shared fixtures: one food court with an admin, a menu and a funded student."""
+
+    def setUp(self):
+        django_cache.clear()
+        self.admin = User.objects.create_user(
+            username='court_admin', password='admin123', email='admin@canteen.com', role='food_court_admin'
+        )
+        self.student = User.objects.create_user(
+            username='student1', password='student123', role='student', wallet_balance=Decimal('10000.00')
+        )
+        self.food_court = FoodCourt.objects.create(name='Main Cafeteria', admin=self.admin)
+        self.menu_items = [
+            MenuItem.objects.create(food_court=self.food_court, name=f'Item {i}', price=Decimal('20.00'))
+            for i in range(20)
+        ]
+        self.client = APIClient()
+
+    def place_order(self, items, user=None):
+        self.client.force_authenticate(user or self.student)
+        return self.client.post(reverse('place-order'), {
+            'food_court': self.food_court.id,
+            'items': items,
+        }, format='json')
+
+
+class PlaceOrderTests(CanteenTestMixin, TestCase):
+    # Every query placing an order of any size may run; a new one needs its own line here
+    QUERY_BUDGET = (
+        2    # food court, and every menu item in one query (CreateOrderSerializer)
+        + 1  # admit the order: conditional active_order_count increment (myapp.queue)
+        + 2  # order INSERT, order lines in one bulk INSERT
+        + 4  # daily sales and item sales rollups: INSERT-if-missing then UPDATE each (myapp.rollups)
+        + 3  # wallet: conditional UPDATE, balance_after read back (MySQL has no RETURNING), ledger INSERT
+        + 1  # admin email queued in the outbox
+        + 1  # saved order lines for the response
+        + 2  # SAVEPOINT/RELEASE of the order transaction inside the test's transaction
+    )
+
+    def cart(self, size):
+        return [{'menu_item_id': item.id, 'quantity': 2} for item in self.menu_items[:size]]
+
+    def test_place_order_creates_lines_and_debits_wallet(self):
+        response = self.place_order(self.cart(3))
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(id=response.data['id'])
+        self.assertEqual(order.total_amount, Decimal('120.00'))
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(len(response.data['items']), 3)
+        self.assertTrue(all(line['id'] for line in response.data['items']))
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.wallet_balance, Decimal('9880.00'))
+        self.assertEqual(WalletTransaction.objects.get(order=order).balance_after, Decimal('9880.00'))
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        counts = []
+        for size in (1, 5, 20):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.place_order(self.cart(size))
+            self.assertEqual(response.status_code, 201)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(len(set(counts)), 1, counts)
+        self.assertLessEqual(counts[0], self.QUERY_BUDGET)
+
+    def test_unknown_or_foreign_menu_item_is_rejected(self):
+        other_court = FoodCourt.objects.create(name='North Campus')
+        foreign = MenuItem.objects.create(food_court=other_court, name='Elsewhere', price=Decimal('5.00'))
+        response = self.place_order([{'menu_item_id': foreign.id, 'quantity': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_unavailable_item_is_rejected(self):
+        self.menu_items[0].is_available = False
+        self.menu_items[0].save()
+        response = self.place_order(self.cart(2))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(OrderItem.objects.exists())
+
+
+class WalletServiceTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(
+            username='student1', password='student123', role='student', wallet_balance=Decimal('50.00')
+        )
+
+    def test_debit_and_credit_record_balance_after(self):
+        debit = wallet.debit(self.student, Decimal('20.00'), 'Order')
+        credit = wallet.credit(self.student, Decimal('5.00'), 'Wallet recharge')
+        self.assertEqual(debit.balance_after, Decimal('30.00'))
+        self.assertEqual(credit.balance_after, Decimal('35.00'))
+        self.assertEqual(self.student.wallet_balance, Decimal('35.00'))
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.wallet_balance, Decimal('35.00'))
+
+    def test_debit_never_overdraws(self):
+        with self.assertRaises(wallet.InsufficientBalance) as ctx:
+            wallet.debit(self.student, Decimal('50.01'), 'Order')
+        self.assertEqual(ctx.exception.available, Decimal('50.00'))
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.wallet_balance, Decimal('50.00'))
+        self.assertFalse(WalletTransaction.objects.exists())
+
+    def test_stale_instance_does_not_overwrite_balance_or_other_fields(self):
+        stale = User.objects.get(pk=self.student.pk)
+        User.objects.filter(pk=self.student.pk).update(wallet_balance=Decimal('100.00'), email='new@college.com')
+        wallet.debit(stale, Decimal('10.00'), 'Order')
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.wallet_balance, Decimal('90.00'))
+        self.assertEqual(self.student.email, 'new@college.com')
+
+    def test_insufficient_balance_rolls_back_order(self):
+        food_court = FoodCourt.objects.create(name='Main Cafeteria')
+        item = MenuItem.objects.create(food_court=food_court, name='Thali', price=Decimal('40.00'))
+        client = APIClient()
+        client.force_authenticate(self.student)
+        response = client.post(reverse('place-order'), {
+            'food_court': food_court.id,
+            'items': [{'menu_item_id': item.id, 'quantity': 2}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['available'], '50.00')
+        self.assertFalse(Order.objects.exists())
+
+
+class WalletStressTests(TransactionTestCase):
+    # The in-memory SQLite test database locks whole tables, so concurrent writers fail there
+    @unittest.skipIf(connection.vendor == 'sqlite', 'needs a database with row locks')
+    def test_concurrent_debits_and_credits_lose_no_updates(self):
+        out = StringIO()
+        call_command('wallet_stress', threads=4, ops=15, students=3, stdout=out)
+        self.assertIn('same student: no lost updates', out.getvalue())
+        self.assertIn('different students: no lost updates', out.getvalue())
+
+    def test_ledger_check_passes(self):
+        out = StringIO()
+        call_command('wallet_stress', threads=1, ops=15, students=3, stdout=out)
+        self.assertIn('same student: 15 of 15 ops completed', out.getvalue())
+        self.assertIn('different students: no lost updates', out.getvalue())
+
+    def test_operations_that_raise_fail_the_run(self):
+        real_debit = wallet.debit
+        calls = []
+
+        def flaky_debit(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise OperationalError('deadlock detected')
+            return real_debit(*args, **kwargs)
+
+        out = StringIO()
+        with mock.patch.object(wallet, 'debit', flaky_debit):
+            with self.assertRaisesMessage(CommandError, 'same student: 1 operations raised'):
+                call_command('wallet_stress', threads=1, ops=10, students=1, stdout=out)
+        self.assertIn('9 of 10 ops completed', out.getvalue())
+        self.assertIn('errors=1', out.getvalue())
+        self.assertFalse(User.objects.filter(username__startswith='wallet_stress_').exists())
+
+
+class LoadTestCommandTests(TransactionTestCase):
+    def test_reports_every_route_and_cleans_up(self):
+        out = StringIO()
+        call_command('load_test', courts=1, students=3, tablets=1, iterations=2, polls=2, stdout=out, stderr=out)
+        report = out.getvalue()
+        for route in ('foodcourt-list', 'foodcourt-detail', 'place-order', 'student-order-list', 'admin-orders'):
+            self.assertIn(route, report)
+        self.assertNotIn('stopped', report)
+        # SQLite may refuse some concurrent writes; every attempt is still counted
+        place_order = next(line for line in report.splitlines() if line.startswith('place-order'))
+        self.assertEqual(place_order.split()[1], '6')
+        self.assertFalse(User.objects.filter(username__startswith='load_test_').exists())
+        self.assertFalse(Order.objects.exists())
+
+    @override_settings(KEYSET_PAGINATION_COMPAT=False)
+    def test_tablets_read_the_pagination_envelope(self):
+        out = StringIO()
+        call_command('load_test', courts=1, students=0, tablets=1, iterations=2, stdout=out, stderr=out)
+        self.assertNotIn('stopped', out.getvalue())
+        self.assertIn('200x1 304x1', next(line for line in out.getvalue().splitlines() if line.startswith('admin-orders')))
+
+    @unittest.skipUnless(importlib.util.find_spec('requests'), 'requests is not installed')
+    def test_http_base_url_is_the_server_root(self):
+        from myapp.management.commands.load_test import HttpTransport
+
+        for base_url in ('http://127.0.0.1:8000', 'http://127.0.0.1:8000/', 'http://127.0.0.1:8000/api/'):
+            transport = HttpTransport('token', base_url)
+            with mock.patch.object(transport.session, 'request') as request:
+                transport.request('get', reverse('foodcourt-list'))
+            self.assertEqual(request.call_args.args[1], 'http://127.0.0.1:8000/api/food-courts/')
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError('SMTP server unavailable')
+
+
+class UnreachableEmailBackend(BaseEmailBackend):
+    def open(self):
+        raise ConnectionRefusedError('Connection refused')
+
+    def send_messages(self, email_messages):
+        raise AssertionError('never connected')
+
+
+class DroppingEmailBackend(BaseEmailBackend):
+    # Connects once, then the first send fails and the server stays down
+    opened = 0
+
+    def open(self):
+        DroppingEmailBackend.opened += 1
+        if DroppingEmailBackend.opened > 1:
+            raise ConnectionRefusedError('Connection refused')
+
+    def send_messages(self, email_messages):
+        raise ConnectionResetError('Connection reset')
+
+
+class EmailOutboxTests(CanteenTestMixin, TestCase):
+    def test_order_queues_email_without_sending(self):
+        response = self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        email = EmailOutbox.objects.get()
+        self.assertEqual(email.recipient, 'admin@canteen.com')
+        self.assertIn(f"#{response.data['id']}", email.subject)
+
+    def test_worker_drains_outbox_over_one_connection(self):
+        for _ in range(3):
+            self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}])
+        call_command('send_outbox_emails', batch_size=2, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(EmailOutbox.objects.filter(status='sent').count(), 3)
+
+    @override_settings(EMAIL_BACKEND='myapp.tests.FailingEmailBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failed_delivery_is_retried_with_backoff_then_given_up(self):
+        self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}])
+        self.assertEqual(send_pending_emails(), (0, 1))
+        email = EmailOutbox.objects.get()
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertIn('SMTP server unavailable', email.last_error)
+        # Not due yet
+        self.assertEqual(send_pending_emails(), (0, 0))
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        send_pending_emails()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('failed', 2))
+
+    @override_settings(EMAIL_BACKEND='myapp.tests.UnreachableEmailBackend')
+    def test_unreachable_server_backs_off_the_whole_batch(self):
+        for _ in range(3):
+            self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}])
+        self.assertEqual(send_pending_emails(), (0, 3))
+        for email in EmailOutbox.objects.all():
+            self.assertEqual((email.status, email.attempts), ('pending', 1))
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertIn('Connection refused', email.last_error)
+        self.assertEqual(send_pending_emails(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND='myapp.tests.DroppingEmailBackend')
+    def test_failed_reconnect_backs_off_the_rest_of_the_batch(self):
+        DroppingEmailBackend.opened = 0
+        for _ in range(3):
+            self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}])
+        self.assertEqual(send_pending_emails(), (0, 3))
+        errors = sorted(EmailOutbox.objects.values_list('attempts', 'last_error'))
+        self.assertEqual(errors, [(1, 'Connection refused'), (1, 'Connection refused'), (1, 'Connection reset')])
+
+    def test_worker_loop_survives_a_failed_drain(self):
+        class Stop(Exception):
+            pass
+
+        drains = [RuntimeError('database went away'), (1, 0)]
+
+        def drain(command, batch_size):
+            result = drains.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        err, out = StringIO(), StringIO()
+        sleep = mock.Mock(side_effect=[None, Stop])
+        with mock.patch('myapp.management.commands.send_outbox_emails.Command.drain', drain), \
+                mock.patch('myapp.management.commands.send_outbox_emails.time.sleep', sleep):
+            with self.assertRaises(Stop):
+                call_command('send_outbox_emails', loop=True, stdout=out, stderr=err)
+        self.assertIn('database went away', err.getvalue())
+        self.assertIn('Sent 1 email(s)', out.getvalue())
+
+
+class QueueCounterTests(CanteenTestMixin, TestCase):
+    def set_status(self, order_id, new_status):
+        self.client.force_authenticate(self.admin)
+        return self.client.patch(reverse('update-order-status', args=[order_id]), {'status': new_status}, format='json')
+
+    def active_count(self):
+        self.food_court.refresh_from_db(fields=['active_order_count'])
+        return self.food_court.active_order_count
+
+    def test_counter_follows_order_lifecycle(self):
+        first = self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}]).data['id']
+        second = self.place_order([{'menu_item_id': self.menu_items[1].id, 'quantity': 1}]).data['id']
+        self.assertEqual(self.active_count(), 2)
+        self.set_status(first, 'preparing')
+        self.assertEqual(self.active_count(), 2)
+        self.set_status(first, 'ready')
+        self.set_status(second, 'cancelled')
+        self.assertEqual(self.active_count(), 0)
+        self.assertEqual(self.set_status(second, 'pending').status_code, 400)
+        self.assertEqual(self.active_count(), 0)
+
+    def test_food_court_list_does_not_count_orders(self):
+        for _ in range(3):
+            FoodCourt.objects.create(name='Extra court')
+        self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}])
+        self.client.force_authenticate(self.student)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('foodcourt-list'))
+        court = next(fc for fc in response.data if fc['id'] == self.food_court.id)
+        self.assertEqual(court['estimated_waiting_time'], 15.0)
+        self.assertFalse(any('myapp_order' in q['sql'] for q in ctx.captured_queries))
+
+    def test_settings_update_does_not_clobber_counter(self):
+        self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}])
+        self.client.force_authenticate(self.admin)
+        response = self.client.patch(reverse('update-food-court'), {'active_staff_count': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.active_count(), 1)
+
+    def test_rebuild_command_repairs_drift(self):
+        self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}])
+        FoodCourt.objects.update(active_order_count=42)
+        call_command('rebuild_queue_counters', stdout=StringIO())
+        self.assertEqual(self.active_count(), 1)
+
+
+class AdmissionControlTests(CanteenTestMixin, TestCase):
+    def order_one(self, user=None):
+        return self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}], user=user)
+
+    def set_policy(self, **fields):
+        FoodCourt.objects.filter(pk=self.food_court.pk).update(**fields)
+
+    def test_max_active_orders_turns_orders_away_with_retry_after(self):
+        self.set_policy(max_active_orders=2, active_staff_count=3)
+        self.assertEqual(self.order_one().status_code, 201)
+        self.assertEqual(self.order_one().status_code, 201)
+        response = self.order_one()
+        self.assertEqual(response.status_code, 429)
+        # 15 minutes per order over 3 staff
+        self.assertEqual(response['Retry-After'], '300')
+        self.assertEqual(response.data['retry_after'], 300)
+        self.assertEqual(Order.objects.count(), 2)
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.wallet_balance, Decimal('9960.00'))
+
+    def test_max_waiting_time_uses_estimated_wait(self):
+        # 2 staff at 15 minutes an order: 30 minutes is reached at 4 active orders
+        self.set_policy(max_waiting_time=30, active_staff_count=2)
+        for _ in range(4):
+            self.assertEqual(self.order_one().status_code, 201)
+        self.assertEqual(self.order_one().status_code, 429)
+        self.food_court.refresh_from_db()
+        self.assertEqual(self.food_court.get_estimated_waiting_time(), 30.0)
+        self.assertTrue(self.food_court.is_queue_full())
+
+    def test_finishing_an_order_readmits(self):
+        self.set_policy(max_active_orders=1)
+        order_id = self.order_one().data['id']
+        self.assertEqual(self.order_one().status_code, 429)
+        self.client.force_authenticate(self.admin)
+        self.client.patch(reverse('update-order-status', args=[order_id]), {'status': 'cancelled'}, format='json')
+        self.assertEqual(self.order_one().status_code, 201)
+
+    def test_conditional_increment_is_the_gate(self):
+        # Another worker filled the queue after this request loaded the court
+        self.set_policy(max_active_orders=1)
+        self.food_court.refresh_from_db()
+        self.set_policy(active_order_count=1)
+        with self.assertRaises(queue_module.QueueFull):
+            queue_module.admit_order(self.food_court)
+        self.food_court.refresh_from_db()
+        self.assertEqual(self.food_court.active_order_count, 1)
+
+    def test_policy_adds_no_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.order_one()
+        unlimited = len(ctx.captured_queries)
+        self.set_policy(max_active_orders=50, max_waiting_time=600)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.order_one().status_code, 201)
+        self.assertEqual(len(ctx.captured_queries), unlimited)
+
+    def test_full_court_rejects_without_writing(self):
+        self.set_policy(max_active_orders=1, active_order_count=1)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.order_one().status_code, 429)
+        self.assertFalse(any(q['sql'].startswith(('INSERT', 'UPDATE')) for q in ctx.captured_queries))
+
+    def test_queue_full_flag_in_food_court_list(self):
+        self.client.force_authenticate(self.student)
+        self.assertFalse(self.client.get(reverse('foodcourt-list')).data[0]['is_queue_full'])
+        self.set_policy(max_active_orders=1)
+        self.order_one()
+        django_cache.delete(cache_module.LIVE_KEY)  # what the short TTL does
+        self.assertTrue(self.client.get(reverse('foodcourt-list')).data[0]['is_queue_full'])
+        self.assertTrue(self.client.get(reverse('foodcourt-detail', args=[self.food_court.id])).data['is_queue_full'])
+
+    def test_admin_sets_and_clears_limits(self):
+        self.client.force_authenticate(self.admin)
+        url = reverse('update-food-court')
+        response = self.client.patch(url, {'max_active_orders': 25, 'max_waiting_time': 40}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['max_active_orders'], 25)
+        self.assertEqual(self.client.patch(url, {'max_waiting_time': 0}, format='json').status_code, 400)
+        self.assertEqual(self.client.patch(url, {'max_active_orders': 'many'}, format='json').status_code, 400)
+        self.client.patch(url, {'max_active_orders': None}, format='json')
+        self.food_court.refresh_from_db()
+        self.assertIsNone(self.food_court.max_active_orders)
+        self.assertEqual(self.food_court.max_waiting_time, 40)
+
+
+class FoodCourtCacheTests(CanteenTestMixin, TestCase):
+    def get_list(self):
+        self.client.force_authenticate(self.student)
+        return self.client.get(reverse('foodcourt-list'))
+
+    def get_detail(self):
+        self.client.force_authenticate(self.student)
+        return self.client.get(reverse('foodcourt-detail', args=[self.food_court.id]))
+
+    def test_list_and_detail_are_served_from_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.get_list()
+            self.get_detail()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_list().status_code, 200)
+            response = self.get_detail()
+        self.assertEqual(len(response.data['menu_items']), 20)
+
+    def test_menu_change_invalidates_only_that_detail(self):
+        self.get_list()
+        self.get_detail()
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('admin-menuitem-detail', args=[self.menu_items[0].id]),
+                              {'name': 'Masala Dosa'}, format='json')
+        with self.assertNumQueries(0):
+            self.get_list()
+        names = [item['name'] for item in self.get_detail().data['menu_items']]
+        self.assertIn('Masala Dosa', names)
+
+    def test_padded_id_shares_the_invalidated_entry(self):
+        url = reverse('foodcourt-list') + f'0{self.food_court.id}/'
+        self.client.force_authenticate(self.student)
+        self.client.get(url)
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('admin-menuitem-detail', args=[self.menu_items[0].id]),
+                              {'name': 'Masala Dosa'}, format='json')
+        self.client.force_authenticate(self.student)
+        self.assertIn('Masala Dosa', [item['name'] for item in self.client.get(url).data['menu_items']])
+        self.assertEqual(self.client.get(reverse('foodcourt-list') + 'main/').status_code, 404)
+
+    def test_status_change_invalidates_list(self):
+        self.get_list()
+        super_admin = User.objects.create_user(username='root', password='x', role='super_admin')
+        self.client.force_authenticate(super_admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('update-food-court-status', args=[self.food_court.id]),
+                              {'is_open': False}, format='json')
+        self.assertFalse(self.get_list().data[0]['is_open'])
+        self.assertFalse(self.get_detail().data['is_open'])
+
+    def test_waiting_time_refreshes_after_short_ttl(self):
+        self.assertEqual(self.get_list().data[0]['estimated_waiting_time'], 0)
+        self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}])
+        django_cache.delete(cache_module.LIVE_KEY)  # what the short TTL does
+        self.assertEqual(self.get_list().data[0]['estimated_waiting_time'], 15.0)
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                   'LOCATION': location}}
+            with override_settings(CACHES=backend):
+                self.get_detail()
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.get_detail().data['name'], 'Main Cafeteria')
+
+
+def make_image_data_uri(color='red', size=(800, 600)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+class MenuImageTests(CanteenTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        overrides = override_settings(MEDIA_ROOT=self.media_root.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.client.force_authenticate(self.admin)
+
+    def test_upload_stores_renditions_and_returns_urls(self):
+        response = self.client.patch(reverse('admin-menuitem-detail', args=[self.menu_items[0].id]),
+                                     {'image_url': make_image_data_uri()}, format='json')
+        self.assertEqual(response.status_code, 200)
+        item = MenuItem.objects.get(id=self.menu_items[0].id)
+        self.assertEqual(len(item.image_hash), 64)
+        self.assertIsNone(item.image_url)
+        self.assertTrue(response.data['image_url'].startswith('http://testserver/api/media/menu-images/'))
+        self.assertEqual(set(response.data['image_thumbnails']), {'thumb', 'small', 'medium', 'large'})
+
+        image = self.client.get(response.data['image_thumbnails']['small'])
+        self.assertEqual(image.status_code, 200)
+        self.assertEqual(image['Content-Type'], 'image/webp')
+        self.assertIn('immutable', image['Cache-Control'])
+        with Image.open(BytesIO(b''.join(image.streaming_content))) as thumbnail:
+            self.assertEqual(thumbnail.size, (320, 240))
+
+        cached = self.client.get(response.data['image_thumbnails']['small'], HTTP_IF_NONE_MATCH=image['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_resending_own_url_keeps_image(self):
+        url = self.client.patch(reverse('admin-menuitem-detail', args=[self.menu_items[0].id]),
+                                {'image_url': make_image_data_uri()}, format='json').data['image_url']
+        response = self.client.patch(reverse('admin-menuitem-detail', args=[self.menu_items[0].id]),
+                                     {'image_url': url, 'name': 'Renamed'}, format='json')
+        self.assertEqual(response.data['image_url'], url)
+        relative = self.client.patch(reverse('admin-menuitem-detail', args=[self.menu_items[0].id]),
+                                     {'image_url': url.replace('http://testserver', '')}, format='json')
+        self.assertEqual(relative.data['image_url'], url)
+
+    def test_foreign_or_unknown_image_url_is_kept_as_a_plain_url(self):
+        url = self.client.patch(reverse('admin-menuitem-detail', args=[self.menu_items[0].id]),
+                                {'image_url': make_image_data_uri()}, format='json').data['image_url']
+        foreign = url.replace('http://testserver', 'https://cdn.example.com')
+        unknown = reverse('menu-image', args=['0' * 64, 'large'])
+        for value in (foreign, unknown):
+            response = self.client.patch(reverse('admin-menuitem-detail', args=[self.menu_items[1].id]),
+                                         {'image_url': value}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['image_url'], value)
+            self.assertEqual(MenuItem.objects.get(id=self.menu_items[1].id).image_hash, '')
+
+    @override_settings(MENU_IMAGE_DEFAULT_VARIANT='medium')
+    def test_image_url_uses_the_configured_variant(self):
+        response = self.client.patch(reverse('admin-menuitem-detail', args=[self.menu_items[0].id]),
+                                     {'image_url': make_image_data_uri()}, format='json')
+        self.assertTrue(response.data['image_url'].endswith('/medium/'))
+
+    def test_invalid_image_is_rejected(self):
+        response = self.client.patch(reverse('admin-menuitem-detail', args=[self.menu_items[0].id]),
+                                     {'image_url': 'data:image/png;base64,bm90IGFuIGltYWdl'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_migrate_command_converts_base64_rows_in_batches(self):
+        MenuItem.objects.filter(id__in=[item.id for item in self.menu_items[:5]]).update(
+            image_url=make_image_data_uri('blue')
+        )
+        MenuItem.objects.filter(id=self.menu_items[5].id).update(image_url='https://example.com/dosa.jpg')
+        call_command('migrate_menu_images', batch_size=2, stdout=StringIO())
+        self.assertFalse(MenuItem.objects.filter(image_url__startswith='data:').exists())
+        hashes = set(MenuItem.objects.exclude(image_hash='').values_list('image_hash', flat=True))
+        self.assertEqual(len(hashes), 1)  # identical images share one stored copy
+        self.assertEqual(MenuItem.objects.get(id=self.menu_items[5].id).image_url, 'https://example.com/dosa.jpg')
+
+
+class KeysetPaginationTests(CanteenTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        base = timezone.now() - timedelta(hours=1)
+        self.orders = []
+        for i in range(7):
+            order = Order.objects.create(student=self.student, food_court=self.food_court, total_amount=10)
+            # Two orders share a timestamp to exercise the id tie-breaker
+            Order.objects.filter(id=order.id).update(created_at=base + timedelta(minutes=max(i, 1)))
+            self.orders.append(order)
+        self.client.force_authenticate(self.admin)
+
+    def fetch_all(self, url):
+        seen, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(order['id'] for order in response.data['results'])
+            url = response.data['next']
+            pages += 1
+            if pages == 1:
+                # A new order arriving mid-scan must not shift the pages
+                Order.objects.create(student=self.student, food_court=self.food_court, total_amount=10)
+        return seen, pages
+
+    def test_pages_cover_every_order_once_in_stable_order(self):
+        seen, pages = self.fetch_all(reverse('admin-orders') + '?envelope=1&page_size=3')
+        expected = list(Order.objects.filter(id__in=[o.id for o in self.orders])
+                        .order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 3)
+
+    def test_compat_mode_returns_bare_list_with_link_header(self):
+        response = self.client.get(reverse('admin-orders') + '?page_size=5')
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 5)
+        self.assertIn('rel="next"', response['Link'])
+        rest = self.client.get(reverse('admin-orders'), {'page_size': 5, 'cursor': response['X-Next-Cursor']})
+        self.assertEqual(len(rest.data), 2)
+        self.assertFalse(rest.has_header('Link'))
+
+    def test_page_size_is_bounded_and_bad_cursor_rejected(self):
+        with override_settings(KEYSET_MAX_PAGE_SIZE=4):
+            self.assertEqual(len(self.client.get(reverse('admin-orders') + '?page_size=1000').data), 4)
+        self.assertEqual(self.client.get(reverse('admin-orders') + '?cursor=garbage').status_code, 404)
+
+    def test_student_orders_and_wallet_are_paginated(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(len(self.client.get(reverse('student-order-list') + '?page_size=2').data), 2)
+        for _ in range(3):
+            wallet.credit(self.student, Decimal('1.00'), 'Wallet recharge')
+        response = self.client.get(reverse('wallet-transactions') + '?envelope=1&page_size=2')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+    @override_settings(KEYSET_MAX_PAGE_SIZE=20)
+    def test_cursor_loop_reaches_rows_past_the_first_page(self):
+        # What the frontend's apiFetchAll does for the admin picker
+        User.objects.bulk_create([User(username=f'admin{i}', role='food_court_admin') for i in range(45)])
+        super_admin = User.objects.create_user(username='root', password='x', role='super_admin')
+        self.client.force_authenticate(super_admin)
+        seen, cursor = [], None
+        while True:
+            params = {'envelope': '1', 'page_size': '200', **({'cursor': cursor} if cursor else {})}
+            page = self.client.get(reverse('all-users'), params).data
+            seen += [user['id'] for user in page['results']]
+            if not page['next']:
+                break
+            cursor = parse_qs(urlsplit(page['next']).query)['cursor'][0]
+        self.assertEqual(sorted(seen), sorted(User.objects.values_list('id', flat=True)))
+
+
+class OrderQueryCountTests(CanteenTestMixin, TestCase):
+    def create_orders(self, count):
+        Order.objects.all().delete()
+        orders = Order.objects.bulk_create([
+            Order(student=self.student, food_court=self.food_court, total_amount=40) for _ in range(count)
+        ])
+        orders = list(Order.objects.order_by('id'))
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menu_item=item, quantity=1, price=20)
+            for order in orders for item in self.menu_items[:2]
+        ])
+
+    def query_counts(self, user, url):
+        self.client.force_authenticate(user)
+        counts = []
+        for size in (1, 10, 100):
+            self.create_orders(size)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, {'page_size': 200})
+            self.assertEqual(len(response.data), size)
+            self.assertEqual(len(response.data[0]['items']), 2)
+            counts.append(len(ctx.captured_queries))
+        return counts
+
+    def test_admin_orders_query_count_is_constant(self):
+        # food court lookup, list validator, orders + student + food court, items + menu items
+        self.assertEqual(self.query_counts(self.admin, reverse('admin-orders')), [4, 4, 4])
+
+    def test_student_orders_query_count_is_constant(self):
+        self.assertEqual(self.query_counts(self.student, reverse('student-order-list')), [3, 3, 3])
+
+    def test_single_order_detail_query_count(self):
+        self.create_orders(1)
+        order = Order.objects.get()
+        self.client.force_authenticate(self.student)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('student-order-detail', args=[order.id]))
+        self.assertEqual(response.data['items'][0]['menu_item_name'], 'Item 0')
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_their_indexes(self):
+        for label, index_name, uses_index, plan in check_query_plans():
+            with self.subTest(label):
+                self.assertIsNot(uses_index, False, f'{label} should use {index_name}:\n{plan}')
+
+    def test_command_reports_success(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertNotIn('FAIL', out.getvalue())
+
+
+@override_settings(BUSINESS_TIME_ZONE='Asia/Kolkata')
+class DateWindowTests(CanteenTestMixin, TestCase):
+    def test_ranges_are_half_open_in_business_time_zone(self):
+        start, end = dates.day_range(date(2026, 3, 10))
+        self.assertEqual(start.astimezone(dt_timezone.utc), datetime(2026, 3, 9, 18, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(end - start, timedelta(days=1))
+        start, end = dates.week_range(date(2026, 3, 12))  # a Thursday
+        self.assertEqual((start.date(), end.date()), (date(2026, 3, 9), date(2026, 3, 16)))
+        start, end = dates.month_range(date(2026, 12, 31))
+        self.assertEqual((start.date(), end.date()), (date(2026, 12, 1), date(2027, 1, 1)))
+
+    def test_analytics_counts_orders_by_campus_day_with_range_filter(self):
+        day = dates.local_today()
+        late_evening = datetime.combine(day, time(23, 0), tzinfo=dates.business_timezone())
+        after_midnight = late_evening + timedelta(hours=1, minutes=30)
+        for created_at in (late_evening, after_midnight):
+            order = Order.objects.create(student=self.student, food_court=self.food_court, total_amount=25)
+            Order.objects.filter(id=order.id).update(created_at=created_at)
+        rollups.rebuild()
+
+        self.client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('admin-analytics'), {'date': day.isoformat()})
+        self.assertEqual(response.data['total_orders_today'], 1)
+        self.assertEqual(response.data['revenue_today'], Decimal('25'))
+        self.assertFalse(any('cast_date' in q['sql'] or 'DATE(' in q['sql'] for q in ctx.captured_queries))
+
+        response = self.client.get(reverse('admin-analytics'), {'period': 'month', 'date': day.isoformat()})
+        expected = 2 if after_midnight.month == late_evening.month else 1
+        self.assertEqual(response.data['total_orders_today'], expected)
+
+    def test_bad_period_is_rejected(self):
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(reverse('admin-analytics'), {'period': 'year'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('admin-analytics'), {'date': '31-12-2026'}).status_code, 400)
+
+
+class SalesRollupTests(CanteenTestMixin, TestCase):
+    def rollup_rows(self):
+        return (
+            sorted(DailySales.objects.values_list('food_court_id', 'day', 'order_count', 'cancelled_count', 'revenue')),
+            sorted(DailyItemSales.objects.values_list('food_court_id', 'day', 'menu_item_id', 'quantity', 'revenue')),
+        )
+
+    def set_status(self, order_id, new_status):
+        self.client.force_authenticate(self.admin)
+        return self.client.patch(reverse('update-order-status', args=[order_id]), {'status': new_status}, format='json')
+
+    def test_orders_and_cancellations_update_rollups(self):
+        first = self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 2}]).data['id']
+        self.place_order([
+            {'menu_item_id': self.menu_items[0].id, 'quantity': 1},
+            {'menu_item_id': self.menu_items[1].id, 'quantity': 3},
+        ])
+        sales = DailySales.objects.get(food_court=self.food_court, day=dates.local_today())
+        self.assertEqual((sales.order_count, sales.cancelled_count, sales.revenue), (2, 0, Decimal('120.00')))
+        self.assertEqual(DailyItemSales.objects.get(menu_item=self.menu_items[0]).quantity, 3)
+
+        self.assertEqual(self.set_status(first, 'cancelled').status_code, 200)
+        self.set_status(first, 'cancelled')  # no double counting
+        sales.refresh_from_db()
+        self.assertEqual((sales.order_count, sales.cancelled_count, sales.revenue), (1, 1, Decimal('80.00')))
+        self.assertEqual(DailyItemSales.objects.get(menu_item=self.menu_items[0]).quantity, 1)
+
+        self.assertEqual(self.set_status(first, 'preparing').status_code, 400)
+        sales.refresh_from_db()
+        self.assertEqual((sales.order_count, sales.cancelled_count, sales.revenue), (1, 1, Decimal('80.00')))
+
+    def test_rebuild_reproduces_incremental_rollups(self):
+        first = self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 2}]).data['id']
+        self.place_order([{'menu_item_id': self.menu_items[1].id, 'quantity': 4}])
+        self.set_status(first, 'cancelled')
+        incremental = self.rollup_rows()
+
+        DailySales.objects.update(order_count=0, revenue=0)
+        DailyItemSales.objects.all().delete()
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        rebuilt = self.rollup_rows()
+        self.assertEqual(rebuilt[0], incremental[0])
+        # Cancelled lines are subtracted incrementally but left out by the rebuild
+        self.assertEqual([row for row in incremental[1] if row[3]], rebuilt[1])
+
+    def test_migration_backfills_existing_orders(self):
+        first = self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 2}]).data['id']
+        self.place_order([{'menu_item_id': self.menu_items[1].id, 'quantity': 4}])
+        self.set_status(first, 'cancelled')
+        rows = self.rollup_rows()
+        DailySales.objects.all().delete()
+        DailyItemSales.objects.all().delete()
+        migration = importlib.import_module('myapp.migrations.0008_daily_sales_rollups')
+        migration.backfill_daily_sales(django_apps, None)
+        self.assertEqual(self.rollup_rows()[0], rows[0])
+        self.assertEqual(self.rollup_rows()[1], [row for row in rows[1] if row[3]])
+
+    def test_deleting_a_student_takes_their_orders_out(self):
+        other = User.objects.create_user(username='student2', password='x', role='student',
+                                         wallet_balance=Decimal('100.00'))
+        kept = self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}], user=other)
+        self.assertEqual(kept.status_code, 201)
+        cancelled = self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 2}]).data['id']
+        self.place_order([{'menu_item_id': self.menu_items[1].id, 'quantity': 3}])
+        self.set_status(cancelled, 'cancelled')
+
+        superadmin = User.objects.create_user(username='root', password='root123', role='super_admin')
+        self.client.force_authenticate(superadmin)
+        response = self.client.delete(reverse('delete-user', args=[self.student.id]))
+        self.assertEqual(response.status_code, 200)
+        sales = DailySales.objects.get()
+        self.assertEqual((sales.order_count, sales.cancelled_count, sales.revenue), (1, 0, Decimal('20.00')))
+        incremental = self.rollup_rows()
+        self.assertEqual(rollups.rebuild(), 1)
+        self.assertEqual(self.rollup_rows()[0], incremental[0])
+        self.assertEqual(self.rollup_rows()[1], [row for row in incremental[1] if row[3]])
+        self.food_court.refresh_from_db()
+        self.assertEqual(self.food_court.active_order_count, 1)
+
+    def test_food_court_counter_is_written_before_rollups(self):
+        # The lock order place_order uses; the other way round can deadlock on InnoDB
+        def tables_written(ctx):
+            return [table for q in ctx.captured_queries if q['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))
+                    for table in ('myapp_foodcourt', 'myapp_dailysales') if table in q['sql'].split(' SET ')[0]]
+
+        order_id = self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}]).data['id']
+        self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}])
+        with CaptureQueriesContext(connection) as ctx:
+            self.set_status(order_id, 'cancelled')
+        self.assertEqual(tables_written(ctx)[:2], ['myapp_foodcourt', 'myapp_dailysales'])
+
+        superadmin = User.objects.create_user(username='root', password='root123', role='super_admin')
+        self.client.force_authenticate(superadmin)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.delete(reverse('delete-user', args=[self.student.id]))
+        self.assertEqual(tables_written(ctx)[:2], ['myapp_foodcourt', 'myapp_dailysales'])
+
+    def test_analytics_read_rollups_not_orders(self):
+        self.place_order([{'menu_item_id': self.menu_items[2].id, 'quantity': 5}])
+        self.client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('admin-analytics'))
+        self.assertEqual(response.data['total_orders_today'], 1)
+        self.assertEqual(response.data['most_selling_item'], 'Item 2')
+        self.assertEqual(response.data['most_selling_quantity'], 5)
+        self.assertFalse(any('"myapp_order"' in q['sql'] for q in ctx.captured_queries))
+
+        superadmin = User.objects.create_user(username='root', password='root123', role='super_admin')
+        self.client.force_authenticate(superadmin)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('system-analytics'))
+        self.assertEqual(response.data['total_orders'], 1)
+        self.assertEqual(response.data['food_court_revenue'][0]['revenue'], 100.0)
+        self.assertFalse(any('"myapp_order"' in q['sql'] for q in ctx.captured_queries))
+
+
+class SystemAnalyticsTests(CanteenTestMixin, TestCase):
+    def report_queries(self):
+        superadmin = User.objects.get_or_create(username='root', defaults={'role': 'super_admin'})[0]
+        self.client.force_authenticate(superadmin)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('system-analytics'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_food_courts(self):
+        _, baseline = self.report_queries()
+        for i in range(10):
+            FoodCourt.objects.create(name=f'Court {i}')
+        response, queries = self.report_queries()
+        self.assertEqual(queries, baseline)
+        self.assertEqual(response.data['total_food_courts'], 11)
+        self.assertEqual(len(response.data['food_court_revenue']), 11)
+
+    def test_growth_compares_today_with_yesterday(self):
+        today = dates.local_today()
+        DailySales.objects.create(food_court=self.food_court, day=today, order_count=3, cancelled_count=1, revenue=150)
+        DailySales.objects.create(
+            food_court=self.food_court, day=today - timedelta(days=1), order_count=2, revenue=100
+        )
+        response, _ = self.report_queries()
+        self.assertEqual(response.data['total_revenue'], Decimal('250'))
+        self.assertEqual(response.data['today_revenue'], Decimal('150'))
+        self.assertEqual(response.data['total_orders'], 6)
+        self.assertEqual(response.data['food_court_revenue'][0], {
+            'id': self.food_court.id, 'name': 'Main Cafeteria', 'revenue': 250.0, 'orders': 5, 'growth': 50.0
+        })
+
+
+class RecordingBroker:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, message):
+        self.published.append((channel, json.loads(message)))
+
+
+@override_settings(ORDER_EVENTS_BROKER='myapp.tests.RecordingBroker')
+class OrderEventTests(CanteenTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        events._broker = None
+        self.addCleanup(setattr, events, '_broker', None)
+
+    def test_place_and_status_change_publish_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order_id = self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}]).data['id']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_authenticate(self.admin)
+            self.client.patch(reverse('update-order-status', args=[order_id]), {'status': 'preparing'}, format='json')
+
+        published = events.get_broker().published
+        self.assertEqual([channel for channel, _ in published], [
+            f'food_court:{self.food_court.id}', f'student:{self.student.id}',
+        ] * 2)
+        self.assertEqual(published[0][1]['event'], 'order.created')
+        self.assertEqual(published[2][1]['event'], 'order.updated')
+        self.assertEqual(published[2][1]['order']['status'], 'preparing')
+        self.assertEqual(len(published[0][1]['order']['items']), 1)
+
+    def test_failed_order_publishes_nothing(self):
+        self.student.wallet_balance = Decimal('0.00')
+        self.student.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(events.get_broker().published, [])
+
+
+@override_settings(ORDER_EVENTS_BROKER='myapp.events.InProcessBroker')
+class OrderEventStreamTests(CanteenTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        events._broker = None
+        self.addCleanup(setattr, events, '_broker', None)
+
+    async def test_stream_requires_token(self):
+        response = await self.async_client.get(reverse('order-events'))
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(reverse('order-events'), {'token': 'garbage'})
+        self.assertEqual(response.status_code, 401)
+        # Access tokens stay out of URLs
+        access = str(await sync_to_async(AccessToken.for_user)(self.student))
+        response = await self.async_client.get(reverse('order-events'), {'token': access})
+        self.assertEqual(response.status_code, 401)
+
+    def test_stream_token_only_opens_the_stream(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.post(reverse('order-events-token'))
+        self.assertEqual(response.data['expires_in'], 60)
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['token']}")
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 401)
+
+    def test_wsgi_gets_503_instead_of_a_stream_that_never_answers(self):
+        self.client.force_authenticate(self.student)
+        token = self.client.post(reverse('order-events-token')).data['token']
+        response = self.client.get(reverse('order-events'), {'token': token})
+        self.assertEqual(response.status_code, 503)
+
+    async def test_student_stream_receives_own_events(self):
+        token = str(await sync_to_async(events.StreamToken.for_user)(self.student))
+        response = await self.async_client.get(reverse('order-events'), {'token': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertTrue((await anext(chunks)).startswith(b'retry:'))
+
+        # Subscribed once the first chunk is out; only the student's own channel is delivered
+        broker = events.get_broker()
+        broker.publish(events.student_channel(self.student.id + 1), json.dumps({'event': 'other'}))
+        broker.publish(events.student_channel(self.student.id), json.dumps({'event': 'order.updated'}))
+        chunk = await asyncio.wait_for(anext(chunks), 5)
+        self.assertEqual(chunk, b'event: order\ndata: {"event": "order.updated"}\n\n')
+        await response.streaming_content.aclose()
+
+
+class ConditionalGetTests(CanteenTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.order_id = self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}]).data['id']
+
+    def assert_revalidates(self, user, url_name, change):
+        self.client.force_authenticate(user)
+        url = reverse(url_name)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        self.assertLessEqual(len(ctx.captured_queries), 2)
+
+        # Another page of the same list is a different representation
+        self.assertEqual(self.client.get(url, {'page_size': 1}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        change()
+        self.client.force_authenticate(user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_admin_orders(self):
+        def change():
+            self.client.force_authenticate(self.admin)
+            self.client.patch(reverse('update-order-status', args=[self.order_id]), {'status': 'preparing'}, format='json')
+        self.assert_revalidates(self.admin, 'admin-orders', change)
+
+    def test_student_orders(self):
+        def change():
+            self.place_order([{'menu_item_id': self.menu_items[1].id, 'quantity': 1}])
+        self.assert_revalidates(self.student, 'student-order-list', change)
+
+    def test_wallet_transactions(self):
+        self.assert_revalidates(
+            self.student, 'wallet-transactions', lambda: wallet.credit(self.student, Decimal('50.00'), 'Top up')
+        )
+
+    def test_if_modified_since(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('admin-orders'))
+        last_modified = response['Last-Modified']
+        response = self.client.get(reverse('admin-orders'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+
+class OrderChangeFeedTests(CanteenTestMixin, TestCase):
+    def changes(self, **params):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('admin-order-changes'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def set_status(self, order_id, new_status):
+        self.client.force_authenticate(self.admin)
+        self.client.patch(reverse('update-order-status', args=[order_id]), {'status': new_status}, format='json')
+
+    def age_orders(self, seconds=60):
+        # Move existing changes out of the overlap window
+        Order.objects.update(updated_at=timezone.now() - timedelta(seconds=seconds))
+
+    def test_active_mode_starts_from_open_orders(self):
+        ids = [self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}]).data['id'] for _ in range(3)]
+        self.set_status(ids[0], 'cancelled')
+        data = self.changes(active=1)
+        self.assertEqual({order['id'] for order in data['results']}, set(ids[1:]))
+        self.assertFalse(data['has_more'])
+
+    def test_only_changes_after_cursor_are_returned(self):
+        first, second = [
+            self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}]).data['id'] for _ in range(2)
+        ]
+        self.age_orders()
+        cursor = self.changes(active=1)['cursor']
+        self.assertEqual(self.changes(since=cursor)['results'], [])
+
+        self.set_status(first, 'cancelled')
+        data = self.changes(since=cursor, active=1)
+        self.assertEqual([(order['id'], order['status']) for order in data['results']], [(first, 'cancelled')])
+        self.assertEqual(len(data['results'][0]['items']), 1)
+
+    def test_recent_changes_are_resent_and_pages_follow_cursor(self):
+        ids = [self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}]).data['id'] for _ in range(3)]
+        data = self.changes(page_size=2)
+        self.assertEqual([order['id'] for order in data['results']], ids[:2])
+        self.assertTrue(data['has_more'])
+        data = self.changes(page_size=2, since=data['cursor'])
+        self.assertEqual([order['id'] for order in data['results']], ids[2:])
+        # Changes inside the overlap window come back on the next poll
+        self.assertEqual(len(self.changes(since=data['cursor'])['results']), 3)
+
+    def test_bad_cursor_is_rejected(self):
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(reverse('admin-order-changes'), {'since': '!!'}).status_code, 404)
+
+
+@override_settings(AUTH_USER_CACHE=True)
+class CachedAuthenticationTests(CanteenTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.superadmin = User.objects.create_user(username='root', password='root123', role='super_admin')
+        self.token_client = APIClient()
+        self.token_client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.student)}')
+
+    def test_user_is_not_loaded_from_database_when_cached(self):
+        self.assertEqual(self.token_client.get(reverse('profile')).status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.token_client.get(reverse('profile'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'student1')
+        self.assertEqual(response.data['wallet_balance'], '10000.00')
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_blocking_applies_to_next_request(self):
+        self.assertEqual(self.token_client.get(reverse('profile')).status_code, 200)
+        self.client.force_authenticate(self.superadmin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('block-user', args=[self.student.id]), {'is_blocked': True}, format='json')
+        self.assertEqual(self.token_client.get(reverse('profile')).status_code, 401)
+
+    def test_wallet_change_refreshes_cached_balance(self):
+        self.assertEqual(self.token_client.get(reverse('wallet-balance')).data['balance'], Decimal('10000.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            wallet.credit(self.student, Decimal('25.00'), 'Top up')
+        self.assertEqual(self.token_client.get(reverse('wallet-balance')).data['balance'], Decimal('10025.00'))
+
+    def test_deleted_user_is_rejected(self):
+        self.assertEqual(self.token_client.get(reverse('profile')).status_code, 200)
+        self.client.force_authenticate(self.superadmin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('delete-user', args=[self.student.id]))
+        self.assertEqual(self.token_client.get(reverse('profile')).status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE=False)
+    def test_per_process_cache_is_not_used_for_users(self):
+        self.assertEqual(self.token_client.get(reverse('profile')).status_code, 200)
+        # A block written by another worker, whose cache invalidation this process never sees
+        User.objects.filter(id=self.student.id).update(is_blocked=True)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.token_client.get(reverse('profile')).status_code, 401)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+# The replica alias points at the test database so routing decisions can be observed
+@override_settings(DATABASE_REPLICA_ALIAS='default', REPLICA_READS=True)
+class ReplicaRoutingTests(CanteenTestMixin, TestCase):
+    def token_client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client
+
+    def routed_reads(self, client, url):
+        decisions = []
+        original = ReplicaRouter.db_for_read
+
+        def recording(router, model, **hints):
+            alias = original(router, model, **hints)
+            decisions.append(alias)
+            return alias
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', recording):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return decisions
+
+    def test_analytics_and_lists_read_from_replica(self):
+        admin = self.token_client(self.admin)
+        self.assertIn('default', self.routed_reads(admin, reverse('admin-analytics')))
+        self.assertIn('default', self.routed_reads(admin, reverse('admin-orders')))
+        self.assertNotIn('default', self.routed_reads(admin, reverse('admin-food-court')))
+
+    @override_settings(REPLICA_READS=False)
+    def test_replica_is_not_read_without_shared_pins(self):
+        admin = self.token_client(self.admin)
+        self.assertNotIn('default', self.routed_reads(admin, reverse('admin-orders')))
+
+    def test_user_reads_own_writes_from_primary(self):
+        student = self.token_client(self.student)
+        self.assertIn('default', self.routed_reads(student, reverse('student-order-list')))
+        response = student.post(reverse('place-order'), {
+            'food_court': self.food_court.id,
+            'items': [{'menu_item_id': self.menu_items[0].id, 'quantity': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('default', self.routed_reads(student, reverse('student-order-list')))
+        # Other users are not pinned
+        self.assertIn('default', self.routed_reads(self.token_client(self.admin), reverse('admin-orders')))
+
+
+class MenuBulkTests(CanteenTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+        self.other_court = FoodCourt.objects.create(name='North Campus')
+        self.foreign_item = MenuItem.objects.create(food_court=self.other_court, name='Elsewhere', price=Decimal('5.00'))
+
+    def test_json_import_creates_and_updates_in_constant_queries(self):
+        rows = [{'name': f'New {i}', 'price': '12.50', 'category': 'Snacks'} for i in range(30)]
+        rows += [
+            {'id': self.menu_items[0].id, 'name': 'Renamed', 'price': '30.00'},
+            {'name': 'Item 1', 'price': '25.00', 'is_available': False},
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('admin-menuitem-import-items'), rows, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data, {'created': 30, 'updated': 2})
+        self.assertLessEqual(len(ctx.captured_queries), 8)
+        self.menu_items[0].refresh_from_db()
+        self.menu_items[1].refresh_from_db()
+        self.assertEqual((self.menu_items[0].name, self.menu_items[0].price), ('Renamed', Decimal('30.00')))
+        self.assertFalse(self.menu_items[1].is_available)
+        self.assertEqual(MenuItem.objects.filter(food_court=self.food_court, category='Snacks').count(), 30)
+
+    def test_csv_import(self):
+        body = 'name,price,category,is_available\nSamosa,15,Snacks,true\nItem 2,22.5,,false\n'
+        response = self.client.generic('POST', reverse('admin-menuitem-import-items'), body, content_type='text/csv')
+        self.assertEqual(response.data, {'created': 1, 'updated': 1})
+        self.menu_items[2].refresh_from_db()
+        self.assertEqual((self.menu_items[2].price, self.menu_items[2].is_available), (Decimal('22.50'), False))
+
+    def test_import_rejects_invalid_rows_and_foreign_items(self):
+        response = self.client.post(reverse('admin-menuitem-import-items'), [{'name': 'Bad', 'price': '-1'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('admin-menuitem-import-items'), [
+            {'id': self.foreign_item.id, 'name': 'Mine now', 'price': '1.00'},
+        ], format='json')
+        self.assertEqual(response.status_code, 403)
+        self.foreign_item.refresh_from_db()
+        self.assertEqual(self.foreign_item.name, 'Elsewhere')
+
+    def test_export_streams_own_menu(self):
+        response = self.client.get(reverse('admin-menuitem-export'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,name,description,price,category,is_available')
+        self.assertEqual(len(lines), 21)
+        response = self.client.get(reverse('admin-menuitem-export'), {'fmt': 'json'})
+        items = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([item['name'] for item in items], [f'Item {i}' for i in range(20)])
+
+    @override_settings(MENU_BULK_BATCH_SIZE=8)
+    def test_export_reads_bounded_keyset_chunks(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('admin-menuitem-export'), {'fmt': 'json'})
+            items = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(items), 20)
+        selects = [q['sql'] for q in ctx.captured_queries if 'myapp_menuitem' in q['sql'] and 'LIMIT' in q['sql']]
+        self.assertEqual(len(selects), 3)
+        self.assertNotIn('"id" >', selects[0])
+        self.assertTrue(all('LIMIT 8' in sql and '"id" >' in sql for sql in selects[1:]))
+
+    @override_settings(MENU_BULK_BATCH_SIZE=8)
+    async def test_export_is_async_under_asgi(self):
+        token = str(await sync_to_async(AccessToken.for_user)(self.admin))
+        response = await self.async_client.get(reverse('admin-menuitem-export'), headers={'Authorization': f'Bearer {token}'})
+        self.assertTrue(response.is_async)
+        pieces = [piece async for piece in response.streaming_content]
+        # Header, three chunks, no trailer
+        self.assertEqual(len([piece for piece in pieces if piece]), 4)
+        self.assertEqual(len(b''.join(pieces).decode().splitlines()), 21)
+
+    def test_bulk_availability_and_price_are_single_updates(self):
+        MenuItem.objects.filter(id__in=[item.id for item in self.menu_items[:5]]).update(category='Drinks')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('admin-menuitem-bulk-availability'),
+                                        {'category': 'Drinks', 'is_available': False}, format='json')
+        self.assertEqual(response.data, {'updated': 5})
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in ctx.captured_queries), 1)
+        self.assertEqual(MenuItem.objects.filter(food_court=self.food_court, is_available=False).count(), 5)
+
+        ids = [self.menu_items[0].id, self.menu_items[1].id]
+        response = self.client.post(reverse('admin-menuitem-bulk-price'), {'ids': ids, 'percent': '12.5'}, format='json')
+        self.assertEqual(response.data, {'updated': 2})
+        self.assertEqual(set(MenuItem.objects.filter(id__in=ids).values_list('price', flat=True)), {Decimal('22.50')})
+
+    def test_bulk_price_rejects_prices_the_column_cannot_hold(self):
+        MenuItem.objects.filter(id=self.menu_items[0].id).update(price=Decimal('50000000.00'))
+        response = self.client.post(reverse('admin-menuitem-bulk-price'),
+                                    {'ids': [self.menu_items[0].id], 'percent': '100'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('percent', response.data)
+        response = self.client.post(reverse('admin-menuitem-bulk-price'),
+                                    {'category': '', 'percent': '100000'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(MenuItem.objects.get(id=self.menu_items[0].id).price, Decimal('50000000.00'))
+
+    def test_bulk_actions_check_ownership_and_selection(self):
+        response = self.client.post(reverse('admin-menuitem-bulk-price'),
+                                    {'ids': [self.foreign_item.id], 'percent': '50'}, format='json')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(reverse('admin-menuitem-bulk-availability'), {'is_available': True}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_single_item_ownership_is_forbidden_not_an_error(self):
+        response = self.client.post(reverse('admin-menuitem-list'), {
+            'food_court': self.other_court.id, 'name': 'Sneaky', 'price': '1.00',
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class BulkOrderStatusTests(CanteenTestMixin, TestCase):
+    def place_orders(self, count):
+        return [
+            self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 2}]).data['id']
+            for _ in range(count)
+        ]
+
+    def bulk_status(self, ids, new_status):
+        self.client.force_authenticate(self.admin)
+        return self.client.post(reverse('bulk-update-order-status'), {'ids': ids, 'status': new_status}, format='json')
+
+    def test_batch_moves_orders_and_reports_each_id(self):
+        ids = self.place_orders(3)
+        other_court = FoodCourt.objects.create(name='Other', admin=None)
+        foreign = Order.objects.create(student=self.student, food_court=other_court, total_amount=Decimal('5.00'))
+        self.bulk_status([ids[0]], 'preparing')
+
+        response = self.bulk_status(ids + [foreign.id, 999999], 'preparing')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['result'] for row in response.data['results']],
+                         ['unchanged', 'updated', 'updated', 'not_found', 'not_found'])
+        self.assertEqual(set(Order.objects.filter(id__in=ids).values_list('status', flat=True)), {'preparing'})
+        self.assertEqual(Order.objects.get(id=foreign.id).status, 'pending')
+
+    def test_counters_and_rollups_follow_the_batch(self):
+        ids = self.place_orders(4)
+        self.bulk_status(ids[:3], 'preparing')
+        self.bulk_status(ids[:2], 'ready')
+        self.food_court.refresh_from_db()
+        self.assertEqual(self.food_court.active_order_count, 2)
+
+        self.bulk_status(ids, 'cancelled')
+        self.food_court.refresh_from_db()
+        self.assertEqual(self.food_court.active_order_count, 0)
+        sales = DailySales.objects.get(food_court=self.food_court)
+        self.assertEqual((sales.order_count, sales.cancelled_count, sales.revenue), (0, 4, Decimal('0.00')))
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        counts = []
+        for size in (2, 10):
+            ids = self.place_orders(size)
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.bulk_status(ids, 'preparing').status_code, 200)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_invalid_transitions_are_reported_not_applied(self):
+        ids = self.place_orders(2)
+        self.bulk_status([ids[0]], 'cancelled')
+        response = self.bulk_status(ids, 'completed')
+        self.assertEqual([row['result'] for row in response.data['results']], ['invalid', 'invalid'])
+        response = self.bulk_status(ids, 'preparing')
+        self.assertEqual([row['result'] for row in response.data['results']], ['invalid', 'updated'])
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.bulk_status([], 'ready').status_code, 400)
+        self.assertEqual(self.bulk_status(['1'], 'ready').status_code, 400)
+        self.assertEqual(self.bulk_status([True], 'preparing').status_code, 400)
+        self.assertEqual(self.bulk_status(self.place_orders(1), 'lost').status_code, 400)
+        with self.settings(ORDER_BULK_STATUS_MAX=2):
+            self.assertEqual(self.bulk_status([1, 2, 3], 'ready').status_code, 400)
+
+
+class OrderStatusTransitionTests(CanteenTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.order_id = self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}]).data['id']
+        self.client.force_authenticate(self.admin)
+
+    def set_status(self, new_status, **extra):
+        return self.client.patch(reverse('update-order-status', args=[self.order_id]),
+                                 {'status': new_status, **extra}, format='json')
+
+    def test_orders_follow_the_transition_table(self):
+        self.assertEqual(self.set_status('completed').status_code, 400)
+        for new_status in ('preparing', 'ready', 'completed'):
+            self.assertEqual(self.set_status(new_status).status_code, 200)
+        response = self.set_status('pending')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.get(id=self.order_id).status, 'completed')
+
+    def test_stale_expected_status_is_a_conflict(self):
+        self.assertEqual(self.set_status('preparing', expected_status='pending').status_code, 200)
+        response = self.set_status('cancelled', expected_status='pending')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['status'], 'preparing')
+        # Retrying a change that already happened is not a conflict
+        self.assertEqual(self.set_status('preparing', expected_status='pending').status_code, 200)
+
+    def test_update_is_a_compare_and_swap(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.set_status('preparing')
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "myapp_order"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"status" = \'pending\'', updates[0].split('WHERE')[1])
+        self.assertNotIn('"total_amount"', updates[0])
+
+    def test_status_changed_underneath_is_reported(self):
+        order = Order.objects.only('id', 'status', 'food_court', 'student', 'total_amount', 'created_at').get(
+            id=self.order_id
+        )
+        Order.objects.filter(id=self.order_id).update(status='cancelled')
+        with self.assertRaises(order_status.StatusConflict):
+            with transaction.atomic():
+                order_status.change_status(self.food_court, [order], 'preparing')
+        self.food_court.refresh_from_db()
+        self.assertEqual(self.food_court.active_order_count, 1)
+
+
+class ExportTests(CanteenTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.superadmin = User.objects.create_user(username='root', password='root123', role='super_admin')
+        self.order_ids = [
+            self.place_order([{'menu_item_id': self.menu_items[i].id, 'quantity': 2}]).data['id'] for i in range(3)
+        ]
+        self.client.force_authenticate(self.superadmin)
+
+    def export(self, dataset, **params):
+        response = self.client.get(reverse('export-data', args=[dataset]), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_and_ndjson_stream_every_row(self):
+        rows = list(csv.DictReader(self.export('orders').decode().splitlines()))
+        self.assertEqual([int(row['id']) for row in rows], self.order_ids)
+        self.assertEqual(rows[0]['total_amount'], '40.00')
+
+        lines = self.export('order-items', fmt='ndjson').decode().splitlines()
+        items = [json.loads(line) for line in lines]
+        self.assertEqual([item['menu_item_name'] for item in items], ['Item 0', 'Item 1', 'Item 2'])
+        self.assertEqual(items[0]['food_court_id'], self.food_court.id)
+
+        ledger = [json.loads(line) for line in self.export('wallet-transactions', fmt='ndjson').decode().splitlines()]
+        self.assertEqual([row['order_id'] for row in ledger], self.order_ids)
+
+    def test_filters_by_day_and_food_court(self):
+        Order.objects.filter(id=self.order_ids[0]).update(created_at=timezone.now() - timedelta(days=40))
+        today = dates.local_today().isoformat()
+        rows = list(csv.DictReader(self.export('orders', **{'from': today, 'to': today}).decode().splitlines()))
+        self.assertEqual([int(row['id']) for row in rows], self.order_ids[1:])
+        other = FoodCourt.objects.create(name='Other')
+        self.assertEqual(self.export('orders', food_court=other.id).decode().splitlines(), [
+            'id,student_id,food_court_id,status,total_amount,created_at,updated_at'
+        ])
+
+    def test_rows_are_fetched_in_bounded_chunks(self):
+        queryset = exports.rows('orders')
+        with CaptureQueriesContext(connection) as ctx:
+            pieces = [piece for piece in exports.stream('orders', 'ndjson', queryset, chunk_size=2) if piece]
+        self.assertEqual([piece.count('\n') for piece in pieces], [2, 1])
+        # Each chunk is its own LIMIT query picking up after the last id, no cursor left open
+        queries = [q['sql'] for q in ctx.captured_queries]
+        self.assertEqual(len(queries), 2)
+        self.assertTrue(all(sql.endswith('LIMIT 2') for sql in queries))
+        self.assertNotIn('"id" >', queries[0])
+        self.assertIn(f'"myapp_order"."id" > {self.order_ids[1]}', queries[1])
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    async def test_streams_asynchronously_under_asgi(self):
+        token = str(await sync_to_async(AccessToken.for_user)(self.superadmin))
+        response = await self.async_client.get(reverse('export-data', args=['orders']), {'fmt': 'ndjson'},
+                                               headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        pieces = [piece async for piece in response.streaming_content if piece]
+        self.assertEqual(len(pieces), 2)
+        self.assertEqual([json.loads(line)['id'] for line in b''.join(pieces).splitlines()], self.order_ids)
+
+    def test_rejects_bad_requests(self):
+        for params in ({'fmt': 'xlsx'}, {'from': 'yesterday'}, {'from': '2026-02-02', 'to': '2026-02-01'},
+                       {'food_court': 'main'}):
+            self.assertEqual(self.client.get(reverse('export-data', args=['orders']), params).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export-data', args=['users'])).status_code, 404)
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(reverse('export-data', args=['orders'])).status_code, 403)
+
+    @unittest.skipUnless(exports.parquet_available(), 'pyarrow is not installed')
+    def test_parquet_export(self):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(BytesIO(self.export('orders', fmt='parquet')))
+        self.assertEqual(table.column('id').to_pylist(), self.order_ids)
+        self.assertEqual(table.column('total_amount').to_pylist(), [Decimal('40.00')] * 3)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'items.parquet')
+            call_command('export_data', 'order-items', '--format', 'parquet', '--output', path,
+                         '--chunk-size', '2', stderr=StringIO())
+            parquet = pq.ParquetFile(path)
+            self.assertEqual((parquet.metadata.num_rows, parquet.num_row_groups), (3, 2))
+
+
+class MetricsTests(CanteenTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+        self.superadmin = User.objects.create_user(username='root', password='root123', role='super_admin')
+
+    def scrape(self):
+        self.client.force_authenticate(self.superadmin)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode().splitlines()
+
+    def test_requests_are_recorded_per_route(self):
+        self.place_order([{'menu_item_id': self.menu_items[0].id, 'quantity': 1}])
+        self.client.force_authenticate(self.student)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('student-order-list'))
+        order_list_queries = len(ctx.captured_queries)
+        self.client.get('/api/no-such-page/')
+
+        stats = metrics.registry.collect()
+        orders = stats[('student-order-list', 'GET')]
+        self.assertEqual(orders['statuses'], {'200': 1})
+        self.assertEqual(orders['queries_sum'], order_list_queries)
+        self.assertGreater(orders['size_sum'], 0)
+        self.assertEqual(stats[('place-order', 'POST')]['statuses'], {'201': 1})
+        self.assertIn(('unmatched', 'GET'), stats)
+
+        lines = self.scrape()
+        self.assertIn('canteen_http_requests_total{route="place-order",method="POST",status="201"} 1', lines)
+        self.assertIn('canteen_http_request_duration_seconds_count{route="student-order-list",method="GET"} 1', lines)
+        self.assertIn('canteen_http_db_queries_bucket{route="student-order-list",method="GET",le="+Inf"} 1', lines)
+        self.assertIn('# TYPE canteen_http_response_size_bytes histogram', lines)
+
+    def test_endpoint_is_for_super_admins(self):
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    def test_multiprocess_mode_adds_up_worker_files(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_MULTIPROC_DIR=directory):
+            worker = metrics.Registry()
+            worker.record('admin-orders', 'GET', 200, 0.02, 3, 0.001, 512)
+            worker.record('admin-orders', 'GET', 304, 0.004, 1, 0.0005, 0)
+            worker.flush()
+            os.rename(os.path.join(directory, f'metrics_{os.getpid()}.json'), os.path.join(directory, 'metrics_1.json'))
+            metrics.registry.record('admin-orders', 'GET', 200, 0.3, 5, 0.01, 2048)
+
+            totals = metrics.registry.collect()[('admin-orders', 'GET')]
+            self.assertEqual(totals['statuses'], {'200': 2, '304': 1})
+            self.assertEqual(totals['queries_sum'], 9)
+            self.assertEqual(sum(totals['duration']), 3)
+
+
+class GenerateSampleDataTests(TestCase):
+    def generate(self, **options):
+        options = {'courts': 2, 'menu_size': 8, 'students': 30, 'days': 3, 'orders_per_day': 40, **options}
+        out = StringIO()
+        call_command('generate_sample_data', stdout=out, **options)
+        return out.getvalue()
+
+    def test_generates_consistent_history_and_is_idempotent(self):
+        self.generate()
+        order_count = Order.objects.count()
+        self.assertGreater(order_count, 0)
+        self.assertEqual(FoodCourt.objects.count(), 2)
+        self.assertEqual(User.objects.filter(role='student').count(), 30)
+        self.assertEqual(MenuItem.objects.count(), 16)
+
+        start, _ = dates.day_range(dates.local_today() - timedelta(days=3))
+        _, end = dates.day_range(dates.local_today() - timedelta(days=1))
+        self.assertFalse(Order.objects.filter(Q(created_at__lt=start) | Q(created_at__gte=end)).exists())
+        self.assertFalse(Order.objects.filter(updated_at__lte=F('created_at')).exists())
+        # Every order has lines adding up to its total and one debit
+        for order in Order.objects.prefetch_related('items', 'transactions')[:20]:
+            self.assertEqual(sum(item.price * item.quantity for item in order.items.all()), order.total_amount)
+            self.assertEqual([t.transaction_type for t in order.transactions.all()], ['debit'])
+        for student in User.objects.filter(role='student', wallet_transactions__isnull=False).distinct()[:10]:
+            last = student.wallet_transactions.order_by('-created_at', '-id').first()
+            self.assertEqual(last.balance_after, student.wallet_balance)
+            self.assertGreaterEqual(student.wallet_balance, 0)
+
+        rollup_total = DailySales.objects.aggregate(total=Sum('order_count') + Sum('cancelled_count'))['total']
+        self.assertEqual(rollup_total, order_count)
+
+        output = self.generate()
+        self.assertIn('0 orders on 0 new day(s), 3 day(s) already present', output)
+        self.assertEqual(Order.objects.count(), order_count)
+        self.assertEqual(User.objects.filter(role='student').count(), 30)
+
+        # Balances chain forward from the newest ledger entry, so earlier days are not backfilled
+        balances = dict(User.objects.filter(role='student').values_list('id', 'wallet_balance'))
+        err = StringIO()
+        call_command('generate_sample_data', courts=2, menu_size=8, students=30, days=4, orders_per_day=40,
+                     stdout=StringIO(), stderr=err)
+        self.assertIn('Skipped 1 day(s)', err.getvalue())
+        self.assertEqual(Order.objects.count(), order_count)
+        self.assertEqual(dict(User.objects.filter(role='student').values_list('id', 'wallet_balance')), balances)
+
+    def test_queries_do_not_grow_with_order_volume(self):
+        self.generate(days=1)
+        counts = []
+        # Kept under SQLite's 999 parameters per INSERT, past which bulk_create splits batches
+        for orders_per_day in (15, 45):
+            Order.objects.all().delete()
+            WalletTransaction.objects.all().delete()
+            with CaptureQueriesContext(connection) as ctx:
+                self.generate(days=1, orders_per_day=orders_per_day)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
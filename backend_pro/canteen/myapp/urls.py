@@ -21,10 +21,19 @@ urlpatterns = [
     path('student/wallet/add/', views.add_wallet_balance, name='add-wallet-balance'),
     path('student/orders/place/', views.StudentOrderViewSet.as_view({'post': 'place_order'}), name='place-order'),
     
+    # Live order updates for the signed in student or food court admin
+    path('events/orders/', views.order_events, name='order-events'),
+    path('events/orders/token/', views.order_events_token, name='order-events-token'),
+    
+    # Menu images (public, content addressed)
+    path('media/menu-images/<str:digest>/<str:variant>/', views.menu_image, name='menu-image'),
+    
     # Food Court Admin endpoints
     path('admin/food-court/', views.admin_food_court, name='admin-food-court'),
     path('admin/food-court/update/', views.update_food_court, name='update-food-court'),
     path('admin/orders/', views.admin_orders, name='admin-orders'),
+    path('admin/orders/bulk-status/', views.bulk_update_order_status, name='bulk-update-order-status'),
+    path('admin/orders/changes/', views.admin_order_changes, name='admin-order-changes'),
     path('admin/orders/<int:order_id>/status/', views.update_order_status, name='update-order-status'),
     path('admin/analytics/', views.admin_analytics, name='admin-analytics'),
     
@@ -39,6 +48,10 @@ urlpatterns = [
     path('superadmin/users/<int:user_id>/update/', views.update_user, name='update-user'),
     path('superadmin/users/<int:user_id>/delete/', views.delete_user, name='delete-user'),
     path('superadmin/analytics/', views.system_analytics, name='system-analytics'),
+    path('superadmin/exports/<str:dataset>/', views.export_data, name='export-data'),
+    
+    # Request metrics in the Prometheus text format (super admin)
+    path('metrics/', views.metrics_view, name='metrics'),
     
     # Router URLs
     path('', include(router.urls)),
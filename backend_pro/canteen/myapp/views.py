@@ -2,22 +2,33 @@ from rest_framework import viewsets, status, generics
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.db.models import Sum, Count, Q
+from rest_framework.exceptions import AuthenticationFailed, NotFound, PermissionDenied
+from asgiref.sync import sync_to_async
+from django.db.models import Sum, Count, Q, prefetch_related_objects
 from django.db import transaction
-from django.utils import timezone
-from django.core.mail import send_mail
 from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag, require_safe
+from collections import Counter
 from datetime import datetime, timedelta
 from decimal import Decimal
+import csv
 
-from .models import User, FoodCourt, MenuItem, Order, OrderItem, WalletTransaction
+from .models import User, FoodCourt, MenuItem, Order, OrderItem, OrderQuerySet, WalletTransaction, DailySales, DailyItemSales
 from .serializers import (
     UserSerializer, RegisterSerializer, LoginSerializer,
     FoodCourtSerializer, FoodCourtDetailSerializer, MenuItemSerializer,
-    OrderSerializer, CreateOrderSerializer, WalletTransactionSerializer
+    OrderSerializer, CreateOrderSerializer, WalletTransactionSerializer,
+    MenuItemImportSerializer, MenuAvailabilitySerializer, MenuPriceChangeSerializer
 )
+from .pagination import KeysetPagination, UserKeysetPagination, decode_cursor, paginated_response
+from .authentication import CachedJWTAuthentication
 from .permissions import IsStudent, IsFoodCourtAdmin, IsSuperAdmin, IsFoodCourtAdminOrSuperAdmin
+from . import cache, changes, conditional, dates, db_router, events, exports, images, metrics, menu_bulk, notifications, order_status, queue, rollups, streaming, wallet
 
 # Authentication Views
 @api_view(['POST'])
@@ -59,7 +70,7 @@ def profile(request):
 
 # Student Views
 class FoodCourtViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = FoodCourt.objects.all()
+    queryset = FoodCourt.objects.select_related('admin')
     serializer_class = FoodCourtSerializer
     permission_classes = [IsAuthenticated]
     
@@ -67,13 +78,39 @@ class FoodCourtViewSet(viewsets.ReadOnlyModelViewSet):
         if self.action == 'retrieve':
             return FoodCourtDetailSerializer
         return FoodCourtSerializer
+    
+    # Both endpoints are served from myapp.cache and rebuilt only after a menu or settings change
+    def list(self, request, *args, **kwargs):
+        return Response(cache.get_food_court_list(
+            lambda: self.get_serializer(self.get_queryset(), many=True).data
+        ))
+    
+    def retrieve(self, request, *args, **kwargs):
+        # Invalidation keys on the integer id, so /food-courts/01/ must share the entry of /1/
+        try:
+            food_court_id = int(self.kwargs['pk'])
+        except ValueError:
+            raise NotFound()
+        return Response(cache.get_food_court_detail(
+            food_court_id,
+            lambda: self.get_serializer(self.get_object()).data
+        ))
 
 class StudentOrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [IsStudent]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
-        return Order.objects.filter(student=self.request.user)
+        return Order.objects.filter(student=self.request.user).with_details()
+    
+    def list(self, request, *args, **kwargs):
+        # Polled by the order tracker; answer 304 while nothing has changed
+        return conditional.conditional_list(
+            request,
+            Order.objects.filter(student=request.user),
+            lambda: super(StudentOrderViewSet, self).list(request, *args, **kwargs)
+        )
     
     @action(detail=False, methods=['post'])
     def place_order(self, request):
@@ -82,103 +119,57 @@ class StudentOrderViewSet(viewsets.ModelViewSet):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         data = serializer.validated_data
-        food_court = FoodCourt.objects.get(id=data['food_court'])
+        food_court = data['food_court_obj']
+        order_items_data = data['order_lines']
         
         # Calculate total amount
-        total_amount = Decimal('0.00')
-        order_items_data = []
-        
-        for item in data['items']:
-            menu_item = MenuItem.objects.get(id=item['menu_item_id'])
-            item_total = menu_item.price * item['quantity']
-            total_amount += item_total
-            order_items_data.append({
-                'menu_item': menu_item,
-                'quantity': item['quantity'],
-                'price': menu_item.price
-            })
-        
-        # Check wallet balance
-        if request.user.wallet_balance < total_amount:
-            return Response({
-                'error': 'Insufficient wallet balance',
-                'required': str(total_amount),
-                'available': str(request.user.wallet_balance)
-            }, status=status.HTTP_400_BAD_REQUEST)
+        total_amount = sum(
+            (item_data['price'] * item_data['quantity'] for item_data in order_items_data),
+            Decimal('0.00')
+        )
         
         # Create order and deduct from wallet
-        with transaction.atomic():
-            order = Order.objects.create(
-                student=request.user,
-                food_court=food_court,
-                total_amount=total_amount,
-                status='pending'
-            )
-            
-            for item_data in order_items_data:
-                OrderItem.objects.create(order=order, **item_data)
-            
-            # Deduct from wallet
-            request.user.wallet_balance -= total_amount
-            request.user.save()
-            
-            # Create wallet transaction
-            WalletTransaction.objects.create(
-                user=request.user,
-                transaction_type='debit',
-                amount=total_amount,
-                description=f'Order #{order.id} at {food_court.name}',
-                order=order,
-                balance_after=request.user.wallet_balance
-            )
-            
-            # Send email notification to food court admin
-            try:
-                # Prepare order items list for email
-                items_list = '\n'.join([
-                    f"  - {item_data['menu_item'].name} x {item_data['quantity']} = ₹{float(item_data['price']) * item_data['quantity']:.2f}"
-                    for item_data in order_items_data
+        try:
+            # The court was just loaded by the serializer; a full queue turns the order away without a write
+            if food_court.is_queue_full():
+                raise queue.QueueFull(queue.retry_after(food_court))
+            with transaction.atomic():
+                # Counts the order in the queue, or turns it away if it filled up since
+                queue.admit_order(food_court)
+                order = Order.objects.create(
+                    student=request.user,
+                    food_court=food_court,
+                    total_amount=total_amount,
+                    status='pending'
+                )
+                
+                OrderItem.objects.bulk_create([
+                    OrderItem(order=order, **item_data) for item_data in order_items_data
                 ])
+                rollups.order_created(order, order_items_data)
                 
-                subject = f'New Order #{order.id} - {food_court.name}'
-                message = f"""
-Hello {food_court.admin.first_name},
-
-You have received a new order at {food_court.name}!
-
-Order Details:
---------------
-Order ID: #{order.id}
-Customer: {request.user.first_name} {request.user.last_name}
-Email: {request.user.email}
-Order Time: {order.created_at.strftime('%Y-%m-%d %H:%M:%S')}
-
-Items Ordered:
-{items_list}
-
-Total Amount: ₹{float(total_amount):.2f}
-Status: Pending
-
-Please log in to your admin dashboard to view and process this order.
-
-Dashboard: http://localhost:5173/admin/orders
-
-Thank you!
-Canteen Management System
-"""
+                # Deduct from wallet; rolls the order back if the balance is too low
+                wallet.debit(request.user, total_amount, f'Order #{order.id} at {food_court.name}', order=order)
                 
-                send_mail(
-                    subject=subject,
-                    message=message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[food_court.admin.email],
-                    fail_silently=True,  # Don't fail if email sending fails
-                )
-            except Exception as e:
-                # Log the error but don't fail the order
-                print(f"Email notification failed: {str(e)}")
+                # Queue the admin notification; it is sent by the send_outbox_emails worker
+                notifications.queue_new_order_email(order, order_items_data, request.user)
+        except queue.QueueFull as e:
+            return Response({
+                'error': f'{food_court.name} is not taking more orders right now, try again shortly',
+                'retry_after': e.retry_after
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(e.retry_after)})
+        except wallet.InsufficientBalance as e:
+            return Response({
+                'error': 'Insufficient wallet balance',
+                'required': str(e.required),
+                'available': str(e.available)
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+        # Load the saved lines (with their ids) in one query for the response
+        prefetch_related_objects([order], OrderQuerySet.items_prefetch())
+        data = OrderSerializer(order).data
+        events.publish_order(order, data, 'order.created')
+        return Response(data, status=status.HTTP_201_CREATED)
 
 @api_view(['GET'])
 @permission_classes([IsStudent])
@@ -191,8 +182,13 @@ def wallet_balance(request):
 @permission_classes([IsStudent])
 def wallet_transactions(request):
     transactions = WalletTransaction.objects.filter(user=request.user)
-    serializer = WalletTransactionSerializer(transactions, many=True)
-    return Response(serializer.data)
+    # Transactions are never edited, so the newest created_at and the count identify the list
+    return conditional.conditional_list(
+        request,
+        transactions,
+        lambda: paginated_response(request, transactions, WalletTransactionSerializer),
+        field='created_at'
+    )
 
 @api_view(['POST'])
 @permission_classes([IsStudent])
@@ -202,23 +198,73 @@ def add_wallet_balance(request):
         return Response({'error': 'Invalid amount'}, status=status.HTTP_400_BAD_REQUEST)
     
     amount = Decimal(amount)
-    with transaction.atomic():
-        request.user.wallet_balance += amount
-        request.user.save()
-        
-        WalletTransaction.objects.create(
-            user=request.user,
-            transaction_type='credit',
-            amount=amount,
-            description='Wallet recharge',
-            balance_after=request.user.wallet_balance
-        )
+    wallet.credit(request.user, amount, 'Wallet recharge')
     
     return Response({
         'balance': request.user.wallet_balance,
         'message': 'Wallet recharged successfully'
     })
 
+@require_safe
+@cache_control(public=True, max_age=365 * 24 * 60 * 60, immutable=True)
+@etag(lambda request, digest, variant: f'{digest}-{variant}')
+def menu_image(request, digest, variant):
+    # Content addressed, so the URL itself never changes content; <img> tags send no token
+    if not images.DIGEST_RE.match(digest) or variant not in settings.MENU_IMAGE_SIZES:
+        raise Http404('Image not found')
+    name = images.image_name(digest, variant)
+    if not default_storage.exists(name):
+        raise Http404('Image not found')
+    return FileResponse(default_storage.open(name), content_type='image/webp')
+
+# Live order events (Server-Sent Events, served by canteen.asgi)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def order_events_token(request):
+    """A short-lived token for opening the order stream as ?token= (EventSource can't set headers)."""
+    return Response({'token': str(events.StreamToken.for_user(request.user)),
+                     'expires_in': settings.ORDER_EVENTS_TOKEN_SECONDS})
+
+def _order_events_channel(request):
+    auth = CachedJWTAuthentication()
+    result = auth.authenticate(request)
+    if result is None:
+        raw_token = request.GET.get('token')
+        if not raw_token:
+            raise AuthenticationFailed('Authentication credentials were not provided.')
+        try:
+            token = events.StreamToken(raw_token)
+        except TokenError:
+            raise AuthenticationFailed('Stream token is invalid or expired')
+        result = auth.get_user(token), None
+    user = result[0]
+
+    if user.role == 'student':
+        return events.student_channel(user.id)
+    if user.role == 'food_court_admin':
+        food_court_id = FoodCourt.objects.filter(admin=user).values_list('id', flat=True).first()
+        if food_court_id is not None:
+            return events.food_court_channel(food_court_id)
+    return None
+
+@require_safe
+async def order_events(request):
+    if not streaming.is_asgi(request):
+        # A WSGI server drains the endless stream into a list and never answers; clients poll instead
+        return JsonResponse({'error': 'Live order events need the ASGI server (canteen.asgi)'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    try:
+        channel = await sync_to_async(_order_events_channel)(request)
+    except AuthenticationFailed as e:
+        return JsonResponse({'detail': str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+    if channel is None:
+        return JsonResponse({'error': 'No order stream for this user'}, status=status.HTTP_403_FORBIDDEN)
+
+    response = StreamingHttpResponse(events.stream(channel), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # stop nginx buffering the stream
+    return response
+
 # Food Court Admin Views
 class MenuItemViewSet(viewsets.ModelViewSet):
     serializer_class = MenuItemSerializer
@@ -227,32 +273,108 @@ class MenuItemViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return MenuItem.objects.filter(food_court__admin=self.request.user)
     
+    def check_food_court_owner(self, food_court, message):
+        # Shared by the single item and bulk endpoints
+        if food_court.admin_id != self.request.user.id:
+            raise PermissionDenied(message)
+    
+    def get_own_food_court(self):
+        try:
+            return FoodCourt.objects.get(admin=self.request.user)
+        except FoodCourt.DoesNotExist:
+            raise NotFound('No food court assigned')
+    
     def perform_create(self, serializer):
         food_court = serializer.validated_data['food_court']
-        if food_court.admin != self.request.user:
-            raise PermissionError("You can only add items to your own food court")
+        self.check_food_court_owner(food_court, "You can only add items to your own food court")
         serializer.save()
+        cache.invalidate_menu(food_court.id)
     
     def perform_update(self, serializer):
         # Don't allow changing the food_court on update
         if 'food_court' in serializer.validated_data:
             food_court = serializer.validated_data['food_court']
-            if food_court.admin != self.request.user:
-                raise PermissionError("You can only update items in your own food court")
-        serializer.save()
+            self.check_food_court_owner(food_court, "You can only update items in your own food court")
+        previous_food_court_id = serializer.instance.food_court_id
+        menu_item = serializer.save()
+        cache.invalidate_menu(menu_item.food_court_id)
+        if menu_item.food_court_id != previous_food_court_id:
+            cache.invalidate_menu(previous_food_court_id)
     
     def perform_destroy(self, instance):
         # Check if the user owns this menu item's food court
-        if instance.food_court.admin != self.request.user:
-            raise PermissionError("You can only delete items from your own food court")
+        self.check_food_court_owner(instance.food_court, "You can only delete items from your own food court")
         instance.delete()
+        cache.invalidate_menu(instance.food_court_id)
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_items(self, request):
+        """Create or update many items from a CSV file/body or a JSON list."""
+        food_court = self.get_own_food_court()
+        try:
+            rows = menu_bulk.read_rows(request)
+        except (menu_bulk.MenuImportError, UnicodeDecodeError, csv.Error) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > settings.MENU_IMPORT_MAX_ROWS:
+            return Response({'error': f'At most {settings.MENU_IMPORT_MAX_ROWS} items per import'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = MenuItemImportSerializer(data=rows, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        rows = serializer.validated_data
+        
+        ids = [row['id'] for row in rows if 'id' in row]
+        if ids and menu_bulk.belongs_to_other_food_court(food_court, ids):
+            raise PermissionDenied("You can only update items in your own food court")
+        try:
+            created, updated = menu_bulk.import_items(food_court, rows)
+        except menu_bulk.MenuImportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        cache.invalidate_menu(food_court.id)
+        return Response({'created': created, 'updated': updated})
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the menu as ?fmt=csv (default) or ?fmt=json."""
+        fmt = request.query_params.get('fmt', 'csv')
+        if fmt not in ('csv', 'json'):
+            return Response({'error': 'fmt must be csv or json'}, status=status.HTTP_400_BAD_REQUEST)
+        encoder, content_type = menu_bulk.ENCODERS[fmt]
+        return streaming.response(
+            request, encoder(), menu_bulk.export_rows(self.get_queryset()), settings.MENU_BULK_BATCH_SIZE,
+            content_type, f'menu.{fmt}'
+        )
+    
+    @action(detail=False, methods=['post'], url_path='bulk-availability')
+    def bulk_availability(self, request):
+        """Mark the given ids, or a whole category, available or sold out."""
+        return self.bulk_change(request, MenuAvailabilitySerializer, menu_bulk.set_availability, 'is_available')
+    
+    @action(detail=False, methods=['post'], url_path='bulk-price')
+    def bulk_price(self, request):
+        """Raise or cut the prices of the given ids, or a whole category, by a percentage."""
+        return self.bulk_change(request, MenuPriceChangeSerializer, menu_bulk.change_prices, 'percent')
+    
+    def bulk_change(self, request, serializer_class, change, value_field):
+        food_court = self.get_own_food_court()
+        serializer = serializer_class(data=request.data, context={'food_court': food_court})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        if 'ids' in data and menu_bulk.belongs_to_other_food_court(food_court, data['ids']):
+            raise PermissionDenied("You can only update items in your own food court")
+        
+        updated = change(menu_bulk.select_items(food_court, data), data[value_field])
+        cache.invalidate_menu(food_court.id)
+        return Response({'updated': updated})
 
 @api_view(['GET'])
 @permission_classes([IsFoodCourtAdmin])
 def admin_food_court(request):
     try:
         food_court = FoodCourt.objects.get(admin=request.user)
-        serializer = FoodCourtDetailSerializer(food_court)
+        serializer = FoodCourtDetailSerializer(food_court, context={'request': request})
         return Response(serializer.data)
     except FoodCourt.DoesNotExist:
         return Response({'error': 'No food court assigned'}, status=status.HTTP_404_NOT_FOUND)
@@ -265,12 +387,28 @@ def update_food_court(request):
     except FoodCourt.DoesNotExist:
         return Response({'error': 'No food court assigned'}, status=status.HTTP_404_NOT_FOUND)
     
-    allowed_fields = ['avg_preparation_time', 'active_staff_count', 'is_open', 'description']
-    for field in allowed_fields:
-        if field in request.data:
-            setattr(food_court, field, request.data[field])
+    allowed_fields = ['avg_preparation_time', 'active_staff_count', 'is_open', 'description',
+                      'max_active_orders', 'max_waiting_time']
+    changed_fields = [field for field in allowed_fields if field in request.data]
+    for field in changed_fields:
+        setattr(food_court, field, request.data[field])
     
-    food_court.save()
+    # Admission limits: a positive whole number, or null/empty for no limit
+    for field in ('max_active_orders', 'max_waiting_time'):
+        if field not in changed_fields:
+            continue
+        value = getattr(food_court, field)
+        if value in (None, ''):
+            setattr(food_court, field, None)
+        elif isinstance(value, bool) or not str(value).isdigit() or int(value) < 1:
+            return Response({'error': f'{field} must be a positive whole number or null'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        else:
+            setattr(food_court, field, int(value))
+    
+    # Only write the edited columns so the queue counter is never overwritten
+    food_court.save(update_fields=changed_fields + ['updated_at'])
+    cache.invalidate_food_court(food_court.id)
     serializer = FoodCourtSerializer(food_court)
     return Response(serializer.data)
 
@@ -283,26 +421,132 @@ def admin_orders(request):
         return Response({'error': 'No food court assigned'}, status=status.HTTP_404_NOT_FOUND)
     
     orders = Order.objects.filter(food_court=food_court)
-    serializer = OrderSerializer(orders, many=True)
-    return Response(serializer.data)
+    return conditional.conditional_list(
+        request,
+        orders,
+        lambda: paginated_response(request, orders.with_details(), OrderSerializer)
+    )
+
+@api_view(['GET'])
+@permission_classes([IsFoodCourtAdmin])
+def admin_order_changes(request):
+    """
+    Orders created or changed after ?since=<cursor>, oldest change first, with
+    the cursor to send next time. ?active=1 without a cursor starts from the
+    open (pending/preparing/ready) orders only; with a cursor every change is
+    returned so clients can drop orders that left the queue.
+    """
+    try:
+        food_court = FoodCourt.objects.get(admin=request.user)
+    except FoodCourt.DoesNotExist:
+        return Response({'error': 'No food court assigned'}, status=status.HTTP_404_NOT_FOUND)
+    
+    orders = Order.objects.filter(food_court=food_court)
+    since = request.query_params.get('since')
+    cursor = decode_cursor(since) if since else None
+    if cursor is None and request.query_params.get('active') in ('1', 'true'):
+        orders = orders.filter(status__in=Order.OPEN_STATUSES)
+    
+    page_size = KeysetPagination().get_page_size(request)
+    rows, next_cursor, has_more = changes.changes_since(orders.with_details(), cursor, page_size)
+    return Response({
+        'results': OrderSerializer(rows, many=True).data,
+        'cursor': next_cursor,
+        'has_more': has_more
+    })
+
+def _order_conflict(order_id, message):
+    current = Order.objects.filter(pk=order_id).values_list('status', flat=True).first()
+    return Response({'error': message, 'status': current}, status=status.HTTP_409_CONFLICT)
 
 @api_view(['PATCH'])
 @permission_classes([IsFoodCourtAdmin])
 def update_order_status(request, order_id):
+    """
+    Move one order along order_status.TRANSITIONS. Clients may send the
+    status they last saw as ``expected_status``; if the order has moved on
+    since, the answer is 409 with the current status.
+    """
+    new_status = request.data.get('status')
+    if new_status not in order_status.TRANSITIONS:
+        return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+    expected_status = request.data.get('expected_status')
+    
     try:
-        food_court = FoodCourt.objects.get(admin=request.user)
-        order = Order.objects.get(id=order_id, food_court=food_court)
+        with transaction.atomic():
+            food_court = FoodCourt.objects.get(admin=request.user)
+            # No row lock: the compare-and-swap UPDATE catches concurrent changes
+            order = Order.objects.only(
+                'id', 'status', 'food_court', 'student', 'total_amount', 'created_at'
+            ).get(id=order_id, food_court=food_court)
+            if order.status != new_status:
+                if expected_status and expected_status != order.status:
+                    return _order_conflict(order.id, f'Order is already {order.status}')
+                if not order_status.can_change(order.status, new_status):
+                    return Response({'error': f'Cannot change a {order.status} order to {new_status}'},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                order_status.change_status(food_court, [order], new_status)
     except (FoodCourt.DoesNotExist, Order.DoesNotExist):
         return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+    except order_status.StatusConflict:
+        return _order_conflict(order_id, 'Order was updated by someone else')
     
+    order = Order.objects.with_details().get(pk=order.pk)
+    data = OrderSerializer(order).data
+    events.publish_order(order, data)
+    return Response(data)
+
+@api_view(['POST'])
+@permission_classes([IsFoodCourtAdmin])
+def bulk_update_order_status(request):
+    """
+    Move a list of the court's orders to one status: {"ids": [...], "status": "ready"}.
+    Orders that cannot make the transition are left alone and reported as ``invalid``.
+    """
     new_status = request.data.get('status')
-    if new_status not in ['pending', 'preparing', 'ready', 'completed', 'cancelled']:
+    if new_status not in order_status.TRANSITIONS:
         return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+    ids = request.data.get('ids')
+    # bool is an int subclass; JSON true must not become order 1
+    if not isinstance(ids, list) or not ids or not all(type(order_id) is int for order_id in ids):
+        return Response({'error': 'ids must be a non-empty list of order ids'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > settings.ORDER_BULK_STATUS_MAX:
+        return Response({'error': f'At most {settings.ORDER_BULK_STATUS_MAX} orders per request'},
+                        status=status.HTTP_400_BAD_REQUEST)
     
-    order.status = new_status
-    order.save()
+    try:
+        food_court = FoodCourt.objects.get(admin=request.user)
+    except FoodCourt.DoesNotExist:
+        return Response({'error': 'No food court assigned'}, status=status.HTTP_404_NOT_FOUND)
     
-    return Response(OrderSerializer(order).data)
+    try:
+        with transaction.atomic():
+            # Lock in id order so overlapping batches can't deadlock
+            orders = list(
+                Order.objects.select_for_update().filter(food_court=food_court, id__in=ids).order_by('id')
+                .only('id', 'status', 'food_court', 'student', 'total_amount', 'created_at')
+            )
+            results = {
+                order.id: 'unchanged' if order.status == new_status
+                else 'updated' if order_status.can_change(order.status, new_status)
+                else 'invalid'
+                for order in orders
+            }
+            changed = order_status.change_status(
+                food_court, [order for order in orders if results[order.id] == 'updated'], new_status
+            )
+    except order_status.StatusConflict:
+        return Response({'error': 'Orders were updated by someone else'}, status=status.HTTP_409_CONFLICT)
+    
+    if changed:
+        order_status.publish([order.id for order in changed])
+    return Response({
+        'status': new_status,
+        'results': [
+            {'id': order_id, 'result': results.get(order_id, 'not_found')}
+            for order_id in dict.fromkeys(ids)
+        ]
+    })
 
 @api_view(['GET'])
 @permission_classes([IsFoodCourtAdmin])
@@ -312,46 +556,51 @@ def admin_analytics(request):
     except FoodCourt.DoesNotExist:
         return Response({'error': 'No food court assigned'}, status=status.HTTP_404_NOT_FOUND)
     
-    today = timezone.now().date()
-    today_orders = Order.objects.filter(
-        food_court=food_court,
-        created_at__date=today
-    )
+    # Defaults to today in the campus time zone; ?period=week|month and ?date=YYYY-MM-DD widen or move it
+    try:
+        period, start, end = dates.window_from_params(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    total_orders = today_orders.count()
-    revenue = today_orders.filter(
-        status__in=['completed', 'ready', 'preparing', 'pending']
-    ).aggregate(total=Sum('total_amount'))['total'] or 0
+    # Read the daily rollups (see myapp.rollups) rather than scanning the orders
+    days = {'food_court': food_court, 'day__gte': start.date(), 'day__lt': end.date()}
+    totals = DailySales.objects.filter(**days).aggregate(
+        orders=Sum('order_count'),
+        cancelled=Sum('cancelled_count'),
+        revenue=Sum('revenue')
+    )
+    total_orders = (totals['orders'] or 0) + (totals['cancelled'] or 0)
+    revenue = totals['revenue'] or 0
     
     # Most selling item
-    most_selling = OrderItem.objects.filter(
-        order__food_court=food_court,
-        order__created_at__date=today
-    ).values('menu_item__name').annotate(
+    most_selling = DailyItemSales.objects.filter(**days).values('menu_item__name').annotate(
         total_quantity=Sum('quantity')
-    ).order_by('-total_quantity').first()
+    ).filter(total_quantity__gt=0).order_by('-total_quantity').first()
     
     return Response({
         'total_orders_today': total_orders,
         'revenue_today': revenue,
         'most_selling_item': most_selling['menu_item__name'] if most_selling else 'N/A',
-        'most_selling_quantity': most_selling['total_quantity'] if most_selling else 0
+        'most_selling_quantity': most_selling['total_quantity'] if most_selling else 0,
+        'period': period,
+        'start': start,
+        'end': end
     })
 
 # Super Admin Views
 @api_view(['GET'])
 @permission_classes([IsSuperAdmin])
 def all_food_courts(request):
-    food_courts = FoodCourt.objects.all()
-    serializer = FoodCourtSerializer(food_courts, many=True)
-    return Response(serializer.data)
+    food_courts = FoodCourt.objects.select_related('admin')
+    return paginated_response(request, food_courts, FoodCourtSerializer)
 
 @api_view(['POST'])
 @permission_classes([IsSuperAdmin])
 def create_food_court(request):
     serializer = FoodCourtSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save()
+        food_court = serializer.save()
+        cache.invalidate_food_court(food_court.id)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -371,7 +620,8 @@ def update_food_court_admin(request, food_court_id):
             return Response({'error': 'Admin user not found or not a food court admin'}, status=status.HTTP_404_NOT_FOUND)
         
         food_court.admin = new_admin
-        food_court.save()
+        food_court.save(update_fields=['admin', 'updated_at'])
+        cache.invalidate_food_court(food_court.id)
         
         return Response(FoodCourtSerializer(food_court).data)
     except FoodCourt.DoesNotExist:
@@ -388,7 +638,8 @@ def update_food_court_status(request, food_court_id):
             return Response({'error': 'is_open is required'}, status=status.HTTP_400_BAD_REQUEST)
         
         food_court.is_open = is_open
-        food_court.save()
+        food_court.save(update_fields=['is_open', 'updated_at'])
+        cache.invalidate_food_court(food_court.id)
         
         return Response(FoodCourtSerializer(food_court).data)
     except FoodCourt.DoesNotExist:
@@ -409,8 +660,7 @@ def create_food_court_admin(request):
 @permission_classes([IsSuperAdmin])
 def all_users(request):
     users = User.objects.all()
-    serializer = UserSerializer(users, many=True)
-    return Response(serializer.data)
+    return paginated_response(request, users, UserSerializer, UserKeysetPagination)
 
 @api_view(['PATCH'])
 @permission_classes([IsSuperAdmin])
@@ -419,6 +669,7 @@ def block_user(request, user_id):
         user = User.objects.get(id=user_id)
         user.is_blocked = request.data.get('is_blocked', True)
         user.save()
+        cache.invalidate_user(user.id)
         return Response(UserSerializer(user).data)
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -444,6 +695,7 @@ def update_user(request, user_id):
             user.wallet_balance = Decimal(request.data['wallet_balance'])
         
         user.save()
+        cache.invalidate_user(user.id)
         return Response(UserSerializer(user).data)
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -463,7 +715,18 @@ def delete_user(request, user_id):
             return Response({'error': 'Cannot delete super admin accounts'}, status=status.HTTP_400_BAD_REQUEST)
         
         username = user.username
-        user.delete()
+        # Deleting a student cascades to their orders; keep the rollups and queue counters in step
+        with transaction.atomic():
+            orders = list(user.orders.select_for_update().only(
+                'id', 'food_court_id', 'status', 'created_at', 'total_amount'
+            ))
+            # Same lock order as place_order: the FoodCourt counters, then the rollups (see myapp.queue)
+            active = Counter(order.food_court_id for order in orders if order.status in Order.ACTIVE_STATUSES)
+            for food_court_id in sorted(active):
+                queue.adjust_active_orders(food_court_id, -active[food_court_id])
+            rollups.orders_deleted(orders)
+            user.delete()
+            cache.invalidate_user(user_id)
         return Response({'message': f'User {username} deleted successfully'})
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -471,65 +734,46 @@ def delete_user(request, user_id):
 @api_view(['GET'])
 @permission_classes([IsSuperAdmin])
 def system_analytics(request):
-    total_revenue = Order.objects.filter(
-        status__in=['completed', 'ready', 'preparing', 'pending']
-    ).aggregate(total=Sum('total_amount'))['total'] or 0
-    
-    total_orders = Order.objects.count()
-    total_students = User.objects.filter(role='student').count()
-    total_food_courts = FoodCourt.objects.count()
-    
-    today = timezone.now().date()
+    today = dates.local_today()
     yesterday = today - timedelta(days=1)
     
-    today_revenue = Order.objects.filter(
-        created_at__date=today,
-        status__in=['completed', 'ready', 'preparing', 'pending']
-    ).aggregate(total=Sum('total_amount'))['total'] or 0
+    # One grouped query over the daily rollups (see myapp.rollups) for every food court
+    food_courts = FoodCourt.objects.order_by().annotate(
+        revenue=Sum('daily_sales__revenue', default=0),
+        order_count=Sum('daily_sales__order_count', default=0),
+        cancelled_count=Sum('daily_sales__cancelled_count', default=0),
+        today_revenue=Sum('daily_sales__revenue', filter=Q(daily_sales__day=today), default=0),
+        yesterday_revenue=Sum('daily_sales__revenue', filter=Q(daily_sales__day=yesterday), default=0)
+    ).values('id', 'name', 'revenue', 'order_count', 'cancelled_count', 'today_revenue', 'yesterday_revenue')
     
-    # Revenue by food court
+    total_revenue = 0
+    today_revenue = 0
+    total_orders = 0
+    total_food_courts = 0
     food_court_revenue = []
-    for food_court in FoodCourt.objects.all():
-        # Total revenue
-        revenue = Order.objects.filter(
-            food_court=food_court,
-            status__in=['completed', 'ready', 'preparing', 'pending']
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-        
-        # Today's revenue
-        today_revenue_fc = Order.objects.filter(
-            food_court=food_court,
-            created_at__date=today,
-            status__in=['completed', 'ready', 'preparing', 'pending']
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-        
-        # Yesterday's revenue
-        yesterday_revenue_fc = Order.objects.filter(
-            food_court=food_court,
-            created_at__date=yesterday,
-            status__in=['completed', 'ready', 'preparing', 'pending']
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
+    for food_court in food_courts:
+        total_revenue += food_court['revenue']
+        today_revenue += food_court['today_revenue']
+        total_orders += food_court['order_count'] + food_court['cancelled_count']
+        total_food_courts += 1
         
         # Calculate growth percentage
         growth = 0
-        if yesterday_revenue_fc > 0:
-            growth = ((today_revenue_fc - yesterday_revenue_fc) / yesterday_revenue_fc) * 100
-        elif today_revenue_fc > 0:
+        if food_court['yesterday_revenue'] > 0:
+            growth = ((food_court['today_revenue'] - food_court['yesterday_revenue']) / food_court['yesterday_revenue']) * 100
+        elif food_court['today_revenue'] > 0:
             growth = 100  # If no revenue yesterday but revenue today, 100% growth
         
-        order_count = Order.objects.filter(
-            food_court=food_court,
-            status__in=['completed', 'ready', 'preparing', 'pending']
-        ).count()
-        
         food_court_revenue.append({
-            'id': food_court.id,
-            'name': food_court.name,
-            'revenue': float(revenue),
-            'orders': order_count,
+            'id': food_court['id'],
+            'name': food_court['name'],
+            'revenue': float(food_court['revenue']),
+            'orders': food_court['order_count'],
             'growth': round(growth, 1)
         })
     
+    total_students = User.objects.filter(role='student').count()
+    
     # Sort by revenue descending
     food_court_revenue.sort(key=lambda x: x['revenue'], reverse=True)
     
@@ -541,3 +785,37 @@ def system_analytics(request):
         'total_food_courts': total_food_courts,
         'food_court_revenue': food_court_revenue
     })
+
+@api_view(['GET'])
+@permission_classes([IsSuperAdmin])
+def export_data(request, dataset):
+    """
+    Stream orders, order-items or wallet-transactions as ?fmt=csv (default),
+    ndjson or parquet, optionally limited to campus days ?from= and ?to=
+    (YYYY-MM-DD, inclusive) and to ?food_court= ids (repeatable).
+    """
+    if dataset not in exports.DATASETS:
+        return Response({'error': f"Unknown export, use one of {', '.join(exports.DATASETS)}"},
+                        status=status.HTTP_404_NOT_FOUND)
+    fmt = request.query_params.get('fmt', 'csv')
+    try:
+        exports.check_format(fmt)
+        start, end = exports.parse_days(request.query_params.get('from'), request.query_params.get('to'))
+        food_court_ids = [int(value) for value in request.query_params.getlist('food_court')]
+    except exports.ExportError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except ValueError:
+        return Response({'error': 'food_court must be an id'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # The rows are read while streaming, after the view has returned, so pin the database now
+    rows = exports.rows(dataset, start, end, food_court_ids, using=db_router.read_alias())
+    return streaming.response(
+        request, exports.encoder(dataset, fmt), rows, settings.EXPORT_CHUNK_SIZE,
+        exports.FORMATS[fmt], f'{dataset}.{fmt}'
+    )
+
+@api_view(['GET'])
+@permission_classes([IsSuperAdmin])
+def metrics_view(request):
+    """Per route latency, SQL and response size metrics for Prometheus (see myapp.metrics)."""
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,62 @@
+"""
+Wallet balance changes.
+
+Every debit and credit is a single conditional UPDATE on the user's row, so
+two requests for the same student can never both spend the same money or
+overwrite each other's balance. The rest of the User row is never re-saved.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from . import cache
+from .models import User, WalletTransaction
+
+
+class InsufficientBalance(Exception):
+    def __init__(self, required, available):
+        self.required = required
+        self.available = available
+        super().__init__(f"Insufficient wallet balance: required {required}, available {available}")
+
+
+def _change_balance(user, amount, transaction_type, description, order=None):
+    # Inside a caller's transaction (place_order) this joins it without a savepoint;
+    # nothing raises inside the block, so the caller's transaction stays usable
+    with transaction.atomic(savepoint=False):
+        row = User.objects.filter(pk=user.pk)
+        if transaction_type == 'debit':
+            # UPDATE ... SET wallet_balance = wallet_balance - X WHERE id = ? AND wallet_balance >= X
+            updated = row.filter(wallet_balance__gte=amount).update(wallet_balance=F('wallet_balance') - amount)
+        else:
+            updated = row.update(wallet_balance=F('wallet_balance') + amount)
+
+        # MySQL has no UPDATE ... RETURNING; the UPDATE keeps the row locked until
+        # commit, so this read returns exactly the balance that statement wrote.
+        balance_after = row.values_list('wallet_balance', flat=True).get()
+        if updated:
+            wallet_transaction = WalletTransaction.objects.create(
+                user_id=user.pk,
+                transaction_type=transaction_type,
+                amount=amount,
+                description=description,
+                order=order,
+                balance_after=balance_after
+            )
+            # The cached request user carries the balance
+            cache.invalidate_user(user.pk)
+    if not updated:
+        raise InsufficientBalance(amount, balance_after)
+
+    # Keep the in-memory instance in step with the database
+    user.wallet_balance = balance_after
+    return wallet_transaction
+
+
+def debit(user, amount, description, order=None):
+    """Take ``amount`` from the wallet, raising InsufficientBalance if it would go negative."""
+    return _change_balance(user, amount, 'debit', description, order)
+
+
+def credit(user, amount, description, order=None):
+    """Add ``amount`` to the wallet."""
+    return _change_balance(user, amount, 'credit', description, order)
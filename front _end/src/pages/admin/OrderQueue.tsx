@@ -1,8 +1,8 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { Card } from '../../components/ui/Card';
 import { Button } from '../../components/ui/Button';
 import { Badge } from '../../components/ui/Badge';
-import api from '../../services/api';
+import api, { subscribeToOrders } from '../../services/api';
 import { Order, OrderStatus } from '../../types';
 import { Clock, CheckCircle2, ChefHat, RefreshCw } from 'lucide-react';
 
@@ -11,18 +11,35 @@ export function OrderQueue() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [updating, setUpdating] = useState<number | null>(null);
+  // Position in the order change feed; only changes after it are downloaded
+  const cursor = useRef<string | undefined>(undefined);
 
   useEffect(() => {
     fetchOrders();
-    // Auto-refresh every 30 seconds
-    const interval = setInterval(fetchOrders, 30000);
-    return () => clearInterval(interval);
+    // Orders are pushed as they are placed or change status; fetchOrders is polled
+    // every 30 seconds whenever the stream is down or the server can't stream
+    return subscribeToOrders(({ order }) => mergeOrders([order]), fetchOrders, 30000);
   }, []);
 
+  const mergeOrders = (changed: Order[]) => {
+    setOrders((current) => {
+      const byId = new Map(current.map((o) => [o.id, o]));
+      changed.forEach((o) => byId.set(o.id, o));
+      return Array.from(byId.values()).sort((a, b) =>
+        b.created_at.localeCompare(a.created_at)
+      );
+    });
+  };
+
   const fetchOrders = async () => {
     try {
-      const data = await api.admin.getOrders();
-      setOrders(data);
+      let hasMore = true;
+      while (hasMore) {
+        const data = await api.admin.getOrderChanges(cursor.current);
+        mergeOrders(data.results);
+        cursor.current = data.cursor;
+        hasMore = data.has_more;
+      }
       setError('');
     } catch (err: any) {
       setError(err.message);
@@ -34,7 +51,8 @@ export function OrderQueue() {
   const updateStatus = async (orderId: number, newStatus: OrderStatus) => {
     setUpdating(orderId);
     try {
-      await api.admin.updateOrderStatus(orderId, newStatus);
+      const current = orders.find((o) => o.id === orderId);
+      await api.admin.updateOrderStatus(orderId, newStatus, current?.status);
       setOrders(
         orders.map((o) =>
           o.id === orderId ? { ...o, status: newStatus } : o
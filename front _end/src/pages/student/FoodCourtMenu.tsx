@@ -96,6 +96,11 @@ export function FoodCourtMenu() {
           <div className={`px-3 py-1.5 rounded-lg ${foodCourt.is_open ? 'bg-green-500/20' : 'bg-red-500/20'}`}>
             {foodCourt.is_open ? '🟢 Open' : '🔴 Closed'}
           </div>
+          {foodCourt.is_open && foodCourt.is_queue_full && (
+            <div className="px-3 py-1.5 rounded-lg bg-amber-500/20">
+              Queue full, try again in a few minutes
+            </div>
+          )}
         </div>
       </div>
 
@@ -1,7 +1,7 @@
 import { useState, useEffect } from 'react';
 import { Card } from '../../components/ui/Card';
 import { Badge } from '../../components/ui/Badge';
-import api from '../../services/api';
+import api, { subscribeToOrders } from '../../services/api';
 import { Order, OrderStatus } from '../../types';
 import { CheckCircle2, Clock, ChefHat, Package, AlertCircle, RefreshCw } from 'lucide-react';
 import { Button } from '../../components/ui/Button';
@@ -13,9 +13,15 @@ export function OrderTracker() {
 
   useEffect(() => {
     fetchOrders();
-    // Auto-refresh every 30 seconds
-    const interval = setInterval(fetchOrders, 30000);
-    return () => clearInterval(interval);
+    // Orders are pushed as they are placed or change status; fetchOrders is polled
+    // every 30 seconds whenever the stream is down or the server can't stream
+    return subscribeToOrders(({ order }) => {
+      setOrders((current) =>
+        current.some((o) => o.id === order.id)
+          ? current.map((o) => (o.id === order.id ? order : o))
+          : [order, ...current]
+      );
+    }, fetchOrders, 30000);
   }, []);
 
   const fetchOrders = async () => {
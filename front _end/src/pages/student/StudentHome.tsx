@@ -89,7 +89,12 @@ export function StudentHome() {
                     {court.admin_name && `Managed by ${court.admin_name}`}
                   </div>
 
-                  {court.is_open && (
+                  {court.is_open && court.is_queue_full && (
+                    <div className="text-xs font-medium text-amber-700 bg-amber-50 px-2 py-1 rounded-lg">
+                      Queue full
+                    </div>
+                  )}
+                  {court.is_open && !court.is_queue_full && (
                     <div className="flex items-center text-xs font-medium text-indigo-600 bg-indigo-50 px-2 py-1 rounded-lg">
                       <Clock className="w-3.5 h-3.5 mr-1" />
                       {court.estimated_waiting_time} min
@@ -1,3 +1,5 @@
+import { Order, OrderChanges } from '../types';
+
 // API Configuration and Base Service
 const API_BASE_URL = (import.meta as any).env?.VITE_API_URL || 'http://localhost:8000/api';
 
@@ -89,6 +91,23 @@ async function apiFetch<T>(
   return response.json();
 }
 
+// Every row of a keyset paginated list, following the next cursor page by page
+async function apiFetchAll<T = any>(endpoint: string): Promise<T[]> {
+  const results: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const params = new URLSearchParams({ envelope: '1', page_size: '200' });
+    if (cursor) params.set('cursor', cursor);
+    const page: { next: string | null; results: T[] } = await apiFetch(
+      `${endpoint}?${params}`,
+      { method: 'GET' }
+    );
+    results.push(...page.results);
+    cursor = page.next ? new URL(page.next).searchParams.get('cursor') : null;
+  } while (cursor);
+  return results;
+}
+
 // Refresh access token
 async function refreshAccessToken(): Promise<boolean> {
   const refreshToken = tokenManager.getRefreshToken();
@@ -113,6 +132,86 @@ async function refreshAccessToken(): Promise<boolean> {
   return false;
 }
 
+// Live order updates pushed by the server (Server-Sent Events)
+export interface OrderEvent {
+  event: 'order.created' | 'order.updated';
+  order: Order;
+}
+
+// Opens the order stream for the signed in user. While the stream is not open (not
+// yet connected, dropped, or refused because the server runs without ASGI) refetch
+// is polled every pollMs instead; it also runs once a dropped stream is back.
+// Returns a function that closes the stream.
+export function subscribeToOrders(
+  onEvent: (event: OrderEvent) => void,
+  refetch: () => void,
+  pollMs = 30000
+): () => void {
+  let source: EventSource | null = null;
+  let closed = false;
+  let dropped = false;
+  let retryMs = 3000;
+  let retryTimer: ReturnType<typeof setTimeout> | undefined;
+  let pollTimer: ReturnType<typeof setInterval> | undefined;
+
+  const startPolling = () => {
+    if (!pollTimer) pollTimer = setInterval(refetch, pollMs);
+  };
+  const stopPolling = () => {
+    clearInterval(pollTimer);
+    pollTimer = undefined;
+  };
+  const reconnectLater = () => {
+    if (closed) return;
+    retryTimer = setTimeout(connect, retryMs);
+    retryMs = Math.min(retryMs * 2, 5 * 60 * 1000);
+  };
+
+  const connect = async () => {
+    if (closed) return;
+    let token: string;
+    try {
+      // A short-lived token that only opens the stream; access tokens stay out of URLs
+      ({ token } = await apiFetch<{ token: string }>('/events/orders/token/', { method: 'POST' }));
+    } catch {
+      reconnectLater();
+      return;
+    }
+    if (closed) return;
+    source = new EventSource(
+      `${API_BASE_URL}/events/orders/?token=${encodeURIComponent(token)}`
+    );
+    source.addEventListener('open', () => {
+      retryMs = 3000;
+      stopPolling();
+      if (dropped) {
+        dropped = false;
+        refetch();
+      }
+    });
+    source.addEventListener('order', (message) => {
+      onEvent(JSON.parse((message as MessageEvent).data));
+    });
+    source.addEventListener('error', () => {
+      dropped = true;
+      startPolling();
+      // EventSource retries by itself unless the server refused the stream (expired token, no ASGI)
+      if (source?.readyState === EventSource.CLOSED) {
+        reconnectLater();
+      }
+    });
+  };
+
+  startPolling();
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    stopPolling();
+    source?.close();
+  };
+}
+
 // API Service
 export const api = {
   // Authentication
@@ -161,7 +260,7 @@ export const api = {
         body: JSON.stringify(data),
       }),
     
-    getOrders: () => apiFetch('/student/orders/', { method: 'GET' }),
+    getOrders: () => apiFetchAll<Order>('/student/orders/'),
     
     getOrder: (id: number) =>
       apiFetch(`/student/orders/${id}/`, { method: 'GET' }),
@@ -172,8 +271,7 @@ export const api = {
         method: 'GET',
       }),
     
-    getWalletTransactions: () =>
-      apiFetch('/student/wallet/transactions/', { method: 'GET' }),
+    getWalletTransactions: () => apiFetchAll('/student/wallet/transactions/'),
     
     addWalletBalance: (amount: number) =>
       apiFetch('/student/wallet/add/', {
@@ -192,6 +290,8 @@ export const api = {
       avg_preparation_time?: number;
       active_staff_count?: number;
       description?: string;
+      max_active_orders?: number | null;
+      max_waiting_time?: number | null;
     }) =>
       apiFetch('/admin/food-court/update/', {
         method: 'PATCH',
@@ -232,12 +332,22 @@ export const api = {
       apiFetch(`/admin/menu-items/${id}/`, { method: 'DELETE' }),
     
     // Orders
-    getOrders: () => apiFetch('/admin/orders/', { method: 'GET' }),
+    getOrders: () => apiFetchAll<Order>('/admin/orders/'),
+    
+    // Orders changed since a cursor; without one, only the open orders
+    getOrderChanges: (since?: string) =>
+      apiFetch<OrderChanges>(
+        since
+          ? `/admin/orders/changes/?since=${encodeURIComponent(since)}`
+          : '/admin/orders/changes/?active=1',
+        { method: 'GET' }
+      ),
     
-    updateOrderStatus: (orderId: number, status: string) =>
+    // expectedStatus is the status the caller last saw; a stale one gets a 409
+    updateOrderStatus: (orderId: number, status: string, expectedStatus?: string) =>
       apiFetch(`/admin/orders/${orderId}/status/`, {
         method: 'PATCH',
-        body: JSON.stringify({ status }),
+        body: JSON.stringify({ status, expected_status: expectedStatus }),
       }),
     
     // Analytics
@@ -247,8 +357,7 @@ export const api = {
   // Super Admin APIs
   superAdmin: {
     // Food Courts
-    getAllFoodCourts: () =>
-      apiFetch('/superadmin/food-courts/', { method: 'GET' }),
+    getAllFoodCourts: () => apiFetchAll('/superadmin/food-courts/'),
     
     createFoodCourt: (data: {
       name: string;
@@ -289,7 +398,7 @@ export const api = {
       }),
     
     // Users
-    getAllUsers: () => apiFetch('/superadmin/users/', { method: 'GET' }),
+    getAllUsers: () => apiFetchAll('/superadmin/users/'),
     
     blockUser: (userId: number, isBlocked: boolean) =>
       apiFetch(`/superadmin/users/${userId}/block/`, {
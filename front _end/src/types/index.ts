@@ -20,6 +20,9 @@ export interface FoodCourt {
   avg_preparation_time: number;
   active_staff_count: number;
   estimated_waiting_time: number;
+  is_queue_full: boolean;
+  max_active_orders?: number | null;
+  max_waiting_time?: number | null;
   admin?: number;
   admin_name?: string;
   created_at?: string;
@@ -69,6 +72,12 @@ export interface Order {
   updated_at: string;
 }
 
+export interface OrderChanges {
+  results: Order[];
+  cursor: string;
+  has_more: boolean;
+}
+
 export interface Transaction {
   id: number;
   transaction_type: 'credit' | 'debit';